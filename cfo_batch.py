@@ -0,0 +1,150 @@
+# --- ELABORAZIONE BATCH (CLI) ---
+# Esegue il modello CFO su un file di scenari CSV o Parquet senza Streamlit.
+# Le righe vengono lette a blocchi e valutate in modo vettoriale: la memoria usata
+# dipende dalla dimensione del blocco, non da quella del file.
+#
+# Uso:
+#   python -m cfo_batch scenari.csv -o kpi.csv
+#   python -m cfo_batch scenari.parquet -o kpi.parquet --chunk-size 100000
+#
+# Colonne di input: quelle di cfo_engine.DEFAULT_INPUTS (percentuali in decimali,
+# es. wacc=0.10); le colonne mancanti usano i default dell'app. Le altre colonne
+# (es. "id", "business_unit") vengono copiate così come sono nell'output.
+# Le celle vuote usano il default della colonna; le righe non valutabili (testo non
+# numerico, orizzonte sotto 1 anno, valori infiniti) restano nell'output con KPI vuoti e
+# il motivo nella colonna "row_status" ("ok" per le altre), senza fermare il file. Le
+# colonne dei driver in output riportano i valori usati (vuoti dove la cella non è valida).
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from cfo_engine import DEFAULT_INPUTS, evaluate_scenarios
+from cfo_irr import IRR_STATUS_NAMES
+
+DEFAULT_CHUNK = 50_000
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise SystemExit("Il formato Parquet richiede pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+def iter_chunks(path, chunk_size=DEFAULT_CHUNK):
+    """Legge `path` (CSV o Parquet, percorso o file-like con attributo `name`) a blocchi di DataFrame."""
+    if str(getattr(path, "name", path)).lower().endswith(".parquet"):
+        pa = _require_pyarrow()
+        for batch in pa.parquet.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def _driver_inputs(df):
+    # Driver numerici (celle vuote = default della colonna) e motivo di scarto per riga
+    inputs, used, reasons = {}, {}, pd.Series("", index=df.index)
+    for c in df.columns:
+        if c not in DEFAULT_INPUTS:
+            continue
+        raw = df[c]
+        num = pd.to_numeric(raw, errors="coerce")
+        blank = raw.isna() | (raw.astype(str).str.strip() == "")
+        bad = (num.isna() & ~blank) | np.isinf(num)
+        if c == "years":
+            bad |= num.fillna(DEFAULT_INPUTS[c]) < 1
+        reasons[bad] += c + " "
+        inputs[c] = num.where(~bad & ~blank, DEFAULT_INPUTS[c]).to_numpy(dtype=float)
+        used[c] = np.where(bad, np.nan, inputs[c])
+    return inputs, used, reasons.str.strip()
+
+
+def evaluate_frame(df):
+    """
+    Aggiunge a `df` i KPI e i flag delle raccomandazioni calcolati su ogni riga, più
+    row_status: "ok" o "invalid: <colonne>" per le righe non valutabili (KPI vuoti).
+    """
+    inputs, used, reasons = _driver_inputs(df)
+    invalid = (reasons != "").to_numpy()
+    kpis = evaluate_scenarios(inputs)
+    out = df.copy()
+    for c, v in used.items():
+        out[c] = v
+    # Stessi tipi in ogni blocco (flag booleani con valore mancante): schema Parquet stabile
+    for k, v in kpis.items():
+        col = pd.Series(np.broadcast_to(v, (len(df),)), index=df.index)
+        out[k] = col.astype("boolean" if col.dtype == bool else float).mask(invalid)
+    out["irr_status"] = out["irr_status"].map(IRR_STATUS_NAMES)
+    out["row_status"] = np.where(invalid, "invalid: " + reasons.str.replace(" ", ", "), "ok")
+    return out
+
+
+class _Writer:
+    # Scrittura incrementale: CSV in append, Parquet per row group
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.lower().endswith(".parquet")
+        self._pq = None
+        self._first = True
+
+    def write(self, df):
+        if self.parquet:
+            pa = _require_pyarrow()
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._pq is None:
+                self._pq = pa.parquet.ParquetWriter(self.path, table.schema)
+            self._pq.write_table(table)
+        else:
+            df.to_csv(self.path, mode="w" if self._first else "a", header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._pq is not None:
+            self._pq.close()
+
+
+def run(input_path, output_path, chunk_size=DEFAULT_CHUNK):
+    """Elabora l'intero file e restituisce (righe scritte, righe non valutabili)."""
+    writer = _Writer(output_path)
+    rows = invalid = 0
+    try:
+        for chunk in iter_chunks(input_path, chunk_size):
+            out = evaluate_frame(chunk)
+            writer.write(out)
+            rows += len(chunk)
+            invalid += int((out["row_status"] != "ok").sum())
+    finally:
+        writer.close()
+    return rows, invalid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m cfo_batch",
+                                     description="Black Swan CFO OS - calcolo KPI batch su file di scenari")
+    parser.add_argument("input", help="file di scenari (.csv o .parquet)")
+    parser.add_argument("-o", "--output", required=True, help="file KPI di output (.csv o .parquet)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK, help="righe per blocco")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.input):
+        parser.error(f"file non trovato: {args.input}")
+    if args.chunk_size < 1:
+        parser.error("--chunk-size deve essere positivo")
+
+    t0 = time.perf_counter()
+    rows, invalid = run(args.input, args.output, args.chunk_size)
+    print(f"{rows:,} scenari elaborati in {time.perf_counter() - t0:.2f}s -> {args.output}")
+    if invalid:
+        print(f"{invalid:,} righe non valutabili: KPI vuoti, motivo nella colonna row_status")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+# --- BENCHMARK CFO OS ---
+# Controlli di prestazione eseguibili da riga di comando.
+#
+#   python -m cfo_bench imports [--budget 0.5]
+#   python -m cfo_bench suite [--quick] [--filter engine.*] [--save base.json] [--compare base.json]
+#
+# "imports" misura, in un processo Python pulito, il tempo di import del nucleo di
+# calcolo e verifica che non trascini con sé le librerie pesanti dell'interfaccia.
+# Esce con codice 1 se il budget viene superato: utilizzabile come controllo in CI.
+#
+# "suite" cronometra su input sintetici fissi (seed costante) il motore di calcolo da
+# 1 a 100k progetti e da 5 a 480 periodi, i KPI delle altre tab, sanitize_text, gli
+# export e un rerun headless dell'app (AppTest). I risultati si salvano come baseline
+# JSON; con --compare segnala i casi più lenti della baseline oltre la soglia ed esce
+# con codice 1. Le baseline valgono solo sulla macchina su cui sono state registrate.
+
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+# Moduli che devono restare importabili senza Streamlit
+CORE_MODULES = ("cfo_engine", "cfo_irr", "cfo_montecarlo", "cfo_reports", "cfo_languages", "cfo_theme")
+
+# Librerie che il nucleo non deve importare (vengono caricate solo quando servono)
+HEAVY_MODULES = ("streamlit", "plotly", "pptx", "fpdf", "pandas")
+
+DEFAULT_IMPORT_BUDGET = 0.5   # secondi, import a freddo del nucleo
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+for m in {modules!r}:
+    __import__(m)
+elapsed = time.perf_counter() - t0
+heavy = sorted(h for h in {heavy!r} if h in sys.modules)
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+
+def measure_imports(modules=CORE_MODULES, repeat=3):
+    """Tempo minimo (su `repeat` processi nuovi) per importare `modules` e librerie pesanti caricate."""
+    code = _PROBE.format(modules=tuple(modules), heavy=HEAVY_MODULES)
+    best, heavy = float("inf"), []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        res = json.loads(out.stdout.strip().splitlines()[-1])
+        best = min(best, res["seconds"])
+        heavy = res["heavy"]
+    return {"seconds": best, "heavy": heavy}
+
+
+def check_imports(budget=DEFAULT_IMPORT_BUDGET, repeat=3):
+    res = measure_imports(repeat=repeat)
+    ok = res["seconds"] <= budget and not res["heavy"]
+    print(f"import nucleo: {res['seconds'] * 1000:.0f} ms (budget {budget * 1000:.0f} ms)")
+    if res["heavy"]:
+        print(f"ERRORE: il nucleo importa librerie pesanti: {', '.join(res['heavy'])}")
+    elif not ok:
+        print("ERRORE: budget di import superato")
+    return 0 if ok else 1
+
+
+# --- SUITE DI BENCHMARK ---
+SEED = 42
+MIN_SAMPLE = 0.05             # secondi minimi per campione (le funzioni rapide si ripetono)
+DEFAULT_REPEAT = 7            # campioni per caso
+DEFAULT_MAX_TIME = 5.0        # secondi massimi per caso, oltre il primo campione
+DEFAULT_THRESHOLD = 0.25      # rallentamento tollerato rispetto alla baseline (+25%)
+
+SCALES = (1, 1_000, 100_000)                          # progetti / righe
+HORIZONS = ((5, 1), (5, 12), (40, 12))                 # (anni, periodi per anno): 5, 60, 480 periodi
+
+# Registro: nome -> (setup, parametri, parametri lenti esclusi da --quick).
+# `setup(param)` prepara gli input e restituisce la funzione senza argomenti da cronometrare.
+BENCHMARKS = {}
+
+
+def benchmark(name, params=(None,), slow=()):
+    def register(setup):
+        BENCHMARKS[name] = (setup, tuple(params), tuple(slow))
+        return setup
+    return register
+
+
+def _label(param):
+    if param is None:
+        return ""
+    if isinstance(param, dict):
+        return "[" + ",".join(f"{k}={v}" for k, v in param.items()) + "]"
+    return f"[{param}]"
+
+
+def _drivers(n):
+    # Driver sintetici riproducibili attorno ai default dell'app
+    import numpy as np
+    rng = np.random.default_rng(SEED)
+    return {
+        "capex": rng.uniform(1e5, 1e6, n), "wacc": rng.uniform(0.05, 0.15, n),
+        "rev1": rng.uniform(1e5, 5e5, n), "growth": rng.uniform(0.0, 0.2, n),
+        "cogs_p": rng.uniform(0.2, 0.6, n), "opex1": rng.uniform(2e4, 8e4, n),
+        "opex_g": np.full(n, 0.03), "tax_r": np.full(n, 0.28),
+        "arpu": rng.uniform(100, 1000, n), "churn": rng.uniform(0.005, 0.05, n), "cac": rng.uniform(1e3, 8e3, n),
+        "cash": rng.uniform(5e4, 5e5, n), "debt": rng.uniform(0, 1e6, n),
+        "dso": rng.uniform(30, 90, n), "dio": rng.uniform(0, 90, n), "dpo": rng.uniform(30, 120, n),
+        "price": rng.uniform(50, 150, n), "var_cost": rng.uniform(20, 80, n),
+        "fix_cost": rng.uniform(5e4, 3e5, n), "volume": rng.uniform(1e3, 1e4, n),
+        "shock": rng.uniform(-0.5, 0.0, n),
+    }
+
+
+@benchmark("engine.evaluate_projects",
+           params=[{"n": n, "T": y * p} for n in SCALES for y, p in HORIZONS],
+           slow=[{"n": 100_000, "T": 60}, {"n": 100_000, "T": 480}])
+def bench_evaluate_projects(param):
+    # FCF/NPV/IRR a blocchi di block_rows() progetti, come cfo_montecarlo e cfo_batch
+    from cfo_engine import evaluate_projects, block_rows
+    n, T = param["n"], param["T"]
+    years, ppy = next((y, p) for y, p in HORIZONS if y * p == T)
+    d = _drivers(n)
+    step = block_rows(T)
+
+    def run():
+        for i in range(0, n, step):
+            b = slice(i, i + step)
+            evaluate_projects(d["capex"][b], years, d["wacc"][b], d["rev1"][b], d["growth"][b], d["cogs_p"][b],
+                              d["opex1"][b], d["opex_g"][b], d["tax_r"][b], periods_per_year=ppy)
+    return run
+
+
+def _kpi_bench(fn_name, keys):
+    def setup(n):
+        import cfo_engine
+        fn = getattr(cfo_engine, fn_name)
+        d = _drivers(n)
+        args = [d[k] for k in keys]
+        return lambda: fn(*args)
+    return setup
+
+
+benchmark("kpi.saas", SCALES)(_kpi_bench("saas_kpis", ("arpu", "churn", "cac")))
+benchmark("kpi.liquidity", SCALES)(_kpi_bench("liquidity_kpis", ("cash", "debt", "dso", "dio", "dpo")))
+benchmark("kpi.breakeven", SCALES)(_kpi_bench("breakeven_kpis", ("price", "var_cost", "fix_cost", "volume")))
+benchmark("kpi.stress", SCALES)(_kpi_bench("stress_kpis", ("rev1", "cogs_p", "opex1", "shock")))
+
+
+@benchmark("reports.sanitize_text", params=("kpi", "paragraph"))
+def bench_sanitize_text(kind):
+    from cfo_reports import sanitize_text
+    text = "NPV (VAN): € 107,183" if kind == "kpi" else "Cassa € 1.000 / debito £ 2.000 / $ 3.000 — ok. " * 200
+    return lambda: sanitize_text(text)
+
+
+def _report_inputs():
+    from cfo_engine import recommendation_flags
+    from cfo_languages import LANGUAGES
+    from cfo_reports import build_export_data, build_recoms
+    L = LANGUAGES["Italiano"]
+    data = build_export_data(L, "€", 107_183, 0.173, 250_000, 5.3, 0.25)
+    recoms = build_recoms(L, {k: bool(v) for k, v in recommendation_flags(107_183, 15, 5.3, 70_000).items()})
+    return data, recoms, "Black Swan CFO Report"
+
+
+@benchmark("reports.generate_pdf")
+def bench_generate_pdf(_):
+    from cfo_reports import generate_pdf
+    args = _report_inputs()
+    return lambda: generate_pdf(*args)
+
+
+@benchmark("reports.generate_pptx")
+def bench_generate_pptx(_):
+    from cfo_reports import generate_pptx
+    args = _report_inputs()
+    return lambda: generate_pptx(*args)
+
+
+@benchmark("reports.generate_csv")
+def bench_generate_csv(_):
+    from cfo_reports import generate_csv
+    data = _report_inputs()[0]
+    return lambda: generate_csv(data)
+
+
+@benchmark("app.run", params=("cold", "rerun"))
+def bench_app(kind):
+    # Esecuzione headless dell'app: "cold" svuota le cache di Streamlit a ogni run,
+    # "rerun" misura il rerun con le cache calde (interazione tipica)
+    import logging
+    os.environ.setdefault("CFO_SCENARIO_DB", ":memory:")   # non toccare l'archivio scenari dell'utente
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cfo_playbook_os.py")
+    at = AppTest.from_file(path, default_timeout=120)
+    at.run()
+
+    def run():
+        if kind == "cold":
+            # Il servizio di calcolo in cache_resource ha thread e pool di processi: va chiuso
+            # prima di scartarlo, altrimenti ogni campione lascerebbe un pool aperto
+            from cfo_service import ComputeService
+            ComputeService.close_all()
+            st.cache_data.clear()
+            st.cache_resource.clear()
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+    return run
+
+
+def measure(fn, repeat=DEFAULT_REPEAT, max_time=DEFAULT_MAX_TIME):
+    """
+    Tempo per chiamata di `fn`: min e mediana su al più `repeat` campioni. Ogni campione
+    ripete `fn` quanto basta a durare MIN_SAMPLE; ci si ferma prima se il caso supera `max_time`.
+    """
+    def sample(number):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        return time.perf_counter() - t0
+
+    number, t = 1, sample(1)
+    while t < MIN_SAMPLE:
+        number *= 10
+        t = sample(number)
+    samples = [t / number]
+    spent = 0.0
+    while len(samples) < repeat and spent + t <= max_time:
+        ts = sample(number)
+        spent += ts
+        samples.append(ts / number)
+    samples.sort()
+    return {"min": samples[0], "median": samples[len(samples) // 2], "samples": len(samples), "number": number}
+
+
+def run_suite(pattern="*", quick=False, repeat=DEFAULT_REPEAT, max_time=DEFAULT_MAX_TIME, log=print):
+    """Esegue i casi il cui nome corrisponde a `pattern` (fnmatch): dict nome caso -> misura."""
+    results = {}
+    for name, (setup, params, slow) in BENCHMARKS.items():
+        for param in params:
+            case = name + _label(param)
+            if not fnmatch.fnmatch(case, pattern) or (quick and param in slow):
+                continue
+            try:
+                res = measure(setup(param), repeat, max_time)
+            except ImportError as e:
+                res = {"skipped": f"manca {e.name}"}
+            results[case] = res
+            log(f"{case:<48} " + (res["skipped"] if "skipped" in res else _fmt_time(res["min"])))
+    return results
+
+
+def _fmt_time(sec):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if sec >= scale:
+            return f"{sec / scale:8.2f} {unit}"
+    return f"{sec / 1e-9:8.0f} ns"
+
+
+def save_baseline(path, results):
+    import numpy as np
+    meta = {"date": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+            "numpy": np.__version__, "machine": platform.platform(), "cpus": os.cpu_count()}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=1, sort_keys=True)
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Confronto con la baseline sui tempi minimi: righe (caso, baseline, attuale, rapporto, esito).
+    Esito "REGRESSIONE" se il rapporto supera 1 + threshold, "nuovo" per casi senza baseline.
+    """
+    rows = []
+    for case, res in results.items():
+        base = baseline.get(case)
+        if "skipped" in res or not base or "min" not in base:
+            rows.append((case, base.get("min") if base else None, res.get("min"), None, "nuovo" if not base else "saltato"))
+            continue
+        ratio = res["min"] / base["min"]
+        status = "REGRESSIONE" if ratio > 1 + threshold else "migliorato" if ratio < 1 / (1 + threshold) else "ok"
+        rows.append((case, base["min"], res["min"], ratio, status))
+    return rows
+
+
+def print_report(rows):
+    print(f"\n{'caso':<48} {'baseline':>11} {'attuale':>11} {'rapporto':>9}  esito")
+    for case, base, cur, ratio, status in rows:
+        print(f"{case:<48} {_fmt_time(base) if base else '-':>11} {_fmt_time(cur) if cur else '-':>11} "
+              f"{f'{ratio:.2f}x' if ratio else '-':>9}  {status}")
+
+
+def check_suite(args):
+    results = run_suite(args.filter, args.quick, args.repeat, args.max_time)
+    if args.save:
+        save_baseline(args.save, results)
+        print(f"baseline salvata in {args.save}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        rows = compare(results, baseline, args.threshold)
+        print_report(rows)
+        regressions = [r for r in rows if r[4] == "REGRESSIONE"]
+        if regressions:
+            print(f"ERRORE: {len(regressions)} casi oltre la soglia di +{args.threshold:.0%}")
+            return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m cfo_bench", description="Black Swan CFO OS - benchmark")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_imp = sub.add_parser("imports", help="budget del tempo di import a freddo del nucleo")
+    p_imp.add_argument("--budget", type=float, default=DEFAULT_IMPORT_BUDGET, help="secondi massimi")
+    p_imp.add_argument("--repeat", type=int, default=3)
+
+    p_suite = sub.add_parser("suite", help="benchmark di calcolo, export e rerun dell'app, con baseline")
+    p_suite.add_argument("--filter", default="*", help="pattern fnmatch sui nomi dei casi (es. 'kpi.*')")
+    p_suite.add_argument("--quick", action="store_true", help="esclude i casi più lenti (100k progetti mensili)")
+    p_suite.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="campioni per caso")
+    p_suite.add_argument("--max-time", type=float, default=DEFAULT_MAX_TIME, help="secondi massimi per caso")
+    p_suite.add_argument("--save", metavar="JSON", help="salva i risultati come baseline")
+    p_suite.add_argument("--compare", metavar="JSON", help="confronta con una baseline salvata")
+    p_suite.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="rallentamento tollerato (0.25 = +25%%)")
+
+    args = parser.parse_args(argv)
+    if args.command == "imports":
+        return check_imports(args.budget, args.repeat)
+    if args.command == "suite":
+        return check_suite(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
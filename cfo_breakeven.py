@@ -0,0 +1,74 @@
+# --- BREAK-EVEN MULTI-PRODOTTO ---
+# Punto di pareggio per un mix di SKU: margine di contribuzione ponderato, ricavi di
+# pareggio, margine di sicurezza per SKU e superficie di profitto prezzo x volume.
+# Tutto è vettoriale sull'array degli SKU: una tabella da 50k righe resta interattiva.
+
+import numpy as np
+
+# Colonne obbligatorie della tabella SKU ("mix" e "sku" facoltative)
+SKU_COLUMNS = ("price", "var_cost", "volume")
+
+
+def sku_arrays(df):
+    """Vettori price, var_cost, volume, mix da un DataFrame SKU (nomi colonna senza distinzione di maiuscole)."""
+    import pandas as pd
+    cols = {str(c).strip().lower(): c for c in df.columns}
+    missing = [c for c in SKU_COLUMNS if c not in cols]
+    if missing:
+        raise ValueError(f"Colonne mancanti nella tabella SKU: {', '.join(missing)}")
+    out = {c: pd.to_numeric(df[cols[c]], errors="coerce").fillna(0).to_numpy(dtype=float) for c in SKU_COLUMNS}
+    out["mix"] = (pd.to_numeric(df[cols["mix"]], errors="coerce").fillna(0).to_numpy(dtype=float)
+                  if "mix" in cols else None)
+    return out
+
+
+def mix_breakeven(price, var_cost, volume, fix_cost, mix=None):
+    """
+    Break-even di un mix di SKU con costi fissi comuni `fix_cost`.
+    `mix`: pesi del mix in unità (normalizzati); default = volumi attuali.
+    Restituisce un dict con scalari (wcm_unit, wcm_ratio, bep_units, bep_revenue, revenue,
+    profit, safety) e vettori per SKU (cm_unit, bep_units_sku, safety_sku).
+    Con margine ponderato non positivo il pareggio non esiste (bep NaN).
+    """
+    price, var_cost, volume = (np.asarray(x, dtype=float) for x in (price, var_cost, volume))
+    w = volume if mix is None else np.broadcast_to(np.asarray(mix, dtype=float), price.shape)
+    total = w.sum()
+    if total <= 0:
+        raise ValueError("I pesi del mix (o i volumi) devono avere somma positiva")
+    w = w / total
+
+    cm = price - var_cost
+    wcm = float(w @ cm)                    # margine di contribuzione medio per unità del mix
+    wprice = float(w @ price)
+    bep_units = fix_cost / wcm if wcm > 0 else np.nan
+    revenue = float(volume @ price)
+    profit = float(volume @ cm) - fix_cost
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bep_sku = w * bep_units
+        safety_sku = np.where(volume > 0, (volume - bep_sku) / volume, np.nan)
+    bep_revenue = bep_units * wprice
+    return {
+        "wcm_unit": wcm,
+        "wcm_ratio": wcm / wprice if wprice > 0 else np.nan,
+        "bep_units": bep_units,
+        "bep_revenue": bep_revenue,
+        "revenue": revenue,
+        "profit": profit,
+        "safety": (revenue - bep_revenue) / revenue if revenue > 0 else np.nan,
+        "cm_unit": cm,
+        "bep_units_sku": bep_sku,
+        "safety_sku": safety_sku,
+    }
+
+
+def profit_surface(price, var_cost, volume, fix_cost, price_factors, volume_factors):
+    """
+    Profitto al variare di prezzi (tutti moltiplicati per `price_factors`) e volumi
+    (per `volume_factors`): matrice len(volume_factors) x len(price_factors).
+    Il mix resta fisso, quindi bastano ricavi e costi variabili totali: costo O(SKU + celle).
+    """
+    price, var_cost, volume = (np.asarray(x, dtype=float) for x in (price, var_cost, volume))
+    rev, var = float(volume @ price), float(volume @ var_cost)
+    a = np.asarray(price_factors, dtype=float)[None, :]
+    b = np.asarray(volume_factors, dtype=float)[:, None]
+    return b * (a * rev - var) - fix_cost
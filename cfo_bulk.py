@@ -0,0 +1,151 @@
+# --- EXPORT MASSIVO DEI REPORT ---
+# Genera i report PDF/PPTX per molte aziende (es. tutte le controllate a fine trimestre)
+# in un pool di processi e li scrive in un archivio zip man mano che sono pronti.
+#
+# Uso:
+#   python -m cfo_bulk aziende.csv -o executive_packs.zip --formats pdf,pptx --workers 8
+#
+# Il file di input ha una colonna "company" (nome azienda), opzionalmente "currency"
+# (€, $, £) e le colonne dei driver di cfo_engine.DEFAULT_INPUTS come in cfo_batch.
+# Ogni worker precarica una volta il template PPTX e i font FPDF; il processo principale
+# tiene in memoria solo i report in lavorazione (finestra limitata), non l'intero pacchetto.
+
+import argparse
+import io
+import os
+import re
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from cfo_batch import iter_chunks
+from cfo_engine import DEFAULT_INPUTS, evaluate_scenarios
+from cfo_languages import LANGUAGES
+from cfo_reports import build_export_data, build_recoms, generate_pdf, generate_pptx
+
+FORMATS = ("pdf", "pptx")
+DEFAULT_CURRENCY = "€"
+
+# Stato per worker, impostato dall'initializer del pool
+_TEMPLATE = None
+
+
+def default_template():
+    """Bytes del template standard di python-pptx."""
+    import pptx
+    with open(os.path.join(os.path.dirname(pptx.__file__), "templates", "default.pptx"), "rb") as f:
+        return f.read()
+
+
+def _init_worker(template):
+    # Precarica template e font una volta per processo: il primo report non paga il riscaldamento
+    global _TEMPLATE
+    _TEMPLATE = template
+    generate_pdf({"-": "-"}, [], "warmup")
+    generate_pptx({"-": "-"}, [], "warmup", template=_TEMPLATE)
+
+
+def render(job):
+    """Genera i file di un'azienda: restituisce una lista di (nome file, bytes)."""
+    name, data, recoms, formats = job
+    files = []
+    if "pdf" in formats:
+        files.append((f"{name}_Report.pdf", generate_pdf(data, recoms, f"{name} - Strategic Report")))
+    if "pptx" in formats:
+        files.append((f"{name}_Executive.pptx",
+                      generate_pptx(data, recoms, f"{name} Executive", template=_TEMPLATE)))
+    return files
+
+
+def _safe_name(name, seen):
+    # Nome file sicuro e univoco dentro l'archivio
+    base = re.sub(r"[^\w\-. ]+", "_", str(name)).strip() or "azienda"
+    out, i = base, 1
+    while out in seen:
+        i += 1
+        out = f"{base}_{i}"
+    seen.add(out)
+    return out
+
+
+def iter_jobs(input_path, lang="Italiano", formats=FORMATS, chunk_size=10_000):
+    """Valuta gli scenari a blocchi e produce un job di rendering per azienda."""
+    L = LANGUAGES[lang]
+    seen = set()
+    for df in iter_chunks(input_path, chunk_size):
+        if "company" not in df.columns:
+            raise ValueError("Il file di input deve avere una colonna 'company'")
+        inputs = {c: df[c].to_numpy(dtype=float) for c in df.columns if c in DEFAULT_INPUTS}
+        k = evaluate_scenarios(inputs)
+        currency = df["currency"] if "currency" in df.columns else [DEFAULT_CURRENCY] * len(df)
+        for i, (company, valuta) in enumerate(zip(df["company"], currency)):
+            data = build_export_data(L, valuta, k["npv"][i], k["irr"][i], k["pfn"][i],
+                                     k["ltv_cac"][i], k["safety"][i])
+            flags = {f: k[f"flag_{f}"][i] for f in ("npv", "liq", "saas", "stress")}
+            yield _safe_name(company, seen), data, build_recoms(L, flags), tuple(formats)
+
+
+def write_zip(jobs, out, workers=None, template=None, max_in_flight=None):
+    """
+    Esegue `jobs` in un pool di processi e scrive ogni file nello zip `out` (percorso o
+    file-like) appena pronto. Restituisce il numero di file scritti.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 4
+    template = template if template is not None else default_template()
+    written = 0
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(template,)) as pool:
+        pending = set()
+        jobs = iter(jobs)
+        exhausted = False
+        while pending or not exhausted:
+            # Finestra scorrevole: nuovi job solo quando quelli in volo scendono sotto il limite
+            while not exhausted and len(pending) < max_in_flight:
+                job = next(jobs, None)
+                if job is None:
+                    exhausted = True
+                else:
+                    pending.add(pool.submit(render, job))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                for fname, payload in fut.result():
+                    # I .pptx sono già zip compressi: memorizzati senza ricomprimere
+                    ctype = zipfile.ZIP_STORED if fname.endswith(".pptx") else zipfile.ZIP_DEFLATED
+                    zf.writestr(fname, payload, compress_type=ctype)
+                    written += 1
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m cfo_bulk",
+                                     description="Black Swan CFO OS - report PDF/PPTX per molte aziende")
+    parser.add_argument("input", help="file aziende/scenari (.csv o .parquet) con colonna 'company'")
+    parser.add_argument("-o", "--output", required=True, help="archivio .zip di output")
+    parser.add_argument("--formats", default="pdf,pptx", help="formati separati da virgola (pdf, pptx)")
+    parser.add_argument("--workers", type=int, default=None, help="processi (default: tutti i core)")
+    parser.add_argument("--lang", default="Italiano", choices=list(LANGUAGES.keys()))
+    parser.add_argument("--template", help="template .pptx aziendale (default: quello di python-pptx)")
+    args = parser.parse_args(argv)
+
+    formats = tuple(f.strip().lower() for f in args.formats.split(",") if f.strip())
+    if not formats or set(formats) - set(FORMATS):
+        parser.error(f"--formats deve contenere solo: {', '.join(FORMATS)}")
+    if not os.path.exists(args.input):
+        parser.error(f"file non trovato: {args.input}")
+    template = None
+    if args.template:
+        with open(args.template, "rb") as f:
+            template = f.read()
+
+    t0 = time.perf_counter()
+    n = write_zip(iter_jobs(args.input, args.lang, formats), args.output, args.workers, template)
+    print(f"{n:,} file generati in {time.perf_counter() - t0:.2f}s -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
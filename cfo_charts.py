@@ -0,0 +1,141 @@
+# --- GRAFICI PLOTLY ---
+# Template di layout condiviso (registrato una sola volta all'import) e costruttori dei
+# grafici ricorrenti dell'app. I costruttori sono funzioni pure dei dati: l'app li mette
+# in cache per hash dei dati, quindi un rerun con dati invariati riusa la stessa figura.
+# Le serie più lunghe di MAX_POINTS vengono ridotte con LTTB prima di andare al browser.
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from cfo_theme import COLORS
+
+TEMPLATE = "black_swan"
+MAX_POINTS = 2000             # punti per serie oltre i quali si applica LTTB
+
+# Template compatto: solo le voci usate. Plotly incorpora il template in ogni figura
+# serializzata, e "plotly_white" completo pesa ~7 KB per grafico.
+pio.templates[TEMPLATE] = go.layout.Template(layout=dict(
+    font=dict(family="Arial, sans-serif", color=COLORS["primary"]),
+    colorway=[COLORS[c] for c in ("secondary", "danger", "success", "neutral", "primary")],
+    paper_bgcolor="white",
+    plot_bgcolor="white",
+    xaxis=dict(gridcolor="#EBF0F8", zerolinecolor="#EBF0F8", automargin=True),
+    yaxis=dict(gridcolor="#EBF0F8", zerolinecolor="#EBF0F8", automargin=True),
+    hoverlabel=dict(align="left"),
+    margin=dict(t=50, b=40, l=10, r=10),
+))
+
+
+def lttb(x, y, n_out):
+    """
+    Indici dei punti scelti da Largest-Triangle-Three-Buckets: primo e ultimo punto
+    più, per ogni bucket intermedio, il punto che forma il triangolo di area massima con
+    il punto scelto prima e la media del bucket successivo. Conserva picchi e minimi.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # n_out - 2 bucket sui punti 1..n-2; il bucket "successivo" dell'ultimo è l'ultimo punto
+    edges = np.append(np.linspace(1, n - 1, n_out - 1).astype(np.int64), n)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi, nxt = edges[i], edges[i + 1], edges[i + 2]
+        cx, cy = x[hi:nxt].mean(), y[hi:nxt].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        idx[i + 1] = a
+    return idx
+
+
+def downsample(x, y, max_points=MAX_POINTS):
+    """(x, y) ridotti a `max_points` con LTTB; invariati se già abbastanza corti.
+    Con x non numerico (date, etichette) i punti si assumono equispaziati."""
+    x, y = np.asarray(x), np.asarray(y, dtype=float)
+    if len(y) <= max_points:
+        return x, y
+    pos = x if x.dtype.kind in "iuf" else np.arange(len(y))
+    idx = lttb(pos, y, max_points)
+    return x[idx], y[idx]
+
+
+def cash_flow_chart(labels, cf, currency, names=("FCF Annuo", "Flusso Cumulato")):
+    """Flussi di cassa per periodo (barre rosse se negativi) e cumulato (linea)."""
+    cf = np.asarray(cf, dtype=float)
+    x, bars = downsample(labels, cf)
+    xc, cum = downsample(labels, np.cumsum(cf))
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=x, y=bars, name=names[0],
+        marker=dict(color=np.where(bars < 0, COLORS['danger'], COLORS['secondary'])),
+        text=bars / 1000, texttemplate="%{text:.0f}k", textposition='outside'
+    ))
+    fig.add_trace(go.Scatter(
+        x=xc, y=cum, name=names[1],
+        line=dict(color=COLORS['accent'], width=4),
+        mode='lines+markers' if len(cum) <= 100 else 'lines',
+        marker=dict(size=10, line=dict(color="white", width=2))
+    ))
+    fig.update_layout(
+        template=TEMPLATE,
+        hovermode="x unified",
+        xaxis_title="Orizzonte Temporale",
+        yaxis_title=f"Cash Flow ({currency})",
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    return fig
+
+
+def spread_chart(labels, roic_pct, wacc_pct, names=("ROIC (Rendimento)", "WACC (Costo Hurdle)")):
+    """ROIC per periodo (barre, in %) contro il WACC (linea orizzontale)."""
+    x, roic = downsample(labels, roic_pct)
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=x, y=roic, name=names[0], marker=dict(color=COLORS['accent'])))
+    fig.add_trace(go.Scatter(
+        x=[x[0], x[-1]], y=[wacc_pct, wacc_pct], name=names[1],
+        line=dict(color=COLORS['danger'], width=3, dash='dash'), mode='lines'
+    ))
+    fig.update_layout(yaxis_ticksuffix="%", template=TEMPLATE, xaxis_title="Anni")
+    return fig
+
+
+def ccc_chart(dso, dio, dpo, title):
+    """Composizione del ciclo di cassa: DSO e DIO in avanti, DPO all'indietro."""
+    fig = go.Figure()
+    for name, val, color in (("DSO (Incasso)", dso, 'secondary'), ("DIO (Magazzino)", dio, 'neutral'),
+                             ("DPO (Debiti)", -dpo, 'accent')):
+        fig.add_trace(go.Bar(y=["Ciclo"], x=[val], name=name, orientation='h', marker=dict(color=COLORS[color])))
+    fig.update_layout(barmode='relative', template=TEMPLATE, height=250, title=title)
+    return fig
+
+
+def stress_chart(base_ebitda, stress_ebitda, title, names=("Scenario Base", "Scenario Shock")):
+    """EBITDA base contro EBITDA sotto shock."""
+    fig = go.Figure(go.Bar(
+        x=list(names), y=[base_ebitda, stress_ebitda],
+        marker=dict(color=[COLORS['primary'], COLORS['danger']]),
+        text=[base_ebitda / 1000, stress_ebitda / 1000], texttemplate="%{text:.0f}k", textposition='auto'
+    ))
+    fig.update_layout(title=title, template=TEMPLATE)
+    return fig
+
+
+def line_chart(x, y, color, name=None, fill=None, zero_line=False, point=None, **layout):
+    """
+    Serie singola (ridotta con LTTB se lunga). `point`: (x, y, nome) di un punto da
+    evidenziare; `zero_line`: linea tratteggiata a y=0; `layout`: voci di update_layout.
+    """
+    x, y = downsample(x, y)
+    fig = go.Figure(go.Scatter(x=x, y=y, mode="lines", name=name, fill=fill,
+                               line=dict(color=COLORS[color], width=3)))
+    if zero_line:
+        fig.add_hline(y=0, line=dict(color=COLORS['danger'], dash='dash'))
+    if point is not None:
+        fig.add_trace(go.Scatter(x=[point[0]], y=[point[1]], mode="markers", name=point[2],
+                                 marker=dict(color=COLORS['danger'], size=12)))
+    fig.update_layout(template=TEMPLATE, **layout)
+    return fig
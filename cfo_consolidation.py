@@ -0,0 +1,267 @@
+# --- CONSOLIDATO DI GRUPPO CON CAMBI ---
+# Consolida centinaia di entità legali: driver per entità (stesse chiavi dell'app) in
+# valuta locale, tabella dei cambi datata, partite intercompany. I flussi di ogni entità
+# sono righe di una matrice entità x periodo convertite al cambio in vigore a fine
+# periodo; i totali per segmento e di gruppo sono un group-by vettoriale (matrice di
+# appartenenza x matrice dei valori). I flussi locali sono in cache per hash dei driver
+# dell'entità: modificando un'entità si ricalcola solo il suo contributo.
+
+import numpy as np
+import pandas as pd
+
+from cfo_engine import DEFAULT_INPUTS, npv
+
+# Driver che determinano i flussi (cambiandoli si ricalcola l'entità) e driver di stato
+# patrimoniale / circolante letti direttamente a ogni consolidamento
+FLOW_DRIVERS = ("capex", "years", "rev1", "growth", "cogs_p", "opex1", "opex_g", "tax_r")
+BALANCE_DRIVERS = ("wacc", "cash", "debt", "dso", "dio", "dpo")
+ENTITY_COLUMNS = ("entity", "currency")       # obbligatorie; "segment" facoltativa
+FX_COLUMNS = ("date", "currency", "rate")     # rate = unità di valuta di gruppo per 1 unità locale
+IC_KINDS = ("sale", "loan")
+FLOWS = ("cf", "revenue", "cogs", "ebitda")
+GROUP_SEGMENT = "Gruppo"
+
+_DAY_SPAN = 10 ** 6                           # giorni per valuta nelle chiavi composte dei cambi
+
+
+def _numeric(df, name, default):
+    if name not in df.columns:
+        return np.full(len(df), float(default))
+    return pd.to_numeric(df[name], errors="coerce").fillna(default).to_numpy(dtype=float)
+
+
+def _require(df, columns, what):
+    missing = [c for c in columns if c not in df.columns]
+    if missing:
+        raise ValueError(f"Colonne mancanti nella tabella {what}: {', '.join(missing)}")
+
+
+def period_dates(start, horizon):
+    """Data di fine periodo per i periodi 0..horizon (anni dalla data `start`)."""
+    start = np.datetime64(start, "D")
+    month = np.datetime64(start, "M")
+    day = (start - month.astype("datetime64[D]")).astype(int)
+    return (month + 12 * np.arange(horizon + 1)).astype("datetime64[D]") + day
+
+
+class FxTable:
+    """
+    Tabella dei cambi (colonne FX_COLUMNS) indicizzata per ricerche vettoriali: tutte le
+    valute in un solo array ordinato di chiavi composte (valuta, giorno). Le righe senza
+    data, tasso o valuta (es. righe appena aggiunte nell'editor) vengono ignorate.
+    """
+
+    def __init__(self, fx, group_currency):
+        _require(fx, FX_COLUMNS, "cambi")
+        self.group = str(group_currency).upper()
+        cur = fx["currency"].fillna("").astype(str).str.strip().str.upper()
+        date = pd.to_datetime(fx["date"], errors="coerce")
+        rate = pd.to_numeric(fx["rate"], errors="coerce")
+        ok = ((cur != "") & date.notna() & rate.notna()).to_numpy()
+        self.codes, code = np.unique(cur.to_numpy()[ok], return_inverse=True)
+        day = date.to_numpy()[ok].astype("datetime64[D]").astype(np.int64)
+        self.base = int(day.min(initial=0)) - _DAY_SPAN // 2
+        keys = code * _DAY_SPAN + (day - self.base)
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.rates = rate.to_numpy(dtype=float)[ok][order]
+
+    def lookup(self, currencies, dates):
+        """
+        Cambio (valuta di gruppo per unità locale) per ogni coppia valuta / data (array
+        della stessa forma): ultimo tasso con data <= data richiesta; il primo della valuta
+        per date precedenti, l'ultimo oltre la fine della tabella. Valuta di gruppo = 1.
+        """
+        cur = np.char.upper(np.asarray(currencies).astype(str))
+        day = np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+        if len(self.keys):
+            code = np.searchsorted(self.codes, cur)
+            known = (code < len(self.codes)) & (self.codes[np.minimum(code, len(self.codes) - 1)] == cur)
+            lo = code * _DAY_SPAN
+            pos = np.searchsorted(self.keys, lo + np.clip(day - self.base, 0, _DAY_SPAN - 1), side="right") - 1
+            first = np.searchsorted(self.keys, lo, side="left")
+            # Nessun tasso fino a quella data: primo tasso della valuta
+            pos = np.where((pos >= 0) & (pos >= first), pos, first)
+            out = np.where(known, self.rates[np.clip(pos, 0, len(self.rates) - 1)], np.nan)
+        else:
+            # Tabella vuota: convertibile solo la valuta di gruppo
+            out = np.full(cur.shape, np.nan)
+        out = np.where(cur == self.group, 1.0, out)
+        if np.isnan(out).any():
+            raise ValueError(f"Cambi mancanti per: {', '.join(sorted(set(cur[np.isnan(out)].tolist())))}")
+        return out
+
+    def grid(self, currencies, dates):
+        """Matrice N x T dei cambi per N valute e T date (una ricerca per valuta distinta)."""
+        codes, inv = np.unique(np.asarray(currencies).astype(str), return_inverse=True)
+        dates = np.asarray(dates, dtype="datetime64[D]")[None, :]
+        return self.lookup(*np.broadcast_arrays(codes[:, None], dates))[inv]
+
+
+class Consolidation:
+    """
+    Modello di consolidato incrementale. update() riceve la tabella delle entità e
+    ricalcola i flussi locali solo delle entità nuove o con driver di flusso cambiati;
+    consolidate() converte, elimina l'intercompany e aggrega per segmento e gruppo.
+    """
+
+    def __init__(self):
+        # Flussi locali impilati: righe allineate a self.entities, colonne = periodi 0..W-1
+        self._ids = pd.Index([])
+        self._hash = np.zeros(0, dtype=np.uint64)
+        self._width = np.zeros(0, dtype=int)
+        self._flows = {k: np.zeros((0, 1)) for k in FLOWS}
+        self.entities = None
+
+    def update(self, entities, defaults=None):
+        """
+        Allinea il modello alla tabella `entities` (driver mancanti da `defaults` o dai
+        default dell'app): restituisce gli id delle entità ricalcolate.
+        """
+        from cfo_engine import project_cash_flows
+        _require(entities, ENTITY_COLUMNS, "entità")
+        df = entities.reset_index(drop=True)
+        ids = pd.Index(df["entity"].fillna("").astype(str))
+        if ids.has_duplicates:
+            raise ValueError("Id entità duplicati nella tabella delle entità")
+        defaults = {**DEFAULT_INPUTS, **(defaults or {})}
+        x = pd.DataFrame({k: _numeric(df, k, defaults[k]) for k in FLOW_DRIVERS})
+        row_hash = pd.util.hash_pandas_object(x, index=False).to_numpy()
+
+        old = self._ids.get_indexer(ids)
+        changed = (old < 0) | (self._hash[np.maximum(old, 0)] != row_hash) if len(self._ids) else \
+            np.ones(len(ids), dtype=bool)
+        idx = np.flatnonzero(changed)
+        keep = np.flatnonzero(~changed)
+        f = None
+        if len(idx):
+            sub = x.iloc[idx]
+            f = project_cash_flows(*(sub[k].to_numpy() for k in FLOW_DRIVERS))
+        width = np.zeros(len(ids), dtype=int)
+        width[keep] = self._width[old[keep]]
+        if f is not None:
+            width[idx] = f["n_periods"].astype(int) + 1
+
+        # Nuove matrici: righe invariate copiate, righe cambiate dal motore
+        w = int(width.max(initial=1))
+        flows = {k: np.zeros((len(ids), w)) for k in FLOWS}
+        for k in FLOWS:
+            prev = self._flows[k]
+            n = min(w, prev.shape[1])
+            flows[k][keep, :n] = prev[old[keep], :n]
+        if f is not None:
+            # Periodo 0 = oggi (capex); ricavi, COGS ed EBITDA dal periodo 1
+            n = f["cf"].shape[1]
+            flows["cf"][idx, :n] = f["cf"]
+            flows["revenue"][idx, 1:n] = f["revenue"]
+            flows["ebitda"][idx, 1:n] = f["ebitda"]
+            flows["cogs"][idx, 1:n] = f["revenue"] * sub["cogs_p"].to_numpy()[:, None]
+        self._ids, self._hash, self._width, self._flows = ids, row_hash, width, flows
+
+        segment = df["segment"] if "segment" in df.columns else pd.Series(GROUP_SEGMENT, index=df.index)
+        meta = pd.DataFrame({"entity": ids.to_numpy(),
+                             "currency": df["currency"].fillna("").astype(str).str.upper().to_numpy(),
+                             "segment": segment.fillna(GROUP_SEGMENT).astype(str).to_numpy()})
+        for k in BALANCE_DRIVERS:
+            meta[k] = _numeric(df, k, defaults[k])
+        self.entities = meta
+        return ids[changed].tolist()
+
+    def consolidate(self, fx, intercompany=None, group_currency="EUR", start=None):
+        """
+        Consolidato in `group_currency` alla data `start` (default oggi). I flussi del periodo t
+        usano il cambio in vigore a fine periodo, cassa e debito quello di `start`; l'NPV di
+        ogni entità sconta i flussi convertiti al suo WACC.
+        `intercompany`: righe seller, buyer, amount (valuta di `currency`, default quella del
+        seller), kind ("sale" = vendita nell'anno `year`, default 1; "loan" = finanziamento
+        in essere). Le vendite si eliminano da ricavi e COGS (EBITDA invariato), i
+        finanziamenti dal debito; in un segmento solo se entrambe le parti vi appartengono.
+        Restituisce dict con segments (DataFrame per segmento + riga di gruppo), entities
+        (contributi per entità), periods (ricavi ed EBITDA di gruppo per periodo) ed
+        eliminations (totali eliminati e righe senza controparte nel perimetro).
+        """
+        if self.entities is None:
+            raise ValueError("Nessuna entità caricata: chiamare update() prima di consolidate()")
+        ent = self.entities
+        table = fx if isinstance(fx, FxTable) else FxTable(fx, group_currency)
+        start = np.datetime64(start or np.datetime64("today"), "D")
+        horizon = self._flows["cf"].shape[1] - 1
+        dates = period_dates(start, horizon)
+        rate = table.grid(ent["currency"].to_numpy(), dates)            # E x (T+1)
+        spot = rate[:, 0]
+
+        flows = {k: self._flows[k] * rate for k in FLOWS}
+        ent_npv = npv(ent["wacc"].to_numpy(), flows["cf"])
+        cash, debt = ent["cash"].to_numpy() * spot, ent["debt"].to_numpy() * spot
+
+        segs, seg_code = np.unique(ent["segment"].to_numpy(), return_inverse=True)
+        member = seg_code[None, :] == np.arange(len(segs))[:, None]    # segmento x entità
+        onehot = member.astype(float)
+
+        elim_rev = np.zeros((len(segs), horizon + 1))
+        elim_debt = np.zeros(len(segs))
+        group_rev, group_debt, unmatched = np.zeros(horizon + 1), 0.0, 0
+        if intercompany is not None and len(intercompany):
+            _require(intercompany, ("seller", "buyer", "amount", "kind"), "intercompany")
+            pos = pd.Series(np.arange(len(ent)), index=ent["entity"])
+            s_i = pos.reindex(intercompany["seller"].astype(str)).to_numpy()
+            b_i = pos.reindex(intercompany["buyer"].astype(str)).to_numpy()
+            ok = ~(np.isnan(s_i) | np.isnan(b_i))
+            unmatched = int((~ok).sum())
+            ic = intercompany[ok]
+            s_i, b_i = s_i[ok].astype(int), b_i[ok].astype(int)
+            kind = ic["kind"].astype(str).str.lower().to_numpy()
+            bad = set(kind) - set(IC_KINDS)
+            if bad:
+                raise ValueError(f"Tipi intercompany non riconosciuti: {sorted(bad)}")
+            ccy = (ic["currency"].astype(str).str.upper().to_numpy() if "currency" in ic.columns
+                   else ent["currency"].to_numpy()[s_i])
+            year = np.clip(_numeric(ic, "year", 1).astype(int), 0, horizon)
+            is_sale = kind == "sale"
+            # Vendite al cambio di fine anno, finanziamenti al cambio di `start`
+            amount = _numeric(ic, "amount", 0.0) * table.lookup(ccy, np.where(is_sale, dates[year], start))
+            same = seg_code[s_i] == seg_code[b_i]
+            np.add.at(elim_rev, (seg_code[s_i][is_sale & same], year[is_sale & same]), amount[is_sale & same])
+            np.add.at(elim_debt, seg_code[s_i][~is_sale & same], amount[~is_sale & same])
+            np.add.at(group_rev, year[is_sale], amount[is_sale])
+            group_debt = float(amount[~is_sale].sum())
+
+        def rollup(elim_r, elim_d, w):
+            # Aggregati di un insieme di entità (w: pesi 0/1 per entità, righe = insiemi)
+            rev = w @ flows["revenue"] - elim_r
+            cogs = w @ flows["cogs"] - elim_r
+            ebitda = w @ flows["ebitda"]
+            rev1 = w @ flows["revenue"][:, 1]
+            cogs1 = w @ flows["cogs"][:, 1]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                dso = (w @ (ent["dso"].to_numpy() * flows["revenue"][:, 1])) / rev1
+                dio = (w @ (ent["dio"].to_numpy() * flows["cogs"][:, 1])) / cogs1
+                dpo = (w @ (ent["dpo"].to_numpy() * flows["cogs"][:, 1])) / cogs1
+            return {
+                "npv": w @ ent_npv,
+                "pfn": w @ debt - elim_d - w @ cash,
+                "ccc": dso + dio - dpo,
+                "ebitda": ebitda[:, 1],
+                "revenue": rev[:, 1],
+                "entities": w.sum(axis=1).astype(int),
+            }, rev, ebitda
+
+        seg_kpi, _, _ = rollup(elim_rev, elim_debt, onehot)
+        grp_kpi, grp_rev, grp_ebitda = rollup(group_rev[None, :], np.array([group_debt]), np.ones((1, len(ent))))
+        segments = pd.concat([pd.DataFrame({"segment": segs, **seg_kpi}),
+                              pd.DataFrame({"segment": ["Totale"], **grp_kpi})], ignore_index=True)
+        entities = ent[["entity", "segment", "currency"]].assign(
+            npv=ent_npv, ebitda=flows["ebitda"][:, 1], revenue=flows["revenue"][:, 1], pfn=debt - cash)
+        return {
+            "segments": segments,
+            "entities": entities,
+            "periods": {"dates": dates, "revenue": grp_rev[0], "ebitda": grp_ebitda[0]},
+            "eliminations": {"revenue": float(group_rev.sum()), "debt": group_debt, "unmatched": unmatched},
+        }
+
+
+def consolidate(entities, fx, intercompany=None, group_currency="EUR", start=None, defaults=None):
+    """Consolidato in un passo (senza riuso tra chiamate): vedi Consolidation.consolidate()."""
+    model = Consolidation()
+    model.update(entities, defaults)
+    return model.consolidate(fx, intercompany, group_currency, start)
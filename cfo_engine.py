@@ -0,0 +1,280 @@
+# --- MOTORE DI CALCOLO CFO OS ---
+# Modulo importabile senza Streamlit: tutte le funzioni lavorano su array NumPy
+# e valutano N progetti in un colpo solo tramite broadcasting.
+
+import numpy as np
+
+from cfo_irr import solve_irr
+from cfo_profiling import PROFILER
+
+# Chiavi dei driver di investimento, nell'ordine degli input della tab Investimenti
+INVEST_DRIVERS = ("capex", "years", "wacc", "rev1", "growth", "cogs_p", "opex1", "opex_g", "tax_r")
+
+# Celle (progetti x periodi) per blocco nelle valutazioni massive: limita la memoria
+# anche con orizzonti lunghi (es. 480 periodi mensili)
+MAX_BLOCK_CELLS = 1_000_000
+
+
+def block_rows(n_periods, max_cells=MAX_BLOCK_CELLS):
+    """Numero di progetti per blocco a parità di memoria, dato l'orizzonte in periodi."""
+    return max(1, int(max_cells) // max(1, int(n_periods)))
+
+
+def _broadcast_drivers(**drivers):
+    # Porta tutti i driver a vettori 1-D della stessa lunghezza N
+    arrays = [np.atleast_1d(np.asarray(v, dtype=float)) for v in drivers.values()]
+    arrays = np.broadcast_arrays(*arrays)
+    if arrays[0].ndim != 1:
+        raise ValueError("I driver devono essere scalari o vettori 1-D")
+    return dict(zip(drivers.keys(), arrays))
+
+
+def npv(rate, cf):
+    """NPV di ogni riga di `cf` (N x T) al tasso `rate` (scalare o vettore N), flusso 0 non scontato."""
+    cf = np.atleast_2d(np.asarray(cf, dtype=float))
+    rate = np.asarray(rate, dtype=float).reshape(-1, 1)
+    t = np.arange(cf.shape[1])
+    return (cf / (1.0 + rate) ** t).sum(axis=1)
+
+
+def payback(cf):
+    """Primo periodo in cui il flusso cumulato torna >= 0; NaN se mai raggiunto."""
+    cum = np.cumsum(np.atleast_2d(cf), axis=1)
+    hit = cum >= 0
+    idx = hit.argmax(axis=1).astype(float)
+    idx[~hit.any(axis=1)] = np.nan
+    return idx
+
+
+def project_cash_flows(capex, years, rev1, growth, cogs_p, opex1, opex_g, tax_r,
+                       periods_per_year=1, dep_years=None, tax_carryforward=False):
+    """
+    Flussi operativi di N progetti, indipendenti dal tasso di sconto.
+    Restituisce un dict con cf (N x T+1, capex in colonna 0, senza valore terminale),
+    le matrici per periodo revenue, ebitda, nopat, fcf, roic, active e n_periods (vettore N).
+    """
+    d = _broadcast_drivers(capex=capex, years=years, rev1=rev1, growth=growth,
+                           cogs_p=cogs_p, opex1=opex1, opex_g=opex_g, tax_r=tax_r)
+    ppy = int(periods_per_year)
+    if ppy < 1:
+        raise ValueError("periods_per_year deve essere almeno 1")
+    years_n = d["years"].astype(int)
+    if (years_n < 1).any():
+        raise ValueError("L'orizzonte deve essere di almeno 1 anno")
+    dep_n = years_n if dep_years is None else np.broadcast_to(np.asarray(dep_years, dtype=int), years_n.shape)
+    if (dep_n < 1).any():
+        raise ValueError("Gli anni di ammortamento devono essere almeno 1")
+
+    n_periods = years_n * ppy
+    horizon = int(n_periods.max())
+    t = np.arange(1, horizon + 1)                      # periodi 1..H
+    year_idx = (t - 1) // ppy                          # 0 per i periodi del primo anno
+    active = t[None, :] <= n_periods[:, None]          # progetti con orizzonte più corto
+
+    col = {k: v[:, None] for k, v in d.items()}
+    # Fattori di crescita calcolati per anno e poi ripetuti sui periodi: niente potenze per periodo
+    y = np.arange(int(years_n.max()))
+    revenue = (col["rev1"] / ppy * (1 + col["growth"]) ** y)[:, year_idx]
+    cogs = revenue * col["cogs_p"]
+    opex = (col["opex1"] / ppy * (1 + col["opex_g"]) ** y)[:, year_idx]
+    ebitda = revenue - cogs - opex
+    dep_periods = (dep_n * ppy)[:, None]
+    da = np.where(t <= dep_periods, col["capex"] / dep_periods, 0.0)
+    ebit = np.where(active, ebitda - da, 0.0)
+    if tax_carryforward:
+        # Imponibile cumulato al netto delle perdite pregresse = max(0, massimo corrente dell'EBIT cumulato)
+        taxed = np.maximum(0, np.maximum.accumulate(np.cumsum(ebit, axis=1), axis=1))
+        tax = np.diff(taxed, axis=1, prepend=0.0) * col["tax_r"]
+    else:
+        tax = np.maximum(0, ebit * col["tax_r"])
+    nopat = ebit - tax
+    fcf = nopat + da
+
+    # I periodi oltre l'orizzonte del singolo progetto non esistono
+    revenue, ebitda, nopat, fcf = (np.where(active, m, 0.0) for m in (revenue, ebitda, nopat, fcf))
+
+    # Rendimento annualizzato calcolato sul CAPEX iniziale per spread
+    with np.errstate(divide="ignore", invalid="ignore"):
+        roic = np.where(col["capex"] > 0, nopat * ppy / col["capex"] * 100, 0.0)
+    roic = np.where(active, roic, 0.0)
+
+    return {
+        "cf": np.hstack([-d["capex"][:, None], fcf]),
+        "revenue": revenue,
+        "ebitda": ebitda,
+        "nopat": nopat,
+        "fcf": fcf,
+        "roic": roic,
+        "active": active,
+        "n_periods": n_periods,
+    }
+
+
+def value_cash_flows(cf, n_periods, wacc, periods_per_year=1, terminal_growth=None, with_irr=True):
+    """
+    Valutazione dei flussi di project_cash_flows al WACC annuo `wacc` (scalare o vettore N).
+    Restituisce un dict con vettori N npv, payback (anni), terminal_value, la matrice cf
+    comprensiva del valore terminale e, con `with_irr`, irr (annualizzato) e irr_status.
+    """
+    cf = np.atleast_2d(np.asarray(cf, dtype=float))
+    n_periods = np.atleast_1d(np.asarray(n_periods, dtype=int))
+    ppy = int(periods_per_year)
+    rate = np.broadcast_to((1 + np.asarray(wacc, dtype=float)) ** (1 / ppy) - 1, (cf.shape[0],))
+
+    terminal = np.zeros(cf.shape[0])
+    cf_val = cf
+    if terminal_growth is not None:
+        g = (1 + np.broadcast_to(np.asarray(terminal_growth, dtype=float), rate.shape)) ** (1 / ppy) - 1
+        rows = np.arange(cf.shape[0])
+        # Gordon definito solo con crescita < WACC: altrimenti valore terminale (e NPV) NaN
+        with np.errstate(divide="ignore", invalid="ignore"):
+            terminal = np.where(g < rate, cf[rows, n_periods] * (1 + g) / (rate - g), np.nan)
+        cf_val = cf.copy()
+        cf_val[rows, n_periods] += terminal
+
+    out = {
+        "npv": npv(rate, cf_val),
+        "payback": payback(cf) / ppy,
+        "terminal_value": terminal,
+        "cf": cf_val,
+    }
+    if with_irr:
+        with PROFILER.section("engine.irr"):
+            irr = solve_irr(cf_val, guess=(1.1) ** (1 / ppy) - 1)
+        out["irr"] = (1 + irr["irr"]) ** ppy - 1        # IRR annualizzato
+        out["irr_status"] = irr["status"]
+    return out
+
+
+def evaluate_projects(capex, years, wacc, rev1, growth, cogs_p, opex1, opex_g, tax_r, with_irr=True,
+                      periods_per_year=1, dep_years=None, tax_carryforward=False, terminal_growth=None):
+    """
+    Valuta N progetti di investimento (stessa logica della tab Investimenti).
+    Ogni driver può essere scalare o vettore di lunghezza N; le percentuali sono decimali e annue.
+    Restituisce un dict con vettori N (npv, irr, irr_status, payback in anni, terminal_value)
+    e matrici N x T per periodo (T = anni x periods_per_year).
+    Con `with_irr=False` il solutore IRR viene saltato e le chiavi irr/irr_status non ci sono.
+
+    Opzioni (default = modello annuale originale):
+      periods_per_year  1 = annuale, 12 = mensile; ricavi e OPEX crescono a scatti annuali
+      dep_years         anni di ammortamento a quote costanti del capex (default: orizzonte)
+      tax_carryforward  le perdite fiscali riducono l'imponibile degli anni successivi
+      terminal_growth   crescita perpetua (Gordon) del valore terminale sull'ultimo FCF;
+                        NaN dove la crescita non è inferiore al WACC
+    """
+    with PROFILER.section("engine.dcf"):
+        flows = project_cash_flows(capex, years, rev1, growth, cogs_p, opex1, opex_g, tax_r,
+                                   periods_per_year, dep_years, tax_carryforward)
+    n = len(flows["n_periods"])
+    wacc = np.broadcast_to(np.asarray(wacc, dtype=float), (n,))
+    out = value_cash_flows(flows["cf"], flows["n_periods"], wacc, periods_per_year, terminal_growth, with_irr)
+    out["periods_per_year"] = int(periods_per_year)
+    for k in ("revenue", "ebitda", "nopat", "fcf", "roic", "active"):
+        out[k] = flows[k]
+    return out
+
+
+def to_annual(matrix, periods_per_year):
+    """Somma le colonne di una matrice N x (anni x periods_per_year) per anno: N x anni."""
+    m = np.atleast_2d(matrix)
+    return m.reshape(m.shape[0], -1, periods_per_year).sum(axis=2)
+
+
+# --- KPI DELLE ALTRE TAB ---
+# Funzioni pure, valide sia per scalari (app) sia per vettori (elaborazioni batch).
+
+# Soglie delle raccomandazioni strategiche
+CCC_LIMIT_DAYS = 60
+LTV_CAC_TARGET = 3.0
+SAAS_GROSS_MARGIN = 0.85
+
+
+def saas_kpis(arpu, churn, cac, gross_margin=SAAS_GROSS_MARGIN):
+    """LTV e rapporto LTV/CAC da ARPU mensile, churn mensile (decimale) e CAC."""
+    arpu, churn, cac = (np.asarray(x, dtype=float) for x in (arpu, churn, cac))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ltv = np.where(churn > 0, arpu * gross_margin / churn, 0.0)
+        ratio = np.where(cac > 0, ltv / cac, 0.0)
+    return {"ltv": ltv, "ltv_cac": ratio}
+
+
+def liquidity_kpis(cash, debt, dso, dio, dpo):
+    """Posizione finanziaria netta e ciclo di conversione di cassa (giorni)."""
+    cash, debt, dso, dio, dpo = (np.asarray(x, dtype=float) for x in (cash, debt, dso, dio, dpo))
+    return {"pfn": debt - cash, "ccc": dso + dio - dpo}
+
+
+def breakeven_kpis(price, var_cost, fix_cost, volume):
+    """Punto di pareggio in valore e margine di sicurezza (decimale)."""
+    price, var_cost, fix_cost, volume = (np.asarray(x, dtype=float) for x in (price, var_cost, fix_cost, volume))
+    mc = price - var_cost
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bep = np.where(mc > 0, fix_cost / mc * price, 0.0)
+        sales = volume * price
+        safety = np.where(volume > 0, (sales - bep) / sales, 0.0)
+    return {"bep": bep, "safety": safety}
+
+
+def stress_kpis(rev1, cogs_p, opex1, shock):
+    """EBITDA anno 1 base e sotto shock dei ricavi (`shock` decimale, es. -0.2)."""
+    rev1, cogs_p, opex1, shock = (np.asarray(x, dtype=float) for x in (rev1, cogs_p, opex1, shock))
+    return {
+        "base_ebitda": rev1 * (1 - cogs_p) - opex1,
+        "stress_ebitda": rev1 * (1 + shock) * (1 - cogs_p) - opex1,
+    }
+
+
+def recommendation_flags(npv_val, ccc, ltv_cac, stress_ebitda):
+    """Semafori della Sintesi: True = esito positivo ("_ok"), False = "_ko"."""
+    return {
+        "npv": np.asarray(npv_val) > 0,
+        "liq": np.asarray(ccc) < CCC_LIMIT_DAYS,
+        "saas": np.asarray(ltv_cac) > LTV_CAC_TARGET,
+        "stress": np.asarray(stress_ebitda) > 0,
+    }
+
+
+# --- VALUTAZIONE COMPLETA DI UNO SCENARIO ---
+# Valori di default degli input dell'app (percentuali in decimali)
+DEFAULT_INPUTS = {
+    "capex": 500000, "years": 5, "wacc": 0.10, "rev1": 300000, "growth": 0.15,
+    "cogs_p": 0.40, "opex1": 50000, "opex_g": 0.03, "tax_r": 0.28,
+    "arpu": 500, "churn": 0.02, "cac": 4000,
+    "cash": 150000, "debt": 400000, "dso": 60, "dio": 45, "dpo": 90,
+    "price": 100, "var_cost": 60, "fix_cost": 150000, "volume": 5000,
+    "shock": -0.20,
+}
+
+# KPI prodotti da evaluate_scenarios, nell'ordine di output
+SCENARIO_KPIS = ("npv", "irr", "irr_status", "payback", "pfn", "ccc", "ltv_cac", "bep", "safety",
+                 "base_ebitda", "stress_ebitda", "flag_npv", "flag_liq", "flag_saas", "flag_stress")
+
+
+def evaluate_scenarios(inputs):
+    """
+    Calcola tutti i KPI dell'app per N scenari.
+    `inputs`: mapping nome -> scalare o vettore N (chiavi di DEFAULT_INPUTS; le mancanti usano il default).
+    Restituisce un dict nome KPI -> vettore N, con le chiavi di SCENARIO_KPIS.
+    """
+    unknown = set(inputs) - set(DEFAULT_INPUTS)
+    if unknown:
+        raise ValueError(f"Input non riconosciuti: {sorted(unknown)}")
+    x = dict(DEFAULT_INPUTS)
+    x.update(inputs)
+    n = max(np.size(v) for v in x.values())
+
+    inv = evaluate_projects(*(x[k] for k in INVEST_DRIVERS))
+    saas = saas_kpis(x["arpu"], x["churn"], x["cac"])
+    liq = liquidity_kpis(x["cash"], x["debt"], x["dso"], x["dio"], x["dpo"])
+    bep = breakeven_kpis(x["price"], x["var_cost"], x["fix_cost"], x["volume"])
+    stress = stress_kpis(x["rev1"], x["cogs_p"], x["opex1"], x["shock"])
+    flags = recommendation_flags(inv["npv"], liq["ccc"], saas["ltv_cac"], stress["stress_ebitda"])
+
+    out = {
+        "npv": inv["npv"], "irr": inv["irr"], "irr_status": inv["irr_status"], "payback": inv["payback"],
+        "pfn": liq["pfn"], "ccc": liq["ccc"], "ltv_cac": saas["ltv_cac"],
+        "bep": bep["bep"], "safety": bep["safety"],
+        "base_ebitda": stress["base_ebitda"], "stress_ebitda": stress["stress_ebitda"],
+    }
+    out.update({f"flag_{k}": v for k, v in flags.items()})
+    return {k: np.broadcast_to(out[k], (n,)) for k in SCENARIO_KPIS}
@@ -0,0 +1,167 @@
+# --- EXPORT TABELLARE IN STREAMING ---
+# Proiezioni complete (tutti i periodi), griglie di sensitività e percorsi Monte Carlo in
+# CSV, Parquet o XLSX. Le tabelle arrivano come sequenza di blocchi di DataFrame e ogni
+# blocco va sul file appena prodotto: la memoria dipende dalla dimensione del blocco, non
+# dal numero di righe (un milione di percorsi si rigenera blocco per blocco dal seme).
+# Il file si scrive accanto alla destinazione e si rinomina a fine scrittura: chi legge
+# il percorso trova il file completo o nessun file.
+# Parquet richiede pyarrow, XLSX xlsxwriter (in modalità constant_memory): librerie
+# opzionali, importate solo quando serve il formato.
+
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+
+from cfo_montecarlo import run_chunk
+
+DEFAULT_CHUNK = 100_000
+XLSX_MAX_ROWS = 1_048_575     # righe di dati per foglio (limite di Excel meno l'intestazione)
+
+# Formato -> (tipo MIME, libreria opzionale)
+FORMATS = {
+    "csv": ("text/csv", None),
+    "parquet": ("application/vnd.apache.parquet", "pyarrow"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsxwriter"),
+}
+
+
+def available_formats():
+    """Formati esportabili con le librerie installate."""
+    return [f for f, (_, lib) in FORMATS.items() if lib is None or importlib.util.find_spec(lib) is not None]
+
+
+def mime_type(fmt):
+    return FORMATS[fmt][0]
+
+
+# --- SORGENTI A BLOCCHI ---
+def frame_chunks(df, chunk_size=DEFAULT_CHUNK):
+    """Blocchi di righe di un DataFrame già in memoria."""
+    for i in range(0, max(len(df), 1), chunk_size):
+        yield df.iloc[i:i + chunk_size]
+
+
+def projection_frame(res, periods_per_year=1, row=0):
+    """Proiezione completa di un progetto di evaluate_projects: una riga per periodo (anche mensile)."""
+    n = res["revenue"].shape[1]
+    period = np.arange(1, n + 1)
+    df = pd.DataFrame({"period": period, "year": (period - 1) // periods_per_year + 1})
+    for k in ("revenue", "ebitda", "nopat", "fcf", "roic"):
+        if k in res:
+            df[k] = res[k][row]
+    df["cf"] = res["cf"][row, 1:]
+    return pd.concat([pd.DataFrame({"period": [0], "year": [0], "cf": [res["cf"][row, 0]]}), df], ignore_index=True)
+
+
+def grid_chunks(xs, ys, z, x_name, y_name, metric="npv", chunk_size=DEFAULT_CHUNK):
+    """Griglia di sensitività in formato lungo (x, y, metrica), a blocchi di righe di y."""
+    xs, z = np.asarray(xs, dtype=float), np.asarray(z, dtype=float)
+    step = max(1, chunk_size // max(len(xs), 1))
+    for i in range(0, len(ys), step):
+        y = np.asarray(ys[i:i + step], dtype=float)
+        yield pd.DataFrame({x_name: np.tile(xs, len(y)), y_name: np.repeat(y, len(xs)), metric: z[i:i + step].ravel()})
+
+
+def simulation_chunks(chunks):
+    """Percorsi Monte Carlo blocco per blocco dagli argomenti di run_chunk() (cfo_montecarlo.plan)."""
+    pos = 0
+    for args in chunks:
+        part = run_chunk(*args)
+        n = len(part["npv"])
+        yield pd.DataFrame({"path": np.arange(pos, pos + n), **part})
+        pos += n
+
+
+# --- SCRITTURA ---
+def _write_csv(frames, path):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for i, df in enumerate(frames):
+            df.to_csv(f, header=(i == 0), index=False)
+
+
+def _write_parquet(frames, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    writer = None
+    try:
+        for df in frames:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        pq.write_table(pa.table({}), path)
+
+
+def _write_xlsx(frames, path):
+    import xlsxwriter
+    # constant_memory: ogni riga va su disco appena scritta; oltre XLSX_MAX_ROWS un nuovo foglio
+    wb = xlsxwriter.Workbook(path, {"constant_memory": True})
+    ws, header, r = None, None, 0
+    try:
+        for df in frames:
+            if header is None:
+                header = [str(c) for c in df.columns]
+            # NaN come celle vuote (xlsxwriter non li scrive come numeri)
+            values = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+            for values_row in values:
+                if ws is None or r > XLSX_MAX_ROWS:
+                    ws = wb.add_worksheet(f"data{len(wb.worksheets()) + 1}" if ws is not None else "data")
+                    ws.write_row(0, 0, header)
+                    r = 1
+                ws.write_row(r, 0, values_row)
+                r += 1
+        if ws is None:
+            wb.add_worksheet("data").write_row(0, 0, header or [])
+    finally:
+        wb.close()
+
+
+_WRITERS = {"csv": _write_csv, "parquet": _write_parquet, "xlsx": _write_xlsx}
+
+
+def write_table(frames, fmt, path):
+    """Scrive i blocchi `frames` (DataFrame con le stesse colonne) in `path` nel formato `fmt`."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato di export non supportato: {fmt}")
+    lib = FORMATS[fmt][1]
+    if lib is not None and importlib.util.find_spec(lib) is None:
+        raise ImportError(f"Il formato {fmt} richiede {lib}: pip install {lib}", name=lib)
+    tmp = f"{path}.{os.getpid()}.part"
+    try:
+        _WRITERS[fmt](iter(frames), tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path
+
+
+# --- TASK DEL SERVIZIO DI CALCOLO ---
+# Funzioni importabili con argomenti serializzabili: girano nei worker di cfo_service
+def export_frame(df, fmt, path, chunk_size=DEFAULT_CHUNK):
+    return write_table(frame_chunks(df, chunk_size), fmt, path)
+
+
+def export_grid(xs, ys, z, x_name, y_name, fmt, path, metric="npv"):
+    return write_table(grid_chunks(xs, ys, z, x_name, y_name, metric), fmt, path)
+
+
+def export_simulation(chunks, fmt, path):
+    return write_table(simulation_chunks(chunks), fmt, path)
+
+
+def prune(directory, keep):
+    """Tiene in `directory` solo i `keep` file di export usati più di recente."""
+    files = [e for e in os.scandir(directory) if e.is_file() and not e.name.endswith(".part")]
+    files.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    for e in files[keep:]:
+        try:
+            os.remove(e.path)
+        except OSError:
+            pass
@@ -0,0 +1,167 @@
+# --- GOAL SEEK ---
+# Valore di un driver che porta un KPI a un obiettivo (es. crescita per NPV = 0, DSO per
+# CCC = 60 giorni), con tutti gli altri input fermi. Prima una scansione vettoriale su
+# GRID punti dell'intervallo del driver trova tutti i cambi di segno di KPI - obiettivo;
+# poi tutti gli intervalli trovati si raffinano insieme con regula falsi (variante
+# Illinois) protetta da bisezione. Ogni passo è una sola valutazione vettoriale del
+# modulo che produce il KPI: poche decine di valutazioni in tutto, nessun rerun.
+
+import numpy as np
+
+from cfo_engine import (CCC_LIMIT_DAYS, DEFAULT_INPUTS, INVEST_DRIVERS, LTV_CAC_TARGET, breakeven_kpis,
+                        evaluate_projects, liquidity_kpis, saas_kpis, stress_kpis)
+
+GRID = 64                     # punti della scansione iniziale
+TOL = 1e-9                    # tolleranza relativa sul driver
+MAX_ITER = 100
+FTOL = 1e-6                   # scarto massimo del KPI alla soluzione, relativo alla sua escursione
+
+# KPI risolvibili e driver da cui dipendono
+KPI_DRIVERS = {
+    "npv": INVEST_DRIVERS,
+    "irr": tuple(d for d in INVEST_DRIVERS if d != "wacc"),
+    "ltv_cac": ("arpu", "churn", "cac"),
+    "ccc": ("dso", "dio", "dpo"),
+    "pfn": ("cash", "debt"),
+    "safety": ("price", "var_cost", "fix_cost", "volume"),
+    "stress_ebitda": ("rev1", "cogs_p", "opex1", "shock"),
+}
+
+# Obiettivi di default (le soglie delle raccomandazioni) e verso "buono" del KPI
+DEFAULT_TARGETS = {"npv": 0.0, "irr": DEFAULT_INPUTS["wacc"], "ltv_cac": LTV_CAC_TARGET, "ccc": CCC_LIMIT_DAYS,
+                   "pfn": 0.0, "safety": 0.0, "stress_ebitda": 0.0}
+KPI_SENSE = {"npv": 1, "irr": 1, "ltv_cac": 1, "ccc": -1, "pfn": -1, "safety": 1, "stress_ebitda": 1}
+
+# Intervalli di ricerca: assoluti per tassi e giorni; gli importi vanno da 0 ad
+# AMOUNT_SPAN volte il valore corrente
+DRIVER_RANGES = {
+    "wacc": (0.001, 1.0), "growth": (-0.9, 2.0), "cogs_p": (0.0, 1.0), "opex_g": (-0.5, 1.0),
+    "tax_r": (0.0, 0.9), "churn": (0.001, 1.0), "shock": (-1.0, 1.0),
+    "dso": (0.0, 720.0), "dio": (0.0, 720.0), "dpo": (0.0, 720.0), "years": (1, 50),
+}
+AMOUNT_SPAN = 10
+INTEGER_DRIVERS = ("years",)
+PERCENT_DRIVERS = ("wacc", "growth", "cogs_p", "opex_g", "tax_r", "churn", "shock")
+
+
+def kpi_values(kpi, driver, values, inputs=None, options=None):
+    """
+    Valore di `kpi` per ogni elemento del vettore `values` del driver `driver`, con gli
+    altri input da `inputs` (mancanti = default dell'app): una sola valutazione vettoriale.
+    `options`: opzioni DCF di evaluate_projects (solo per npv e irr).
+    """
+    values = np.asarray(values, dtype=float)
+    x = {**DEFAULT_INPUTS, **(inputs or {}), driver: values}
+    if kpi in ("npv", "irr"):
+        # Il motore prende N dai driver dei flussi: il WACC da solo non basta a vettorializzare
+        drivers = (np.broadcast_to(np.asarray(x[k], dtype=float), values.shape) for k in INVEST_DRIVERS)
+        out = evaluate_projects(*drivers, with_irr=(kpi == "irr"), **(options or {}))[kpi]
+    elif kpi == "ltv_cac":
+        out = saas_kpis(x["arpu"], x["churn"], x["cac"])["ltv_cac"]
+    elif kpi in ("ccc", "pfn"):
+        out = liquidity_kpis(x["cash"], x["debt"], x["dso"], x["dio"], x["dpo"])[kpi]
+    elif kpi == "safety":
+        out = breakeven_kpis(x["price"], x["var_cost"], x["fix_cost"], x["volume"])["safety"]
+    elif kpi == "stress_ebitda":
+        out = stress_kpis(x["rev1"], x["cogs_p"], x["opex1"], x["shock"])["stress_ebitda"]
+    else:
+        raise ValueError(f"KPI non supportato dal goal seek: {kpi}")
+    return np.broadcast_to(np.asarray(out, dtype=float), values.shape)
+
+
+def solve_brackets(f, a, b, fa=None, fb=None, tol=TOL, max_iter=MAX_ITER):
+    """
+    Zeri di `f` (funzione vettoriale) negli intervalli [a_i, b_i] con f(a_i), f(b_i) di
+    segno opposto, tutti raffinati insieme: ogni iterazione chiama `f` una volta sul
+    vettore dei punti ancora aperti. Regula falsi Illinois, con bisezione quando il passo
+    esce dall'intervallo. Restituisce (zeri, convergenza per intervallo, iterazioni).
+    """
+    a, b = np.array(a, dtype=float), np.array(b, dtype=float)
+    fa = f(a) if fa is None else np.array(fa, dtype=float)
+    fb = f(b) if fb is None else np.array(fb, dtype=float)
+    x = np.where(np.abs(fa) < np.abs(fb), a, b)
+    done = (fa == 0) | (fb == 0)
+    x = np.where(fa == 0, a, np.where(fb == 0, b, x))
+    it = 0
+    while not done.all() and it < max_iter:
+        it += 1
+        o = ~done
+        with np.errstate(divide="ignore", invalid="ignore"):
+            c = b[o] - fb[o] * (b[o] - a[o]) / (fb[o] - fa[o])
+        lo, hi = np.minimum(a[o], b[o]), np.maximum(a[o], b[o])
+        c = np.where(np.isfinite(c) & (c > lo) & (c < hi), c, (a[o] + b[o]) / 2)
+        fc = f(c)
+        # Lo zero è tra b e c: a <- b; altrimenti resta tra a e c e f(a) si dimezza (Illinois)
+        flip = np.sign(fc) * np.sign(fb[o]) < 0
+        a[o] = np.where(flip, b[o], a[o])
+        fa[o] = np.where(flip, fb[o], fa[o] / 2)
+        b[o], fb[o], x[o] = c, fc, c
+        closed = (fc == 0) | (np.abs(b[o] - a[o]) <= tol * (1 + np.abs(c)))
+        failed = np.isnan(fc)
+        idx = np.flatnonzero(o)
+        done[idx[closed | failed]] = True
+        x[idx[failed]] = np.nan
+    return x, done & np.isfinite(x), it
+
+
+def goal_seek(kpi, driver, target, inputs=None, bounds=None, options=None, grid=GRID, tol=TOL, max_iter=MAX_ITER):
+    """
+    Valore di `driver` per cui `kpi` vale `target`, con gli altri input fermi (`inputs`).
+    `bounds`: intervallo di ricerca (default DRIVER_RANGES o 0..AMOUNT_SPAN x valore corrente;
+    sempre esteso a includere il valore corrente). Driver interi (anni): primo valore intero
+    oltre ogni attraversamento.
+    Restituisce un dict con value (soluzione più vicina al valore corrente, NaN se il KPI
+    non raggiunge l'obiettivo nell'intervallo), roots (tutte le soluzioni), current,
+    kpi_current, slope (+1 / -1: verso in cui il KPI cresce con il driver alla soluzione),
+    condition (">=" / "<=": lato del driver dove il KPI è dalla parte buona dell'obiettivo)
+    ed evaluations (valutazioni vettoriali del modello).
+    """
+    if kpi not in KPI_DRIVERS:
+        raise ValueError(f"KPI non supportato dal goal seek: {kpi}")
+    if driver not in KPI_DRIVERS[kpi]:
+        raise ValueError(f"Il KPI {kpi} non dipende dal driver {driver}")
+    inputs = {**DEFAULT_INPUTS, **(inputs or {})}
+    current = float(inputs[driver])
+    if bounds is None:
+        bounds = DRIVER_RANGES.get(driver, (0.0, max(AMOUNT_SPAN * abs(current), 1.0)))
+    lo, hi = min(bounds[0], current), max(bounds[1], current)
+
+    evaluations = 0
+
+    def f(v):
+        nonlocal evaluations
+        evaluations += 1
+        return kpi_values(kpi, driver, v, inputs, options) - target
+
+    if driver in INTEGER_DRIVERS:
+        xs = np.arange(int(np.floor(lo)), int(np.ceil(hi)) + 1, dtype=float)
+    else:
+        xs = np.unique(np.append(np.linspace(lo, hi, grid), current))
+    fs = f(xs)
+    sign = np.sign(fs)
+    cross = np.flatnonzero(sign[:-1] * sign[1:] < 0)
+    exact = np.flatnonzero(fs == 0)
+
+    if driver in INTEGER_DRIVERS or not len(cross):
+        roots = xs[cross + 1]
+    else:
+        roots, ok, _ = solve_brackets(f, xs[cross], xs[cross + 1], fs[cross], fs[cross + 1], tol, max_iter)
+        # Un cambio di segno può essere un salto del KPI (es. margine che si annulla), non
+        # uno zero: restano solo le soluzioni dove il KPI è davvero sull'obiettivo
+        resid = np.abs(f(np.nan_to_num(roots)))
+        scale = np.nanmax(np.abs(fs), initial=1.0)
+        roots = roots[ok & (resid <= FTOL * max(scale, 1.0))]
+    roots = np.sort(np.concatenate([roots, xs[exact]]))
+
+    k = int(np.searchsorted(xs, current))
+    kpi_current = float(fs[k] + target) if k < len(xs) and xs[k] == current else \
+        float(kpi_values(kpi, driver, [current], inputs, options)[0])
+    out = {"value": np.nan, "roots": roots, "current": current, "kpi_current": kpi_current, "slope": 0,
+           "condition": None, "evaluations": evaluations}
+    if len(roots):
+        value = float(roots[np.argmin(np.abs(roots - current))])
+        # Pendenza locale dalla scansione: il KPI cresce o cala col driver attorno alla soluzione
+        j = min(max(int(np.searchsorted(xs, value)), 1), len(xs) - 1)
+        slope = int(np.sign(fs[j] - fs[j - 1])) or 1
+        out.update(value=value, slope=slope, condition=">=" if slope * KPI_SENSE[kpi] > 0 else "<=")
+    return out
@@ -0,0 +1,265 @@
+# --- INGESTIONE PARTITARI IN STREAMING ---
+# Legge export GL/AR/AP (CSV o Parquet, anche di più GB) a blocchi e li converte in una
+# cache colonnare su disco: un file binario per colonna, aperto con np.memmap.
+# La cache è indicizzata dall'hash del contenuto del file: un secondo caricamento dello
+# stesso export (anche in un'altra sessione) salta il parsing e apre subito le colonne.
+#
+# Formato atteso: una riga per registrazione con le colonne
+#   date      data di registrazione (o solo due_date per gli scadenzari AR/AP)
+#   due_date  scadenza (opzionale)
+#   account   classe del conto (vedi ACCOUNT_CLASSES e ACCOUNT_ALIASES; anche "class" o "type")
+#   amount    importo nel segno naturale del conto (ricavi, costi e saldi positivi)
+#
+# Uso da riga di comando (precarica la cache, utile per export oltre il limite di upload):
+#   python -m cfo_ingest partitario.parquet
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from cfo_batch import iter_chunks
+from cfo_paths import data_path
+
+CACHE_DIR = os.environ.get("CFO_CACHE_DIR", data_path("ledgers"))
+CACHE_VERSION = 1
+INGEST_CHUNK = 500_000
+HASH_BLOCK = 1 << 20           # 1 MB per blocco di lettura durante l'hash
+SCAN_BLOCK = 10_000_000        # righe per blocco nelle aggregazioni sulla cache
+
+ACCOUNT_CLASSES = ("revenue", "cogs", "opex", "cash", "debt", "ar", "ap", "inventory")
+ACCOUNT_ALIASES = {
+    "sales": "revenue", "ricavi": "revenue", "vendite": "revenue",
+    "costo_venduto": "cogs", "materie_prime": "cogs",
+    "costi_fissi": "opex", "spese": "opex",
+    "bank": "cash", "banca": "cash", "cassa": "cash",
+    "loan": "debt", "debiti_finanziari": "debt", "finanziamenti": "debt",
+    "receivable": "ar", "crediti": "ar", "in": "ar",
+    "payable": "ap", "fornitori": "ap", "out": "ap",
+    "stock": "inventory", "magazzino": "inventory",
+}
+FLOW_CLASSES = ("revenue", "cogs", "opex")      # conto economico: annualizzati
+CLASS_COLUMNS = ("account", "class", "type")
+DATE_COLUMNS = ("date", "posting_date")
+DUE_COLUMNS = ("due_date",)
+AMOUNT_COLUMN = "amount"
+
+# Colonne della cache: nome -> dtype su disco (date in giorni dal 1970, NaT = minimo int64)
+SCHEMA = {"date": "<i8", "due": "<i8", "amount": "<f8", "cls": "i1"}
+NAT = np.iinfo(np.int64).min
+
+_CLASS_INDEX = {c: i for i, c in enumerate(ACCOUNT_CLASSES)}
+_CLASS_INDEX.update({a: _CLASS_INDEX[c] for a, c in ACCOUNT_ALIASES.items()})
+
+
+def file_hash(source):
+    """SHA-256 del contenuto di `source` (percorso o file-like), letto a blocchi."""
+    h = hashlib.sha256()
+    f = open(source, "rb") if isinstance(source, (str, os.PathLike)) else source
+    try:
+        f.seek(0)
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            h.update(block)
+    finally:
+        if f is source:
+            f.seek(0)
+        else:
+            f.close()
+    return h.hexdigest()
+
+
+def _pick(df, names):
+    # Prima colonna presente tra `names`, senza distinzione maiuscole/minuscole
+    cols = {str(c).strip().lower(): c for c in df.columns}
+    return next((cols[n] for n in names if n in cols), None)
+
+
+def _days(series):
+    import pandas as pd
+    d = pd.to_datetime(series, errors="coerce").to_numpy(dtype="datetime64[D]")
+    return d.astype(np.int64)          # NaT diventa il minimo int64 (= NAT)
+
+
+def _columns(df):
+    # Un blocco di DataFrame -> colonne tipizzate della cache
+    import pandas as pd
+    date_col, due_col = _pick(df, DATE_COLUMNS), _pick(df, DUE_COLUMNS)
+    amount_col, cls_col = _pick(df, (AMOUNT_COLUMN,)), _pick(df, CLASS_COLUMNS)
+    if amount_col is None or (date_col is None and due_col is None):
+        raise ValueError(f"Il partitario deve avere le colonne {AMOUNT_COLUMN} e "
+                         f"{' o '.join(DATE_COLUMNS + DUE_COLUMNS)}")
+    n = len(df)
+    due = _days(df[due_col]) if due_col is not None else np.full(n, NAT)
+    date = _days(df[date_col]) if date_col is not None else due
+    if cls_col is not None:
+        # Mappatura sui valori distinti, poi espansione per codice: niente lookup per riga
+        codes, uniq = pd.factorize(df[cls_col].astype(str).str.strip().str.lower())
+        lut = np.array([_CLASS_INDEX.get(u, -1) for u in uniq] + [-1], dtype=np.int8)
+        cls = lut[codes]               # codice -1 (valore mancante) -> ultima voce, -1
+    else:
+        cls = np.full(n, -1, dtype=np.int8)
+    amount = pd.to_numeric(df[amount_col], errors="coerce").to_numpy(dtype=float)
+    return {"date": date, "due": due, "amount": amount, "cls": cls}
+
+
+def _open(path):
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("version") != CACHE_VERSION:
+        return None
+    rows = meta["rows"]
+    cache = {"key": os.path.basename(path), "rows": rows, "source": meta.get("source")}
+    for name, dtype in SCHEMA.items():
+        fname = os.path.join(path, f"{name}.bin")
+        # np.memmap non accetta file vuoti
+        cache[name] = np.memmap(fname, dtype=dtype, mode="r", shape=(rows,)) if rows else np.empty(0, dtype)
+    return cache
+
+
+def ingest(source, cache_dir=None, chunk_size=INGEST_CHUNK, key=None):
+    """
+    Restituisce la cache colonnare di `source` (percorso o file-like con attributo `name`),
+    creandola se non esiste. La cache è un dict con key (hash), rows e le colonne date, due,
+    amount, cls come np.memmap in sola lettura. `key`: file_hash(source) se già calcolato
+    dal chiamante (il file non viene riletto per l'hash).
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    key = key or file_hash(source)
+    path = os.path.join(cache_dir, key)
+    if os.path.exists(os.path.join(path, "meta.json")):
+        cache = _open(path)
+        if cache is not None:
+            return cache
+        shutil.rmtree(path, ignore_errors=True)
+
+    # Scrittura in una cartella temporanea e rinomina finale: niente cache a metà se il parsing fallisce
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=cache_dir, prefix=".ingest-")
+    try:
+        files = {name: open(os.path.join(tmp, f"{name}.bin"), "wb") for name in SCHEMA}
+        rows = 0
+        try:
+            for df in iter_chunks(source, chunk_size):
+                for name, arr in _columns(df).items():
+                    np.ascontiguousarray(arr, dtype=SCHEMA[name]).tofile(files[name])
+                rows += len(df)
+        finally:
+            for f in files.values():
+                f.close()
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "rows": rows,
+                       "source": os.path.basename(str(getattr(source, "name", source)))}, f)
+        try:
+            os.replace(tmp, path)
+        except OSError:
+            # Un'altra sessione ha appena creato la stessa cache: si usa quella
+            shutil.rmtree(tmp, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return _open(path)
+
+
+def _blocks(cache, *names):
+    for i in range(0, cache["rows"], SCAN_BLOCK):
+        yield tuple(np.asarray(cache[n][i:i + SCAN_BLOCK]) for n in names)
+
+
+def derive_drivers(cache, as_of=None):
+    """
+    Driver del modello ricavati dal partitario alla data `as_of` (default: ultima registrazione).
+    I conti economici (ricavi, COGS, OPEX) sono sommati sugli ultimi 365 giorni e annualizzati
+    se lo storico è più corto; i saldi (cassa, debito, crediti, debiti fornitori, magazzino)
+    sono la somma di tutte le registrazioni fino ad `as_of`.
+    Restituisce solo i driver ricavabili: rev1, cogs_p, opex1, cash, debt, dso, dio, dpo.
+    """
+    k = len(ACCOUNT_CLASSES)
+    if as_of is None:
+        last = [d[d != NAT].max() for (d,) in _blocks(cache, "date") if (d != NAT).any()]
+        if not last:
+            return {}
+        as_of = max(last)
+    else:
+        as_of = np.datetime64(as_of, "D").astype(np.int64)
+    start = as_of - 364
+
+    flows, balances, counts, first = np.zeros(k), np.zeros(k), np.zeros(k), as_of
+    for date, amount, cls in _blocks(cache, "date", "amount", "cls"):
+        counts += np.bincount(cls[cls >= 0], minlength=k)
+        ok = (cls >= 0) & (date != NAT) & (date <= as_of) & np.isfinite(amount)
+        balances += np.bincount(cls[ok], weights=amount[ok], minlength=k)
+        win = ok & (date >= start)
+        flows += np.bincount(cls[win], weights=amount[win], minlength=k)
+        if win.any():
+            first = min(first, date[win].min())
+
+    annual = 365 / (as_of - first + 1)
+    f = {c: flows[_CLASS_INDEX[c]] * annual for c in FLOW_CLASSES}
+    b = {c: balances[_CLASS_INDEX[c]] for c in ACCOUNT_CLASSES if c not in FLOW_CLASSES}
+    has = {c: bool(counts[_CLASS_INDEX[c]]) for c in ACCOUNT_CLASSES}
+
+    out = {}
+    if has["revenue"] and f["revenue"] > 0:
+        out["rev1"] = f["revenue"]
+        if has["cogs"]:
+            out["cogs_p"] = f["cogs"] / f["revenue"]
+        if has["ar"]:
+            out["dso"] = b["ar"] / f["revenue"] * 365
+    if has["cogs"] and f["cogs"] > 0:
+        if has["inventory"]:
+            out["dio"] = b["inventory"] / f["cogs"] * 365
+        if has["ap"]:
+            out["dpo"] = b["ap"] / f["cogs"] * 365
+    for name, cls in (("opex1", "opex"), ("cash", "cash"), ("debt", "debt")):
+        if has[cls]:
+            out[name] = f[cls] if cls in FLOW_CLASSES else b[cls]
+    return {name: float(v) for name, v in out.items()}
+
+
+def open_items(cache):
+    """
+    Scadenze di cassa per cfo_cashflow.forecast: (date datetime64[D], importi con segno).
+    Crediti (AR) = incassi, debiti verso fornitori (AP) = pagamenti, righe senza classe con
+    scadenza = importo già nel segno di cassa. Data = scadenza se presente, altrimenti registrazione.
+    """
+    ar, ap = _CLASS_INDEX["ar"], _CLASS_INDEX["ap"]
+    dates, amounts = [], []
+    for date, due, amount, cls in _blocks(cache, "date", "due", "amount", "cls"):
+        has_due = due != NAT
+        keep = ((cls == ar) | (cls == ap) | ((cls < 0) & has_due)) & np.isfinite(amount)
+        day = np.where(has_due, due, date)[keep]
+        sign = np.where(cls[keep] == ap, -1.0, 1.0)
+        ok = day != NAT
+        dates.append(day[ok].astype("datetime64[D]"))
+        amounts.append((sign * amount[keep])[ok])
+    if not dates:
+        return np.empty(0, "datetime64[D]"), np.empty(0)
+    return np.concatenate(dates), np.concatenate(amounts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m cfo_ingest",
+                                     description="Black Swan CFO OS - cache colonnare di un partitario GL/AR/AP")
+    parser.add_argument("input", help="partitario (.csv o .parquet)")
+    parser.add_argument("--cache-dir", default=None, help=f"cartella della cache (default: {CACHE_DIR})")
+    parser.add_argument("--chunk-size", type=int, default=INGEST_CHUNK, help="righe lette per blocco")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.input):
+        parser.error(f"file non trovato: {args.input}")
+
+    t0 = time.perf_counter()
+    cache = ingest(args.input, args.cache_dir, args.chunk_size)
+    print(f"{cache['rows']:,} righe in cache ({cache['key'][:12]}) in {time.perf_counter() - t0:.2f}s")
+    for name, value in derive_drivers(cache).items():
+        print(f"  {name:<7} {value:,.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
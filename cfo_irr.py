@@ -0,0 +1,162 @@
+# --- SOLUTORE IRR VETTORIALE ---
+# Calcola l'IRR di una matrice di flussi (N serie x T periodi) senza passare per le
+# radici del polinomio come numpy_financial.irr: Newton vettoriale sul fattore di
+# sconto, poi fallback a intervallo (regula falsi "Illinois") per le serie che non
+# convergono. Ogni serie riceve uno stato esplicito invece di un NaN silenzioso.
+
+import numpy as np
+
+# Stati restituiti per ogni serie
+IRR_OK = 0                 # radice unica trovata
+IRR_MULTIPLE = 1           # trovata una radice, ma più cambi di segno: l'IRR può non essere unico
+IRR_NO_SIGN_CHANGE = 2     # flussi tutti dello stesso segno: l'IRR non esiste
+IRR_NOT_CONVERGED = 3      # nessuna radice trovata nell'intervallo di ricerca
+IRR_ABOVE_RANGE = 4        # NPV ancora lontano dal segno limite a RATE_CAP: IRR oltre l'intervallo
+
+IRR_STATUS_NAMES = {
+    IRR_OK: "ok",
+    IRR_MULTIPLE: "multiple_sign_changes",
+    IRR_NO_SIGN_CHANGE: "no_sign_change",
+    IRR_NOT_CONVERGED: "not_converged",
+    IRR_ABOVE_RANGE: "above_range",
+}
+
+# Intervallo dei tassi esplorato dal fallback; le serie senza cambio di segno fino a
+# RATE_MAX (IRR oltre il 1000%) proseguono con una scansione geometrica fino a RATE_CAP
+RATE_MIN, RATE_MAX = -0.99, 10.0
+RATE_CAP = 1e6
+
+
+def sign_changes(cf):
+    """Numero di cambi di segno di ogni riga, ignorando i flussi nulli."""
+    cf = np.atleast_2d(np.asarray(cf, dtype=float))
+    s = np.sign(cf)
+    # Propaga l'ultimo segno non nullo sopra gli zeri (es. anni oltre l'orizzonte)
+    idx = np.where(s != 0, np.arange(s.shape[1]), 0)
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    s = np.take_along_axis(s, idx, axis=1)
+    flips = (s[:, 1:] != s[:, :-1]) & (s[:, 1:] != 0) & (s[:, :-1] != 0)
+    return flips.sum(axis=1)
+
+
+def _npv_horner(cf, v):
+    # NPV e derivata rispetto al fattore di sconto v = 1/(1+r), schema di Horner
+    # Con orizzonti lunghi (centinaia di periodi) v^T può andare in overflow: il passo
+    # risultante non è finito e la serie passa al fallback a intervallo
+    f = cf[:, -1].copy()
+    df = np.zeros_like(f)
+    with np.errstate(over="ignore", invalid="ignore"):
+        for t in range(cf.shape[1] - 2, -1, -1):
+            df = df * v + f
+            f = f * v + cf[:, t]
+    return f, df
+
+
+def _newton(cf, guess, tol, maxiter):
+    v = np.full(cf.shape[0], 1.0 / (1.0 + guess))
+    done = np.zeros(cf.shape[0], dtype=bool)
+    it = np.zeros(cf.shape[0], dtype=int)
+    for _ in range(maxiter):
+        f, df = _npv_horner(cf, v)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = f / df
+        live = ~done & np.isfinite(step)
+        v = np.where(live, v - step, v)
+        it += live
+        done |= live & (np.abs(step) < tol * np.maximum(1.0, np.abs(v)))
+        if not live.any():
+            break
+    # Radici fuori dal dominio economico (r <= -100%) non sono accettate
+    done &= (v > 0) & np.isfinite(v)
+    with np.errstate(divide="ignore"):
+        r = 1.0 / v - 1.0
+    done &= (r >= RATE_MIN) & (r <= RATE_CAP)
+    return r, done, it
+
+
+def _scan(cf, grid, guess):
+    # Scansione vettoriale di una griglia di tassi: sceglie il cambio di segno più vicino a `guess`
+    vals = np.stack([_npv_horner(cf, np.full(cf.shape[0], 1.0 / (1.0 + g)))[0] for g in grid], axis=1)
+    cross = np.sign(vals[:, 1:]) * np.sign(vals[:, :-1]) <= 0
+    mid = (grid[1:] + grid[:-1]) / 2
+    dist = np.where(cross, np.abs(mid - guess), np.inf)
+    k = dist.argmin(axis=1)
+    found = np.isfinite(dist[np.arange(len(k)), k])
+    return grid[k], grid[k + 1], found
+
+
+def _bracket(cf, guess, n_grid=64):
+    grid = np.concatenate([np.linspace(RATE_MIN, 1.0, n_grid // 2, endpoint=False),
+                           np.geomspace(1.0, RATE_MAX, n_grid // 2)])
+    lo, hi, found = _scan(cf, grid, guess)
+    # Nessun cambio di segno fino a RATE_MAX: si prosegue sopra, dal tasso più basso
+    rest = np.flatnonzero(~found)
+    if rest.size:
+        lo[rest], hi[rest], found[rest] = _scan(cf[rest], np.geomspace(RATE_MAX, RATE_CAP, n_grid // 2), RATE_MAX)
+    return lo, hi, found
+
+
+def _above_range(cf):
+    # Per r -> infinito l'NPV tende al primo flusso non nullo: se a RATE_CAP ha ancora il
+    # segno opposto la radice esiste, ma sta oltre l'intervallo esplorato
+    first = cf[np.arange(cf.shape[0]), np.argmax(cf != 0, axis=1)]
+    f_cap = _npv_horner(cf, np.full(cf.shape[0], 1.0 / (1.0 + RATE_CAP)))[0]
+    return np.sign(f_cap) * np.sign(first) < 0
+
+
+def _illinois(cf, lo, hi, tol, maxiter):
+    # Regula falsi con correzione Illinois, vettoriale: converge sempre dentro l'intervallo
+    f_lo = _npv_horner(cf, 1.0 / (1.0 + lo))[0]
+    f_hi = _npv_horner(cf, 1.0 / (1.0 + hi))[0]
+    side = np.zeros(len(lo), dtype=int)
+    r = lo.copy()
+    for _ in range(maxiter):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r = np.where(f_hi != f_lo, hi - f_hi * (hi - lo) / (f_hi - f_lo), (lo + hi) / 2)
+        f_r = _npv_horner(cf, 1.0 / (1.0 + r))[0]
+        if np.all((np.abs(hi - lo) < tol) | (f_r == 0)):
+            break
+        left = np.sign(f_r) == np.sign(f_lo)
+        # Radice tra r e hi: sposta lo, dimezza f_hi se lo stesso estremo è stato mosso due volte
+        f_hi = np.where(left & (side == 1), f_hi / 2, f_hi)
+        f_lo = np.where(~left & (side == -1), f_lo / 2, f_lo)
+        lo, f_lo = np.where(left, r, lo), np.where(left, f_r, f_lo)
+        hi, f_hi = np.where(left, hi, r), np.where(left, f_hi, f_r)
+        side = np.where(left, 1, -1)
+    return r
+
+
+def solve_irr(cf, guess=0.1, tol=1e-10, maxiter=50):
+    """
+    IRR di ogni riga di `cf` (N x T, flusso del periodo 0 nella prima colonna).
+    Restituisce un dict con:
+      "irr":          vettore N dei tassi (NaN dove non esiste o non converge)
+      "status":       vettore N con i codici IRR_* di questo modulo
+      "sign_changes": vettore N con il numero di cambi di segno dei flussi
+    """
+    cf = np.atleast_2d(np.asarray(cf, dtype=float))
+    n = cf.shape[0]
+    changes = sign_changes(cf)
+    rate = np.full(n, np.nan)
+    status = np.full(n, IRR_NO_SIGN_CHANGE)
+
+    todo = np.flatnonzero(changes > 0)
+    if todo.size:
+        sub = cf[todo]
+        r, ok, _ = _newton(sub, guess, tol, maxiter)
+        # Fallback a intervallo solo per le serie rimaste senza radice
+        above = np.zeros(todo.size, dtype=bool)
+        miss = np.flatnonzero(~ok)
+        if miss.size:
+            lo, hi, found = _bracket(sub[miss], guess)
+            sel = miss[found]
+            if sel.size:
+                r[sel] = _illinois(sub[sel], lo[found], hi[found], tol, maxiter * 4)
+                ok[sel] = True
+            left = miss[~found]
+            if left.size:
+                above[left] = _above_range(sub[left])
+        rate[todo] = np.where(ok, r, np.nan)
+        status[todo] = np.where(ok, np.where(changes[todo] > 1, IRR_MULTIPLE, IRR_OK),
+                                np.where(above, IRR_ABOVE_RANGE, IRR_NOT_CONVERGED))
+    return {"irr": rate, "status": status, "sign_changes": changes}
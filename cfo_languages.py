@@ -0,0 +1,86 @@
+# --- CATALOGO LINGUE ---
+# I testi dell'interfaccia stanno in locales/<codice>.json, uno per lingua. Ogni lingua
+# si carica alla prima richiesta e si compila una sola volta per processo: le chiavi
+# mancanti si completano lungo la catena di fallback (es. pt_BR -> pt -> en -> it), così
+# una traduzione parziale non rompe l'app. LANGUAGES resta un mapping nome -> dizionario:
+# L["kpi"]["npv"] e Labels[...] non cambiano, e il lavoro per rerun è una lookup
+# qualunque sia il numero di lingue disponibili.
+
+import json
+import threading
+from collections.abc import Mapping
+from functools import lru_cache
+from pathlib import Path
+
+LOCALES_DIR = Path(__file__).with_name("locales")
+SOURCE_LOCALE = "it"          # catalogo completo di riferimento: ultimo anello di ogni catena
+DEFAULT_FALLBACK = "en"       # fallback delle lingue senza una voce in FALLBACK
+
+# Nome nel selettore della lingua -> codice del file in locales/
+LOCALES = {
+    "Italiano": "it",
+    "English": "en",
+}
+# Fallback espliciti (codice -> codice); le varianti regionali ricadono sulla lingua base
+FALLBACK = {"en": SOURCE_LOCALE}
+
+
+def fallback_chain(code):
+    """Codici da cui si prendono i testi di `code`, dal più specifico al catalogo di riferimento."""
+    chain = [code]
+    while chain[-1] != SOURCE_LOCALE:
+        last = chain[-1]
+        nxt = FALLBACK.get(last) or (last.split("_")[0] if "_" in last else DEFAULT_FALLBACK)
+        chain.append(SOURCE_LOCALE if nxt in chain else nxt)
+    return chain
+
+
+@lru_cache(maxsize=None)
+def _read(code):
+    with open(LOCALES_DIR / f"{code}.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _merge(base, over):
+    # Sezioni annidate fuse chiave per chiave; liste e testi sostituiti per intero
+    out = dict(base)
+    for k, v in over.items():
+        out[k] = _merge(base[k], v) if isinstance(v, dict) and isinstance(base.get(k), dict) else v
+    return out
+
+
+class Catalog(Mapping):
+    """Mapping nome lingua -> testi (dizionario da trattare in sola lettura), caricati alla prima richiesta."""
+
+    def __init__(self, locales):
+        self._locales = dict(locales)
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        texts = self._compiled.get(name)
+        if texts is None:
+            code = self._locales[name]
+            with self._lock:
+                texts = self._compiled.get(name)
+                if texts is None:
+                    # Anelli intermedi senza file (es. pt per pt_BR) saltati; la lingua chiesta no
+                    chain = [c for c in fallback_chain(code) if c == code or (LOCALES_DIR / f"{c}.json").exists()]
+                    texts = {}
+                    for c in reversed(chain):
+                        texts = _merge(texts, _read(c))
+                    self._compiled[name] = texts
+        return texts
+
+    def __iter__(self):
+        return iter(self._locales)
+
+    def __len__(self):
+        return len(self._locales)
+
+    def loaded(self):
+        """Lingue già compilate in questo processo."""
+        return list(self._compiled)
+
+
+LANGUAGES = Catalog(LOCALES)
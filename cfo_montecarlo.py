@@ -0,0 +1,152 @@
+# --- SIMULAZIONE MONTE CARLO ---
+# Campiona i driver da distribuzioni configurabili e valuta i percorsi a blocchi
+# con il motore vettoriale: la memoria resta limitata alla dimensione del blocco.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from cfo_engine import block_rows, evaluate_projects
+from cfo_sensitivity import wacc_floor
+
+# Driver che la simulazione può far variare (tutti in decimali)
+MC_DRIVERS = ("growth", "cogs_p", "opex_g", "wacc", "shock")
+
+# Limiti fisici dei driver: i campioni fuori range vengono troncati
+_BOUNDS = {
+    "growth": (-0.99, None),
+    "cogs_p": (0.0, 1.0),
+    "opex_g": (-0.99, None),
+    "wacc": (0.0001, None),
+    "shock": (-1.0, None),
+}
+
+DEFAULT_CHUNK = 100_000
+
+
+def sample(spec, n, rng):
+    """
+    Estrae `n` valori per ogni driver di `spec`.
+    Formato spec: {"growth": ("normal", media, dev_std), "wacc": ("uniform", min, max),
+                   "shock": ("triangular", min, moda, max), "cogs_p": ("fixed", valore)}
+    """
+    out = {}
+    for name, dist in spec.items():
+        kind, *p = dist
+        if kind == "normal":
+            x = rng.normal(p[0], p[1], n)
+        elif kind == "uniform":
+            x = rng.uniform(p[0], p[1], n)
+        elif kind == "triangular":
+            x = rng.triangular(p[0], p[1], p[2], n)
+        elif kind == "fixed":
+            x = np.full(n, float(p[0]))
+        else:
+            raise ValueError(f"Distribuzione non supportata per '{name}': {kind}")
+        lo, hi = _BOUNDS.get(name, (None, None))
+        if lo is not None or hi is not None:
+            x = np.clip(x, lo, hi)
+        out[name] = x
+    return out
+
+
+def run_chunk(base, spec, n, seed, with_irr, options=None):
+    """
+    Un blocco di `n` percorsi (i driver non campionati restano al valore base). Con valore
+    terminale il WACC campionato resta sopra wacc_floor(), come nella sensitività: nessun
+    percorso ha NPV non definito.
+    """
+    rng = np.random.default_rng(seed)
+    d = dict(base)
+    d.update(sample(spec, n, rng))
+    floor = wacc_floor(options)
+    if floor is not None and "wacc" in spec:
+        d["wacc"] = np.maximum(d["wacc"], floor)
+    shock = d.pop("shock", 0.0)
+
+    res = evaluate_projects(**d, with_irr=with_irr, **(options or {}))
+    ebitda = np.broadcast_to(d["rev1"] * (1 - d["cogs_p"]) - d["opex1"], (n,))
+    stress = np.broadcast_to(d["rev1"] * (1 + shock) * (1 - d["cogs_p"]) - d["opex1"], (n,))
+    return {
+        "npv": res["npv"],
+        "irr": res["irr"] if with_irr else np.full(n, np.nan),
+        "ebitda": np.array(ebitda, dtype=float),
+        "stress_ebitda": np.array(stress, dtype=float),
+    }
+
+
+def plan(base, spec, n_paths, chunk_size=DEFAULT_CHUNK, seed=None, with_irr=True, options=None):
+    """
+    Argomenti di run_chunk() per ogni blocco di simulate(): chi esegue i blocchi altrove
+    (es. cfo_service) ottiene gli stessi percorsi, nello stesso ordine.
+    """
+    unknown = set(spec) - set(MC_DRIVERS)
+    if unknown:
+        raise ValueError(f"Driver non simulabili: {sorted(unknown)}")
+
+    # Con orizzonti lunghi il blocco si riduce: righe x periodi restano limitati
+    n_periods = int(np.max(base["years"])) * int((options or {}).get("periods_per_year", 1))
+    chunk_size = min(chunk_size, block_rows(n_periods))
+    sizes = [min(chunk_size, n_paths - i) for i in range(0, n_paths, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    return [(base, spec, n, s, with_irr, options) for n, s in zip(sizes, seeds)]
+
+
+def simulate(base, spec, n_paths, chunk_size=DEFAULT_CHUNK, seed=None, workers=1, with_irr=True, options=None):
+    """
+    Esegue `n_paths` percorsi Monte Carlo.
+    `base`: driver deterministici di evaluate_projects (capex, years, wacc, rev1, ...).
+    `workers`: 1 = processo corrente, None/0 = tutti i core, N = pool di N processi.
+    Ogni blocco ha un seme derivato da `seed`, quindi il risultato non dipende dai worker.
+    `options`: opzioni DCF di evaluate_projects (periodicità, ammortamento, valore terminale...).
+    """
+    chunks = plan(base, spec, n_paths, chunk_size, seed, with_irr, options)
+    out = {k: np.empty(n_paths) for k in ("npv", "irr", "ebitda", "stress_ebitda")}
+
+    if not workers:
+        workers = os.cpu_count() or 1
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            _fill(out, pool.map(run_chunk, *zip(*chunks)))
+    else:
+        _fill(out, (run_chunk(*c) for c in chunks))
+    return out
+
+
+def collect(parts):
+    """Unisce i risultati di run_chunk() (nell'ordine di plan()) nei vettori di simulate()."""
+    n_paths = sum(len(p["npv"]) for p in parts)
+    out = {k: np.empty(n_paths) for k in ("npv", "irr", "ebitda", "stress_ebitda")}
+    _fill(out, parts)
+    return out
+
+
+def _fill(out, parts):
+    # Copia i blocchi nei vettori finali man mano che arrivano
+    pos = 0
+    for part in parts:
+        n = len(part["npv"])
+        for k, v in part.items():
+            out[k][pos:pos + n] = v
+        pos += n
+
+
+def summarize(values):
+    """
+    Percentili P5/P50/P95, media e probabilità di perdita (valore < 0) sui valori definiti,
+    più nan_share: quota di percorsi esclusi perché non definiti (es. IRR senza soluzione).
+    """
+    v = np.asarray(values, dtype=float)
+    ok = ~np.isnan(v)
+    nan_share = float(1 - ok.mean()) if v.size else np.nan
+    v = v[ok]
+    if v.size == 0:
+        return {"p5": np.nan, "p50": np.nan, "p95": np.nan, "mean": np.nan, "prob_loss": np.nan, "nan_share": nan_share}
+    p5, p50, p95 = np.percentile(v, [5, 50, 95])
+    return {"p5": p5, "p50": p50, "p95": p95, "mean": v.mean(), "prob_loss": (v < 0).mean(), "nan_share": nan_share}
+
+
+def summary(res, bins=60):
+    """Statistiche e istogramma (conteggi, bordi) di ogni vettore di simulate(): ciò che serve alla UI."""
+    return {k: {"stats": summarize(v), "hist": np.histogram(v[~np.isnan(v)], bins=bins)} for k, v in res.items()}
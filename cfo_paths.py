@@ -0,0 +1,13 @@
+# --- CARTELLA DATI DELL'APP ---
+# Archivio scenari (cfo_scenarios) e cache dei partitari (cfo_ingest) stanno sotto una sola
+# cartella per utente: un unico posto da salvare, spostare o cancellare. CFO_DATA_DIR la
+# sposta per intero; le variabili dei singoli moduli restano per gli override puntuali.
+
+import os
+
+DATA_DIR = os.environ.get("CFO_DATA_DIR", os.path.join(os.path.expanduser("~"), ".black_swan_cfo"))
+
+
+def data_path(*parts):
+    """Percorso dentro la cartella dati dell'app."""
+    return os.path.join(DATA_DIR, *parts)
@@ -1,23 +1,26 @@
 import os
 import sys
 import time
+import json
+import importlib
+import importlib.machinery
 import io
+import hashlib
+import tempfile
+from functools import partial
 from datetime import datetime
 
+# Streamlit esegue lo script come modulo "__main__" senza spec: i worker del servizio di
+# calcolo (forkserver/spawn) lo rieseguirebbero per intero. Con uno spec di nome
+# "__main__" multiprocessing lo lascia stare; i task vivono nei moduli cfo_*.
+__spec__ = importlib.machinery.ModuleSpec("__main__", None)
+
 # --- NOTE ---
 # Versione Clean: Rimosso il sistema di auto-installazione instabile.
 # Le dipendenze vengono gestite esternamente (es. tramite ripara_installazione.bat)
 
 # --- IMPORTAZIONI PROTETTE ---
-try:
-    import streamlit as st
-    import pandas as pd
-    import numpy as np
-    import plotly.graph_objects as go
-    import numpy_financial as npf
-    from pptx import Presentation
-    from fpdf import FPDF
-except ImportError as e:
+def missing_library(e):
     # Se manca una libreria, ora vediamo ESATTAMENTE quale manca
     try:
         import streamlit as st
@@ -31,401 +34,379 @@ except ImportError as e:
         time.sleep(10)
         sys.exit()
 
-# --- TAVOLO COLORI EXECUTIVE ---
-COLORS = {
-    "primary": "#1a1a1a",      # Nero Black Swan
-    "accent": "#deff9a",       # Lime/Oro Infografica
-    "secondary": "#3B82F6",    # Blu Professionale
-    "danger": "#EF4444",       # Rosso Rischio
-    "success": "#10B981",      # Verde Profitto
-    "neutral": "#64748b"       # Grigio
-}
-
-# --- DIZIONARIO LINGUE ESTESO ---
-LANGUAGES = {
-    "Italiano": {
-        "sidebar_title": "CFO OS 2025",
-        "settings": "Configurazione Generale",
-        "company": "Azienda",
-        "currency": "Valuta",
-        "tabs": ["🏠 Sintesi", "📖 Guida CEO", "📊 Investimenti", "🔄 SaaS", "💧 Liquidità", "🎯 Break-even", "🌪️ Stress Test"],
-        "labels": {
-            "settings": "Configurazione", "company": "Azienda", "currency": "Valuta",
-            "capex": "Investimento (Capex)", "years": "Anni Orizzonte", "wacc": "WACC %",
-            "rev1": "Ricavi Anno 1", "growth": "Crescita Ricavi %", "cogs": "COGS %",
-            "opex": "OPEX Anno 1", "opex_g": "Crescita OPEX %", "tax": "Tax Rate %",
-            "arr": "ARR Iniziale", "exp": "Espansione €", "churn_val": "Churn €",
-            "cac": "CAC", "arpu": "ARPU Mensile", "churn_rate": "Churn Mensile %", "gm_saas": "Gross Margin SaaS %",
-            "cash": "Cassa", "debt_st": "Debiti Breve T.", "debt_lt": "Debiti Lungo T.",
-            "dso": "DSO (Incasso)", "dio": "DIO (Magazzino)", "dpo": "DPO (Fornitori)",
-            "price": "Prezzo Unitario", "var_cost": "Costo Variabile Unit.", "fix_cost": "Costi Fissi Tot.", "vol": "Volume",
-            "shock_rev": "Shock Ricavi %", "shock_cost": "Shock Costi %",
-            "gen_report": "Genera Report", "download": "Scarica"
-        },
-        "tips": {
-            "wacc": "Il 'Costo del Capitale'. Rappresenta il rendimento minimo che devi ottenere per soddisfare banche e azionisti.",
-            "capex": "Soldi che escono SUBITO. Include macchinari, software, ristrutturazioni.",
-            "cogs": "Costi diretti (materie prime). Se aumentano, il margine lordo scende.",
-            "opex": "Spese fisse (affitti, stipendi amministrativi).",
-            "nopat": "Net Operating Profit After Tax. È il vero utile operativo 'pulito' dagli interessi sul debito.",
-            "npv": "La somma di tutti i soldi futuri portati al valore di oggi. Se è > 0, procedi.",
-            "tax": "Aliquota fiscale stimata. Default 28%."
-        },
-        "kpi": {
-            "npv": "NPV (VAN)", "irr": "IRR (TIR)", "payback": "Payback", "pfn": "PFN",
-            "nrr": "Retention (NRR)", "ltv_cac": "LTV/CAC", "ccc": "Ciclo Cassa (CCC)", "safety": "Margine Sicurezza",
-            "bep": "BEP (Valore)"
-        },
-        "recom": {
-            "npv_ok": "✅ Semaforo Verde: Il progetto crea valore economico reale.",
-            "npv_ko": "❌ Semaforo Rosso: Il progetto distrugge ricchezza. Non approvare.",
-            "liq_ok": "💧 Cassa OK: Nessuna tensione di liquidità a breve.",
-            "liq_ko": "⚠️ Allerta Cassa: Ciclo troppo lungo, rischi di finire i soldi.",
-            "saas_ok": "🚀 Motore SaaS Sano: Ottima efficienza commerciale.",
-            "saas_ko": "🔻 Motore SaaS Rotto: Spendi troppo per acquisire clienti.",
-            "stress_ok": "🛡️ Resiliente: L'azienda regge lo shock sui ricavi.",
-            "stress_ko": "🌪️ Fragile: Lo stress test porta l'EBITDA in negativo."
-        },
-        "titles": {
-            "invest": "Analisi Investimenti", "saas": "Metriche SaaS", "liq": "Liquidità & PFN",
-            "bep": "Break-even Point", "stress": "Stress Test", "sum": "Executive Summary"
-        },
-        "f_ricavi": "Ricavi", "f_ebitda": "EBITDA", "f_nopat": "NOPAT",
-        "headers": {
-            "bep_intro": "Analisi del punto di pareggio", 
-            "stress_intro": "Simulazione scenari di crisi", 
-            "dash_ceo": "Dashboard Direzionale",
-            "recom_strat": "Raccomandazioni Strategiche",
-            "details": "📋 Dettaglio Annuale",
-            "cf_chart": "📉 Dinamica dei Flussi di Cassa (Waterfall)",
-            "drivers": "Driver Operativi",
-            "spread_chart": "⚖️ Economic Value Spread (ROIC vs WACC)"
-        },
-        "guide": {
-            "title": "Manuale Strategico per il CEO",
-            "faq_title": "❓ 5. FAQ",
-            "intro": """
-            **1. INTRODUZIONE**
-            
-            Benvenuto nel **CFO Operating System 2025**, uno strumento decisionale strategico progettato per i leader finanziari moderni.
-            A differenza dei fogli di calcolo tradizionali, questo sistema ti consente di simulare scenari, testare la resilienza del tuo modello di business e convalidare le decisioni di investimento in tempo reale.
-
-            **Filosofia Core:**
-            *"La finanza non riguarda il reporting del passato. Riguarda l'architettura del valore futuro."*
-            
-            ---
-            **2. PER INIZIARE**
-            
-            * **Installazione:** Assicurati che Python sia installato. Esegui il file `.bat` o lo script da terminale.
-            * **Configurazione (Sidebar):** Inserisci Nome Azienda, Valuta (€, $, £) e Lingua.
-            """,
-            "modules_title": "3. PANORAMICA MODULI",
-            "mod_invest": """
-            ### 📊 Tab 1: Analisi Investimenti (Capex)
-            **Obiettivo:** Decidere se un nuovo progetto/investimento è finanziariamente sostenibile.
-            
-            **Input:**
-            * *Capex:* L'esborso di cassa iniziale (es. macchinari, R&D, software).
-            * *Orizzonte:* Quanti anni vuoi proiettare.
-            * *WACC:* Il tuo costo del capitale (benchmark: 8-12%).
-            * *Driver Ricavi:* Ricavi attesi Anno 1 e % di crescita annuale.
-            * *Margini:* % Target EBITDA e struttura OPEX.
-
-            **Metriche Chiave:**
-            * **NPV (Valore Attuale Netto):** La metrica più importante.
-                * *Positivo (+):* Il progetto crea ricchezza. **APPROVA**.
-                * *Negativo (-):* Il progetto distrugge valore. **RIFIUTA**.
-            * **IRR (Tasso Interno di Rendimento):** Il rendimento annualizzato del progetto. Deve essere > WACC.
-            * **Payback Period:** Tempo necessario per recuperare l'esborso iniziale.
-            """,
-            "mod_saas": """
-            ### 🔄 Tab 2: Metriche SaaS & Subscription
-            **Obiettivo:** Valutare la salute dei modelli di ricavo ricorrenti.
-            
-            **Input:**
-            * *ARR:* Annual Recurring Revenue.
-            * *Churn:* % di ricavi persi annualmente.
-            * *CAC:* Costo per acquisire un singolo cliente (Marketing + Vendite).
-            * *ARPU:* Average Revenue Per User.
-
-            **Metriche Chiave:**
-            * **LTV/CAC Ratio:** La "Metrica Aurea" dell'economia unitaria.
-                * *> 3.0x:* Crescita sana.
-                * *< 1.0x:* Perdi soldi su ogni cliente.
-            * **NRR (Net Revenue Retention):** Misura la crescita dai clienti esistenti. Target > 100%.
-            """,
-            "mod_liq": """
-            ### 💧 Tab 3: Liquidità & Debito Netto
-            **Obiettivo:** Assicurare che l'azienda abbia abbastanza cassa per sopravvivere e crescere.
-            
-            **Input:**
-            * *Cassa Disponibile:* Saldo bancario attuale.
-            * *Debito:* Prestiti a breve e lungo termine.
-            * *Capitale Circolante:* DSO (Vendite), DIO (Scorte), DPO (Fornitori).
-
-            **Metriche Chiave:**
-            * **PFN (Posizione Finanziaria Netta):** Debito Totale meno Cassa.
-            * **CCC (Cash Conversion Cycle):** Il numero di giorni in cui la cassa è "bloccata" nelle operazioni. Più basso è, meglio è.
-            """,
-            "mod_bep": """
-            ### 🎯 Tab 4: Analisi Break-even
-            **Obiettivo:** Definire la soglia minima di viabilità.
-            
-            **Input:**
-            * *Prezzo Unitario & Costo Variabile:* Per calcolare il Margine di Contribuzione.
-            * *Costi Fissi:* Affitto, stipendi, spese generali.
-
-            **Metriche Chiave:**
-            * **BEP (Valore):** L'importo esatto di ricavi necessario per raggiungere profitto zero.
-            * **Margine di Sicurezza:** La % di cui i ricavi possono scendere prima di iniziare a perdere soldi (Target > 20%).
-            """,
-            "mod_stress": """
-            ### 🌪️ Tab 5: Stress Test (Black Swan)
-            **Obiettivo:** Testare la resilienza contro shock di mercato.
-            
-            **Azione:** Muovi i cursori per simulare un evento "Cigno Nero" (es. -20% Ricavi, +15% Costi).
-            **Risultato:** L'EBITDA rimane positivo? Se sì, il tuo modello di business è **Anti-fragile**.
-            
-            ---
-            **4. EXECUTIVE SUMMARY & EXPORT**
-            Il Tab **Sintesi** aggrega i dati per fornire lo stato in tempo reale (Semafori Verdi/Rossi) e Raccomandazioni Strategiche.
-            Usa i pulsanti nella sidebar per scaricare report PDF e PPT.
-            """,
-            "faq_q1": "**Q: Perché calcolate il NOPAT?**",
-            "faq_a1": "A: L'EBITDA è spesso fuorviante. Il NOPAT (Net Operating Profit After Tax) è il vero flusso di cassa operativo disponibile per ripagare gli investitori.",
-            "faq_q2": "**Q: Cosa succede se il Payback è 'N.D.'?**",
-            "faq_a2": "A: Significa che il progetto non raggiunge mai il pareggio entro il periodo selezionato. È un investimento altamente rischioso.",
-            "faq_q3": "**Q: Posso usarlo per aziende non-SaaS?**",
-            "faq_a3": "A: Sì. Salta semplicemente il tab 'SaaS'. I moduli Investimenti, Liquidità e Stress Test sono universali."
-        },
-        "footer_base": "Basato su The Black Swan CFO Playbook"
-    },
-    "English": {
-        "sidebar_title": "CFO OS 2025",
-        "settings": "General Settings",
-        "company": "Company",
-        "currency": "Currency",
-        "tabs": ["🏠 Summary", "📖 CEO Guide", "📊 Investments", "🔄 SaaS", "💧 Liquidity", "🎯 Break-even", "🌪️ Stress Test"],
-        "labels": {
-            "settings": "Configuration", "company": "Company", "currency": "Currency",
-            "capex": "Initial Investment", "years": "Time Horizon", "wacc": "WACC %",
-            "rev1": "Year 1 Revenue", "growth": "Revenue Growth %", "cogs": "COGS %",
-            "opex": "Year 1 OPEX", "opex_g": "OPEX Growth %", "tax": "Tax Rate %",
-            "arr": "Starting ARR", "exp": "Expansion €", "churn_val": "Churn €",
-            "cac": "CAC", "arpu": "Monthly ARPU", "churn_rate": "Monthly Churn %", "gm_saas": "SaaS Gross Margin %",
-            "cash": "Cash on Hand", "debt_st": "Short Term Debt", "debt_lt": "Long Term Debt",
-            "dso": "DSO (Receivables)", "dio": "DIO (Inventory)", "dpo": "DPO (Payables)",
-            "price": "Unit Price", "var_cost": "Unit Var. Cost", "fix_cost": "Total Fixed Costs", "vol": "Volume",
-            "shock_rev": "Revenue Shock %", "shock_cost": "Cost Shock %",
-            "gen_report": "Generate Report", "download": "Download"
-        },
-        "tips": {
-            "wacc": "Weighted Average Cost of Capital. Minimum return required.",
-            "capex": "Immediate cash outflow for fixed asset acquisition.",
-            "cogs": "Direct costs related to production or service.",
-            "opex": "Fixed operating costs (rent, salaries, admin).",
-            "nopat": "Net Operating Profit After Tax.",
-            "npv": "Net Present Value: wealth created today by future flows.",
-            "tax": "Estimated average tax rate."
-        },
-        "kpi": {
-            "npv": "NPV", "irr": "IRR", "payback": "Payback", "pfn": "Net Debt",
-            "nrr": "Retention (NRR)", "ltv_cac": "LTV/CAC", "ccc": "Cash Cycle (CCC)", "safety": "Safety Margin",
-            "bep": "BEP (Value)"
-        },
-        "recom": {
-            "npv_ok": "✅ Green Light: Project creates real value.",
-            "npv_ko": "❌ Red Light: Project destroys wealth.",
-            "liq_ok": "💧 Liquidity OK: Efficient cash cycle.",
-            "liq_ko": "⚠️ Cash Alert: Cycle too long, risk of crisis.",
-            "saas_ok": "🚀 Healthy SaaS Engine: Great sales efficiency.",
-            "saas_ko": "🔻 Broken SaaS Engine: Acquisition cost too high.",
-            "stress_ok": "🛡️ Resilient: Company withstands revenue shock.",
-            "stress_ko": "🌪️ Fragile: Stress test pushes EBITDA to negative."
-        },
-        "titles": {
-            "invest": "Investment Analysis", "saas": "SaaS Metrics", "liq": "Liquidity & Net Debt",
-            "bep": "Break-even Point", "stress": "Stress Test", "sum": "Executive Summary"
-        },
-        "f_ricavi": "Revenue", "f_ebitda": "EBITDA", "f_nopat": "NOPAT",
-        "headers": {
-            "bep_intro": "Break-even analysis", 
-            "stress_intro": "Crisis simulation scenarios", 
-            "dash_ceo": "Executive Dashboard",
-            "recom_strat": "Strategic Recommendations",
-            "details": "📋 Annual Detail",
-            "cf_chart": "📉 Cash Flow Dynamics (Waterfall)",
-            "drivers": "Operational Drivers",
-            "spread_chart": "⚖️ Economic Value Spread (ROIC vs WACC)"
-        },
-        "guide": {
-            "title": "CEO Strategic Manual",
-            "faq_title": "❓ 5. FAQ",
-            "intro": """
-            **1. INTRODUCTION**
-            
-            Welcome to the **CFO Operating System 2025**, a strategic decision-making tool designed for modern financial leaders.
-            Unlike traditional spreadsheets, this system allows you to simulate scenarios, stress-test your business model, and validate investment decisions in real-time.
-
-            **Core Philosophy:**
-            *"Finance is not about reporting the past. It is about architectural design of future value."*
-            
-            ---
-            **2. GETTING STARTED**
-            
-            * **Installation:** Ensure Python is installed. Run the `.bat` file or script via terminal.
-            * **Configuration (Sidebar):** Enter Company Name, Currency (€, $, £), and Language.
-            """,
-            "modules_title": "3. MODULES OVERVIEW",
-            "mod_invest": """
-            ### 📊 Tab 1: Investment Analysis (Capex)
-            **Goal:** Decide if a new project/investment is financially viable.
-            
-            **Inputs:**
-            * *Capex:* The initial cash outlay (e.g., machinery, R&D, software).
-            * *Horizon:* How many years you want to project.
-            * *WACC:* Your cost of capital (benchmark: 8-12%).
-            * *Revenue Drivers:* Expected Year 1 revenue and annual growth %.
-            * *Margins:* Target EBITDA % and OPEX structure.
-
-            **Key Metrics:**
-            * **NPV (Net Present Value):** The single most important metric. 
-                * *Positive (+):* The project creates wealth. **APPROVE**.
-                * *Negative (-):* The project destroys value. **REJECT**.
-            * **IRR (Internal Rate of Return):** The annualized return of the project. Must be > WACC.
-            * **Payback Period:** Time required to recover the initial cash outlay.
-            """,
-            "mod_saas": """
-            ### 🔄 Tab 2: SaaS & Subscription Metrics
-            **Goal:** Evaluate the health of recurring revenue models.
-            
-            **Inputs:**
-            * *ARR:* Annual Recurring Revenue.
-            * *Churn:* % of revenue lost annually.
-            * *CAC:* Cost to acquire a single customer (Marketing + Sales).
-            * *ARPU:* Average Revenue Per User.
-
-            **Key Metrics:**
-            * **LTV/CAC Ratio:** The "Golden Metric" of unit economics.
-                * *> 3.0x:* Healthy growth.
-                * *< 1.0x:* You are losing money on every customer.
-            * **NRR (Net Revenue Retention):** Measures growth from existing customers. Target > 100%.
-            """,
-            "mod_liq": """
-            ### 💧 Tab 3: Liquidity & Net Debt
-            **Goal:** Ensure the company has enough cash to survive and grow.
-            
-            **Inputs:**
-            * *Cash on Hand:* Current bank balance.
-            * *Debt:* Short-term and Long-term loans.
-            * *Working Capital Days:* DSO (Sales), DIO (Inventory), DPO (Payables).
-
-            **Key Metrics:**
-            * **PFN (Net Financial Position):** Total Debt minus Cash.
-            * **CCC (Cash Conversion Cycle):** The number of days your cash is "trapped" in operations. Lower is better.
-            """,
-            "mod_bep": """
-            ### 🎯 Tab 4: Break-even Analysis
-            **Goal:** Define the minimum viability threshold.
-            
-            **Inputs:**
-            * *Unit Price & Variable Cost:* To calculate the Contribution Margin.
-            * *Fixed Costs:* Rent, salaries, overheads.
-
-            **Key Metrics:**
-            * **BEP (Value):** The exact revenue amount needed to reach zero profit.
-            * **Safety Margin:** The % your revenue can drop before you start losing money. (Target > 20%).
-            """,
-            "mod_stress": """
-            ### 🌪️ Tab 5: Stress Test (Black Swan)
-            **Goal:** Test resilience against market shocks.
-            
-            **Action:** Move the sliders to simulate a "Black Swan" event (e.g., -20% Revenue, +15% Costs).
-            **Result:** Does EBITDA remain positive? If yes, your business model is **Anti-fragile**.
-            
-            ---
-            **4. EXECUTIVE SUMMARY & EXPORT**
-            The **Home Tab (Summary)** acts as your cockpit. It aggregates data from all other modules to provide real-time status and recommendations.
-            Use the buttons in the sidebar to download PDF and PPT reports.
-            """,
-            "faq_q1": "**Q: Why do you calculate NOPAT?**",
-            "faq_a1": "A: EBITDA is often misleading. NOPAT (Net Operating Profit After Tax) is the true operating cash flow available to pay back investors.",
-            "faq_q2": "**Q: What if Payback is 'N.D.'?**",
-            "faq_a2": "A: It means the project never breaks even within the selected timeframe. It is a highly risky investment.",
-            "faq_q3": "**Q: Can I use this for non-SaaS companies?**",
-            "faq_a3": "A: Yes. Just skip the 'SaaS' tab. The Investment, Liquidity, and Stress Test modules are universal."
-        },
-        "footer_base": "Based on The Black Swan CFO Playbook"
-    }
-}
-
-# --- FUNZIONI DI EXPORT ---
-def sanitize_text(text):
-    if not isinstance(text, str): text = str(text)
-    return text.replace('€', 'EUR').replace('£', 'GBP').replace('$', 'USD').encode('latin-1', 'replace').decode('latin-1')
-
-def generate_pdf(data, recoms, title):
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Helvetica", "B", 16)
-    pdf.cell(0, 10, sanitize_text(title), ln=True, align='C')
-    pdf.ln(10)
-    pdf.set_font("Helvetica", "B", 12)
-    pdf.cell(0, 10, "KPI Summary:", ln=True)
-    pdf.set_font("Helvetica", "", 11)
-    for k, v in data.items():
-        pdf.cell(0, 8, f"{sanitize_text(k)}: {sanitize_text(v)}", ln=True)
-    pdf.ln(10)
-    pdf.set_font("Helvetica", "B", 12)
-    pdf.cell(0, 10, "Strategic Recommendations:", ln=True)
-    pdf.set_font("Helvetica", "", 10)
-    width = pdf.w - 2 * pdf.l_margin
-    for r in recoms:
-        pdf.set_x(pdf.l_margin)
-        pdf.multi_cell(width, 8, sanitize_text(f"- {r}"))
-    pdf.ln(10)
-    pdf.set_font("Helvetica", "I", 8)
-    pdf.cell(0, 10, f"Generated by Black Swan CFO OS - {datetime.now().strftime('%Y-%m-%d')}", ln=True, align='C')
-    return pdf.output(dest='S').encode('latin-1')
-def generate_pptx(data, recoms, title):
-    prs = Presentation()
-    slide = prs.slides.add_slide(prs.slide_layouts[0])
-    slide.shapes.title.text = title
-    slide.placeholders[1].text = f"Analisi Finanziaria Strategica\n{datetime.now().strftime('%Y-%m-%d')}"
-    slide = prs.slides.add_slide(prs.slide_layouts[1])
-    slide.shapes.title.text = "Key Performance Indicators"
-    tf = slide.placeholders[1].text_frame
-    for k, v in data.items():
-        p = tf.add_paragraph()
-        p.text = f"{k}: {v}"
-    slide = prs.slides.add_slide(prs.slide_layouts[1])
-    slide.shapes.title.text = "Strategic Recommendations"
-    tf = slide.placeholders[1].text_frame
-    for r in recoms:
-        p = tf.add_paragraph()
-        p.text = r
-    buf = io.BytesIO()
-    prs.save(buf)
-    return buf.getvalue()
+def require(module):
+    # Import differito (plotly, ...) con la stessa diagnostica delle importazioni protette
+    try:
+        return importlib.import_module(module)
+    except ImportError as e:
+        missing_library(e)
 
-def generate_csv(data):
-    df = pd.DataFrame(list(data.items()), columns=['Metric', 'Value'])
-    return df.to_csv(index=False).encode('utf-8')
+try:
+    import streamlit as st
+    import pandas as pd
+    import numpy as np
+    from cfo_engine import (evaluate_projects, to_annual, saas_kpis, liquidity_kpis, breakeven_kpis,
+                            stress_kpis, recommendation_flags, DEFAULT_INPUTS)
+    from cfo_irr import IRR_MULTIPLE, IRR_NO_SIGN_CHANGE, IRR_NOT_CONVERGED, IRR_ABOVE_RANGE
+    from cfo_montecarlo import plan, run_chunk, collect, summary
+    from cfo_sensitivity import tornado, grid, default_range, RATE_DRIVERS
+    from cfo_saas import simulate_cohorts
+    from cfo_cashflow import driver_flows, forecast
+    from cfo_ingest import ingest, file_hash, derive_drivers, open_items
+    from cfo_scenarios import ScenarioStore, GRAPH
+    from cfo_stress import plan_stress, run_stress_chunk, collect_stress, black_swan_summary, crisis_correlation
+    from cfo_breakeven import sku_arrays, mix_breakeven, profit_surface
+    from cfo_portfolio import optimize_portfolio
+    from cfo_consolidation import Consolidation
+    from cfo_goalseek import goal_seek, KPI_DRIVERS, DEFAULT_TARGETS, PERCENT_DRIVERS
+    from cfo_export import (available_formats, mime_type, projection_frame, export_frame, export_grid,
+                            export_simulation, prune)
+    from cfo_reports import (generate_pdf, generate_pptx, generate_csv, build_export_data,
+                             build_recoms, format_irr)
+    from cfo_languages import LANGUAGES
+    from cfo_profiling import PROFILER
+    from cfo_service import ComputeService, job_key
+    from cfo_theme import COLORS, APP_CSS
+except ImportError as e:
+    missing_library(e)
+
+# --- CALCOLI MEMOIZZATI ---
+# Ogni tab ha una funzione pura in cache (LRU limitata): un rerun ricalcola solo
+# i moduli i cui driver sono cambiati, non quando cambiano lingua o azienda.
+MODEL_CACHE_ENTRIES = 256
+MC_CACHE_ENTRIES = 16
+FIGURE_CACHE_ENTRIES = 64
+
+def _scalars(d):
+    return {k: float(v) for k, v in d.items()}
+
+@PROFILER.timed("calc.investment")
+@st.cache_data(max_entries=MODEL_CACHE_ENTRIES, show_spinner=False)
+def calc_investment(inv, durata, wacc, rev1, growth, cogs_p, opex1, opex_g, tax_r, options):
+    return evaluate_projects(inv, durata, wacc, rev1, growth, cogs_p, opex1, opex_g, tax_r, **options)
+
+@PROFILER.timed("calc.saas")
+@st.cache_data(max_entries=MODEL_CACHE_ENTRIES, show_spinner=False)
+def calc_saas(arpu, churn, cac):
+    return _scalars(saas_kpis(arpu, churn, cac))
+
+@PROFILER.timed("calc.cohorts")
+@st.cache_data(max_entries=MODEL_CACHE_ENTRIES, show_spinner=False)
+def calc_cohorts(months, spend, cac, arpu, churn, expansion, gross_margin, spend_growth, churn_decay, arr0):
+    return simulate_cohorts(months, spend, cac, arpu, churn, expansion, gross_margin, spend_growth, churn_decay, arr0)
+
+@PROFILER.timed("calc.liquidity")
+@st.cache_data(max_entries=MODEL_CACHE_ENTRIES, show_spinner=False)
+def calc_liquidity(cash, debt, dso, dio, dpo):
+    return _scalars(liquidity_kpis(cash, debt, dso, dio, dpo))
+
+# --- ARCHIVIO SCENARI ---
+# Un'unica connessione SQLite per processo; i risultati salvati sono già calcolati per nodo
+@st.cache_resource(show_spinner=False)
+def scenario_store():
+    return ScenarioStore()
+
+def load_scenario(name):
+    # Callback: gli input salvati diventano i valori iniziali dei campi al rerun successivo
+    if name:
+        st.session_state["scenario_inputs"] = scenario_store().load(name)
+        st.session_state["preset_gen"] = st.session_state.get("preset_gen", 0) + 1
+
+# --- PARTITARIO CARICATO ---
+# La cache colonnare su disco (cfo_ingest) è indicizzata dall'hash del file; in sessione
+# si ricorda solo l'hash per file caricato, così i rerun non rileggono né riesaminano nulla.
+# L'hash si calcola una volta sola e passa a ingest() con il file.
+@st.cache_resource(max_entries=4, show_spinner=False)
+def open_ledger(key, _upload):
+    return ingest(_upload, key=key)
+
+def ledger_key(upload):
+    keys = st.session_state.setdefault("ledger_keys", {})
+    if upload.file_id not in keys:
+        keys[upload.file_id] = file_hash(upload)
+    return keys[upload.file_id]
+
+@PROFILER.timed("calc.ledger_drivers")
+@st.cache_data(max_entries=MODEL_CACHE_ENTRIES, show_spinner=False)
+def calc_ledger_drivers(key, _upload):
+    return derive_drivers(open_ledger(key, _upload))
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def calc_open_items(key, _upload):
+    return open_items(open_ledger(key, _upload))
+
+@PROFILER.timed("calc.cashflow")
+@st.cache_data(max_entries=MODEL_CACHE_ENTRIES, show_spinner=False)
+def calc_cashflow(cash, start, horizon, drivers, ledger_hash=None, _ledger=None):
+    # Le scadenze del partitario entrano nella chiave di cache tramite il suo hash
+    # Con il partitario crediti e debiti aperti a `start` sono le sue righe aperte: i driver
+    # coprono solo vendite e acquisti da `start` in poi (niente doppio conteggio)
+    dates, amounts = driver_flows(start, horizon, **drivers, pre_start=_ledger is None)
+    if _ledger is not None:
+        dates, amounts = np.concatenate([dates, _ledger[0]]), np.concatenate([amounts, _ledger[1]])
+    return forecast(cash, dates, amounts, start, horizon)
+
+@PROFILER.timed("calc.breakeven")
+@st.cache_data(max_entries=MODEL_CACHE_ENTRIES, show_spinner=False)
+def calc_breakeven(price, vc, fc, vol):
+    return _scalars(breakeven_kpis(price, vc, fc, vol))
+
+# Mix di esempio della modalità multi-prodotto
+SAMPLE_SKUS = {"sku": ["A", "B", "C"], "price": [100.0, 150.0, 60.0], "var_cost": [60.0, 80.0, 45.0],
+               "volume": [3000, 1500, 4000], "mix": [3000, 1500, 4000]}
+PRICE_STEPS = np.linspace(0.7, 1.3, 41)       # prezzi da -30% a +30%
+VOLUME_STEPS = np.linspace(0.5, 1.5, 41)      # volumi da -50% a +50%
+SKU_RISK_ROWS = 100                           # righe mostrate della tabella SKU a rischio
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_table(name, data):
+    buf = io.BytesIO(data)
+    return pd.read_parquet(buf) if name.lower().endswith(".parquet") else pd.read_csv(buf)
+
+def table_input(label, sample, key, help=None):
+    # Tabella da file (CSV/Parquet) o, senza file, editabile a partire dai dati di esempio
+    up = st.file_uploader(label, type=["csv", "parquet"], help=help, key=f"{key}_file")
+    if up:
+        return load_table(up.name, up.getvalue())
+    return st.data_editor(pd.DataFrame(sample), num_rows="dynamic", key=f"{key}_editor", use_container_width=True)
+
+@PROFILER.timed("calc.mix")
+@st.cache_data(max_entries=MODEL_CACHE_ENTRIES, show_spinner=False)
+def calc_mix(sku_df, fix_cost):
+    # Al browser vanno solo KPI, superficie e gli SKU più a rischio, non l'intera tabella
+    x = sku_arrays(sku_df)
+    res = mix_breakeven(x["price"], x["var_cost"], x["volume"], fix_cost, x["mix"])
+    surface = profit_surface(x["price"], x["var_cost"], x["volume"], fix_cost, PRICE_STEPS, VOLUME_STEPS)
+    order = np.argsort(np.nan_to_num(res["safety_sku"], nan=np.inf))[:SKU_RISK_ROWS]
+    risk = sku_df.iloc[order].copy()
+    risk["cm_unit"], risk["safety_sku"] = res["cm_unit"][order], res["safety_sku"][order]
+    kpis = {k: v for k, v in res.items() if np.ndim(v) == 0}
+    return kpis, surface, risk
+
+@PROFILER.timed("calc.stress")
+@st.cache_data(max_entries=MODEL_CACHE_ENTRIES, show_spinner=False)
+def calc_stress(rev1, cogs_p, opex1, shock):
+    return _scalars(stress_kpis(rev1, cogs_p, opex1, shock))
+
+# --- CALCOLI PESANTI NEL SERVIZIO DI CALCOLO ---
+# Simulazioni ed export girano nel pool di processi condiviso dalle sessioni (cfo_service):
+# richieste identiche diventano un solo job e i risultati ridotti restano per il riuso.
+# Un job che finisce entro JOB_WAIT si mostra nello stesso rerun; altrimenti compare
+# l'avanzamento e la pagina si ricarica da sola a fine job, senza bloccare la sessione.
+JOB_WAIT = 1.0                                # secondi di attesa nel rerun prima della barra di avanzamento
+JOB_POLL = 0.5                                # intervallo di aggiornamento della barra
+
+@st.cache_resource(show_spinner=False)
+def compute_service():
+    return ComputeService(int(os.environ.get("CFO_SERVICE_WORKERS", 0)) or None)
+
+def montecarlo_plan(base, spec, n_paths, with_irr=True, options=None):
+    # Blocchi con seme fisso: il job delle statistiche e l'export dei percorsi vedono gli stessi percorsi
+    return plan(base, spec, n_paths, seed=42, with_irr=with_irr, options=options)
+
+def montecarlo_job(base, spec, n_paths, with_irr=True, options=None):
+    # Un task per blocco di percorsi; al browser vanno solo statistiche e istogrammi
+    chunks = montecarlo_plan(base, spec, n_paths, with_irr, options)
+    return compute_service().submit(job_key("montecarlo", base, spec, n_paths, with_irr, options),
+                                    [(run_chunk, c) for c in chunks], lambda parts: summary(collect(parts)))
+
+def black_swan_job(base, means, vols, rho, n_paths):
+    # Un task per blocco di scenari, come il Monte Carlo: la barra avanza blocco per blocco
+    chunks = plan_stress(base, n_paths, means, vols, crisis_correlation(rho), seed=42)
+    return compute_service().submit(job_key("black_swan", base, means, vols, rho, n_paths),
+                                    [(run_stress_chunk, c) for c in chunks],
+                                    lambda parts: black_swan_summary(base, collect_stress(parts)))
+
+@st.fragment(run_every=JOB_POLL)
+def job_progress(job):
+    # A fine job si rilancia l'intera pagina, che trova il risultato pronto
+    if job.done():
+        st.rerun()
+    st.progress(job.progress, text=Labels["job_running"].format(done=job.completed, total=job.total))
+
+def job_result(job):
+    # Risultato se pronto entro JOB_WAIT, altrimenti None (e barra di avanzamento)
+    with PROFILER.section("service.wait"):
+        ready = job.wait(JOB_WAIT)
+    if ready:
+        return job.result()
+    job_progress(job)
+    return None
+
+# Etichetta di Labels per ogni driver di investimento
+DRIVER_LABELS = {"capex": "capex", "years": "years", "wacc": "wacc", "rev1": "rev1", "growth": "growth",
+                 "cogs_p": "cogs", "opex1": "opex", "opex_g": "opex_g", "tax_r": "tax"}
+
+# Progetti di esempio della modalità portafoglio (driver mancanti = valori della tab)
+SAMPLE_PROJECTS = {"project": ["Impianto A", "Impianto B", "Retail C", "Digital D", "Export E"],
+                   "capex": [500000, 800000, 300000, 150000, 400000], "rev1": [300000, 420000, 160000, 120000, 210000],
+                   "growth": [0.15, 0.10, 0.08, 0.30, 0.12], "start_year": [0, 0, 1, 1, 2]}
+PF_ROWS = 100                                 # righe mostrate dei progetti selezionati
+
+# Consolidato di gruppo: entità, cambi (valuta di gruppo per unità locale) e intercompany di esempio
+SAMPLE_ENTITIES = {"entity": ["Alpha IT", "Alpha US", "Alpha UK"], "currency": ["EUR", "USD", "GBP"],
+                   "segment": ["Europa", "Americhe", "Europa"], "rev1": [300000, 450000, 180000],
+                   "cash": [150000, 220000, 60000], "debt": [400000, 150000, 90000]}
+SAMPLE_FX = {"date": ["2026-01-01", "2026-01-01", "2026-01-01", "2026-01-01"], "currency": ["EUR", "USD", "GBP", "CHF"],
+             "rate": [1.0, 0.92, 1.17, 1.05]}
+SAMPLE_IC = {"seller": ["Alpha IT", "Alpha IT"], "buyer": ["Alpha US", "Alpha UK"], "amount": [40000, 100000],
+             "kind": ["sale", "loan"], "year": [1, 0]}
+GROUP_CURRENCY = {"€": "EUR", "$": "USD", "£": "GBP"}
+
+# Goal seek: etichetta di Labels per ogni driver risolvibile e KPI in percentuale
+GOAL_DRIVER_LABELS = {**DRIVER_LABELS, "arpu": "arpu", "churn": "churn_rate", "cac": "cac", "cash": "cash",
+                      "debt": "debt_lt", "dso": "dso", "dio": "dio", "dpo": "dpo", "price": "price",
+                      "var_cost": "var_cost", "fix_cost": "fix_cost", "volume": "vol", "shock": "shock_rev"}
+GOAL_PERCENT_KPIS = ("irr", "safety")
+CONS_ROWS = 100                               # righe mostrate dei contributi per entità
+
+@PROFILER.timed("calc.portfolio")
+@st.cache_data(max_entries=MC_CACHE_ENTRIES, show_spinner=False)
+def calc_portfolio(projects, budget, year_budgets, options, defaults):
+    res, npv = optimize_portfolio(projects, budget, year_budgets, options, defaults)
+    out = projects.assign(npv=npv, selected=res["selected"])
+    kpis = {k: v for k, v in res.items() if k != "selected"}
+    return kpis, out
+
+@PROFILER.timed("calc.goalseek")
+@st.cache_data(max_entries=MODEL_CACHE_ENTRIES, show_spinner=False)
+def calc_goalseek(kpi, driver, target, inputs, options):
+    res = goal_seek(kpi, driver, target, inputs, options=options)
+    return {k: v for k, v in res.items() if k != "roots"}
+
+@PROFILER.timed("calc.tornado")
+@st.cache_data(max_entries=MODEL_CACHE_ENTRIES, show_spinner=False)
+def calc_tornado(base, options):
+    return tornado(base, options=options)
+
+@PROFILER.timed("calc.grid")
+@st.cache_data(max_entries=MC_CACHE_ENTRIES, show_spinner=False)
+def calc_grid(base, x_driver, y_driver, n, options):
+    xs = default_range(x_driver, base[x_driver], n, options=options)
+    ys = default_range(y_driver, base[y_driver], n, options=options)
+    return xs, ys, grid(base, x_driver, xs, y_driver, ys, options=options)
+
+@PROFILER.timed("charts.build")
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def chart(builder, *args, **kwargs):
+    # Figura di cfo_charts in cache per hash dei dati: a dati invariati il rerun riusa
+    # lo stesso oggetto (da non modificare dopo la creazione)
+    return getattr(require("cfo_charts"), builder)(*args, **kwargs)
+
+def plot(fig):
+    # Validazione, serializzazione e invio della figura al browser
+    with PROFILER.section("render.plotly"):
+        st.plotly_chart(fig, use_container_width=True)
+
+def table(styler, **kwargs):
+    # Rendering della tabella formattata (Styler -> HTML/Arrow)
+    with PROFILER.section("render.table"):
+        st.dataframe(styler, use_container_width=True, **kwargs)
+
+def mc_histogram(hist, title, color):
+    # Istogramma pre-aggregato: al browser arrivano solo i bin, non il milione di punti
+    counts, edges = hist
+    fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, marker=dict(color=color)))
+    fig.add_vline(x=0, line=dict(color=COLORS['danger'], dash='dash'))
+    fig.update_layout(title=title, template=TEMPLATE, bargap=0, height=300)
+    return fig
+
+def mc_metrics(L, stats, fmt):
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("P5", fmt(stats["p5"]))
+    c2.metric("P50", fmt(stats["p50"]))
+    c3.metric("P95", fmt(stats["p95"]))
+    c4.metric(L["kpi"]["prob_loss"], f"{stats['prob_loss']:.1%}")
+    if stats["nan_share"] > 0:
+        st.warning(L["labels"]["mc_nan"].format(share=stats["nan_share"]))
+
+# --- EXPORT SU RICHIESTA ---
+# I report vengono generati solo al click sul download (callable di st.download_button)
+# e tenuti in cache per hash del contenuto: rerun e click ripetuti non ricostruiscono nulla.
+EXPORT_CACHE_ENTRIES = 32
+
+def export_key(data, recoms, title):
+    payload = json.dumps([data, recoms, title], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+@st.cache_data(max_entries=EXPORT_CACHE_ENTRIES, show_spinner=False)
+def cached_export(key, kind, _data, _recoms, _title):
+    # `key` identifica il contenuto; gli argomenti con "_" non entrano nell'hash di Streamlit.
+    # Il file si genera nel pool del servizio: click identici di più sessioni = un solo job
+    if kind == "pdf":
+        task = (generate_pdf, (_data, _recoms, _title))
+    elif kind == "pptx":
+        task = (generate_pptx, (_data, _recoms, _title))
+    else:
+        task = (generate_csv, (_data,))
+    return compute_service().run(job_key("export", kind, key), [task], lambda parts: parts[0])
+
+def timed_export(key, kind, data, recoms, title):
+    with PROFILER.section(f"export.{kind}"):
+        return cached_export(key, kind, data, recoms, title)
+
+def lazy_export(kind, data, recoms, title):
+    return partial(timed_export, export_key(data, recoms, title), kind, data, recoms, title)
+
+# --- EXPORT DELLE TABELLE COMPLETE ---
+# Proiezioni, griglie e percorsi Monte Carlo si scrivono a blocchi in un worker del servizio
+# (cfo_export) su un file in una cartella del processo: in memoria c'è un blocco alla volta,
+# non l'intera tabella. Il file resta su disco per click e sessioni successive (ultimi
+# EXPORT_FILES); al download Streamlit riceve il file aperto e lo legge da sé, senza una
+# copia in byte tenuta dall'app.
+EXPORT_FILES = 16
+EXPORT_RETRIES = 3
+
+@st.cache_resource(show_spinner=False)
+def export_dir():
+    return tempfile.mkdtemp(prefix="cfo_export_")
+
+def table_file(key, fmt, fn, args):
+    path = os.path.join(export_dir(), f"{key}.{fmt}")
+    task = [(fn, (*args, fmt, path))]
+    with PROFILER.section(f"export.table.{fmt}"):
+        for attempt in range(EXPORT_RETRIES):
+            if not os.path.exists(path):
+                compute_service().run(job_key("table", key, fmt, *([time.time()] if attempt else [])), task)
+                if not os.path.exists(path):
+                    # Job identico concluso prima che il file venisse potato: si riscrive
+                    compute_service().run(job_key("table", key, fmt, time.time()), task)
+                prune(export_dir(), EXPORT_FILES)
+            try:
+                f = open(path, "rb")
+            except FileNotFoundError:
+                # Potato da un'altra sessione tra il controllo e l'apertura: si rigenera
+                continue
+            # Il file aperto resta leggibile anche se un prune successivo lo rimuove
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return f
+        raise FileNotFoundError(path)
+
+def table_export(name, key, fn, *args):
+    # Un download per formato disponibile; il file si genera solo al click
+    formats = available_formats()
+    cols = st.columns([2] + [1] * len(formats))
+    cols[0].caption(Labels["table_export"])
+    for col, fmt in zip(cols[1:], formats):
+        col.download_button(fmt.upper(), partial(table_file, key, fmt, fn, args), f"{name}.{fmt}",
+                            mime_type(fmt), key=f"dl_{name}_{fmt}", on_click="ignore")
 
 # --- CONFIGURAZIONE PAGINA STREAMLIT ---
 st.set_page_config(page_title="Black Swan CFO OS", layout="wide", page_icon="🦢")
+PROFILER.start_rerun()
 
-st.markdown(f"""
-<style>
-    .logo-container {{background-color: {COLORS['primary']}; padding: 20px; border-radius: 10px; border: 2px solid {COLORS['accent']}; text-align: center; margin-bottom: 20px;}}
-    .logo-title {{color: {COLORS['accent']}; font-family: 'Arial', sans-serif; font-weight: bold; font-size: 28px; margin: 0; letter-spacing: 2px;}}
-    .logo-subtitle {{color: #FFFFFF; font-family: sans-serif; font-size: 12px; letter-spacing: 4px; margin-top: 5px;}}
-    .stMetric {{background-color: white; border: 1px solid #e0e0e0; border-radius: 8px; padding: 15px;}}
-</style>
-""", unsafe_allow_html=True)
+st.markdown(APP_CSS, unsafe_allow_html=True)
+
+# Plotly e tema dei grafici, usati da tutte le tab e da mc_histogram: legati una volta
+# per rerun a livello di modulo (l'import vero avviene solo al primo rerun del processo)
+go = require("plotly.graph_objects")
+TEMPLATE = require("cfo_charts").TEMPLATE
 
 # --- SIDEBAR ---
-with st.sidebar:
+with st.sidebar, PROFILER.section("sidebar"):
     st.markdown("""<div class="logo-container"><div class="logo-title">BLACK SWAN</div><div class="logo-subtitle">CFO PLAYBOOK</div></div>""", unsafe_allow_html=True)
     lang_key = st.selectbox("Language / Lingua", list(LANGUAGES.keys()))
     L = LANGUAGES[lang_key]
@@ -436,12 +417,30 @@ with st.sidebar:
     st.subheader(Labels["settings"])
     azienda = st.text_input(Labels["company"], "Alpha Industries Inc.")
     valuta = st.selectbox(Labels["currency"], ["€", "$", "£"])
+    ledger_file = st.file_uploader(Labels["ledger"], type=["csv", "parquet"], help=Tips["ledger"])
+
+# Driver letti dal partitario: diventano i valori iniziali dei campi di input
+ledger_drv, ledger_hash, ledger = {}, None, None
+if ledger_file:
+    ledger_hash = ledger_key(ledger_file)
+    try:
+        ledger_drv = calc_ledger_drivers(ledger_hash, ledger_file)
+        ledger = calc_open_items(ledger_hash, ledger_file)
+    except ValueError as e:
+        st.sidebar.error(str(e))
+# Valori iniziali dei campi: scenario caricato > partitario > default dell'app
+preset = {**ledger_drv, **{k: v for k, v in st.session_state.get("scenario_inputs", {}).items() if v is not None}}
+drv = lambda name, default: preset.get(name, default)
+# Percentuale (decimale in preset) nel tipo e nei limiti dello slider
+drv_pct = lambda name, default, lo, hi: min(max(round(drv(name, default) * 100, 2 if isinstance(lo, float) else None), lo), hi)
+# Chiave dei campi legata ai valori iniziali: un nuovo scenario o partitario azzera le modifiche a mano
+wkey = lambda name: f"{name}@{st.session_state.get('preset_gen', 0)}:{ledger_hash or ''}"
 
 # --- TAB RENDERING ---
 tabs = st.tabs(L["tabs"])
 
 # ================= TAB 1: GUIDA CEO =================
-with tabs[1]:
+with tabs[1], PROFILER.section("tab.guida"):
     st.header(L["guide"]["title"])
     st.markdown(L["guide"]["intro"])
     
@@ -458,190 +457,394 @@ with tabs[1]:
         st.markdown(f"{L['guide']['faq_q3']}\n{L['guide']['faq_a3']}")
 
 # ================= TAB 2: INVESTIMENTI =================
-with tabs[2]:
+with tabs[2], PROFILER.section("tab.investimenti"):
     st.header(L["titles"]["invest"])
     
     with st.expander(Labels["settings"], expanded=True):
         c1, c2, c3 = st.columns(3)
-        inv = c1.number_input(Labels["capex"], value=500000, help=Tips["capex"])
-        durata = c2.slider(Labels["years"], 1, 15, 5)
-        wacc = c3.slider(Labels["wacc"], 1.0, 20.0, 10.0, help=Tips["wacc"]) / 100
+        inv = c1.number_input(Labels["capex"], value=round(drv("capex", 500000)), help=Tips["capex"], key=wkey("capex"))
+        durata = c2.slider(Labels["years"], 1, 40, int(drv("years", 5)), key=wkey("years"))
+        wacc = c3.slider(Labels["wacc"], 1.0, 20.0, drv_pct("wacc", 0.10, 1.0, 20.0), help=Tips["wacc"], key=wkey("wacc")) / 100
         
     st.subheader(L["headers"]["drivers"])
     c4, c5, c6 = st.columns(3)
-    rev1 = c4.number_input(Labels["rev1"], value=300000)
-    growth = c5.slider(Labels["growth"], -10.0, 50.0, 15.0) / 100
-    cogs_p = c6.slider(Labels["cogs"], 0, 90, 40, help=Tips["cogs"]) / 100
+    rev1 = c4.number_input(Labels["rev1"], value=round(drv("rev1", 300000)), key=wkey("rev1"))
+    growth = c5.slider(Labels["growth"], -10.0, 50.0, drv_pct("growth", 0.15, -10.0, 50.0), key=wkey("growth")) / 100
+    cogs_p = c6.slider(Labels["cogs"], 0, 90, drv_pct("cogs_p", 0.40, 0, 90), help=Tips["cogs"], key=wkey("cogs_p")) / 100
     
     c7, c8, c9 = st.columns(3)
-    opex1 = c7.number_input(Labels["opex"], value=50000, help=Tips["opex"])
-    opex_g = c8.slider(Labels["opex_g"], 0.0, 20.0, 3.0) / 100
-    tax_r = c9.slider(Labels["tax"], 0, 50, 28, help=Tips["tax"]) / 100
+    opex1 = c7.number_input(Labels["opex"], value=round(drv("opex1", 50000)), help=Tips["opex"], key=wkey("opex1"))
+    opex_g = c8.slider(Labels["opex_g"], 0.0, 20.0, drv_pct("opex_g", 0.03, 0.0, 20.0), key=wkey("opex_g")) / 100
+    tax_r = c9.slider(Labels["tax"], 0, 50, drv_pct("tax_r", 0.28, 0, 50), help=Tips["tax"], key=wkey("tax_r")) / 100
+
+    with st.expander(L["headers"]["dcf_opts"]):
+        o1, o2, o3, o4 = st.columns(4)
+        ppy = o1.radio(Labels["granularity"], [1, 12], index=int(drv("periods_per_year", 1)) // 12, format_func=lambda p: Labels["annual"] if p == 1 else Labels["monthly"], key=wkey("periods_per_year"))
+        dep_years = o2.number_input(Labels["dep_years"], 1, 60, int(drv("dep_years", durata)), key=wkey(f"dep_years_{durata}"))
+        tax_cf = o3.checkbox(Labels["tax_cf"], bool(drv("tax_carryforward", False)), key=wkey("tax_carryforward"))
+        tv_on = o4.checkbox(Labels["tv"], "terminal_growth" in preset, key=wkey("terminal_growth_on"))
+        tv_g = o4.slider(Labels["tv_g"], -2.0, 5.0, drv_pct("terminal_growth", 0.02, -2.0, 5.0), disabled=not tv_on, key=wkey("terminal_growth")) / 100
+    # Ammortamento sull'orizzonte (None) salvo valore diverso impostato a mano: le analisi che
+    # variano gli anni (tornado, griglia, Monte Carlo, goal seek, portafoglio) lo seguono
+    dcf_opts = dict(periods_per_year=ppy, dep_years=dep_years if dep_years != durata else None,
+                    tax_carryforward=tax_cf, terminal_growth=tv_g if tv_on and tv_g < wacc else None)
+    if tv_on and tv_g >= wacc:
+        st.warning(Labels["tv_invalid"].format(g=tv_g, wacc=wacc))
     
-    # --- CALCOLI ---
-    cf_list = [-inv]
-    roic_list = []
+    # --- CALCOLI (motore vettoriale, 1 progetto) ---
+    res = calc_investment(inv, durata, wacc, rev1, growth, cogs_p, opex1, opex_g, tax_r, dcf_opts)
+    # Tabella e grafici per anno: i periodi mensili vengono aggregati prima di andare al browser
+    cf_list = [float(res["cf"][0, 0])] + to_annual(res["cf"][0, 1:], ppy)[0].tolist()
+    roic_list = (to_annual(res["roic"][0], ppy)[0] / ppy).tolist()
     years_labels = ["Anno 0 (CAPEX)"] + [f"Anno {i}" for i in range(1, durata + 1)]
-    da_annuo = inv / durata if durata > 0 else 0
-    rows = []
-    
-    for i in range(1, durata + 1):
-        r_t = rev1 * ((1 + growth) ** (i-1))
-        c_t = r_t * cogs_p
-        o_t = opex1 * ((1 + opex_g) ** (i-1))
-        ebitda_t = r_t - c_t - o_t
-        ebit_t = ebitda_t - da_annuo
-        tax_val = max(0, ebit_t * tax_r)
-        nopat_t = ebit_t - tax_val
-        fcf_t = nopat_t + da_annuo
-        
-        cf_list.append(fcf_t)
-        # Rendimento calcolato sul CAPEX iniziale per spread
-        roic_t = (nopat_t / inv) * 100 if inv > 0 else 0
-        roic_list.append(roic_t)
-        
-        rows.append({
-            "Anno": i, 
-            L["f_ricavi"]: r_t, 
-            L["f_ebitda"]: ebitda_t, 
-            L["f_nopat"]: nopat_t,
-            "FCF": fcf_t
-        })
-        
-    npv_val = npf.npv(wacc, cf_list)
-    irr_val = npf.irr(cf_list)
+    rows = pd.DataFrame({
+        "Anno": np.arange(1, durata + 1),
+        L["f_ricavi"]: to_annual(res["revenue"][0], ppy)[0],
+        L["f_ebitda"]: to_annual(res["ebitda"][0], ppy)[0],
+        L["f_nopat"]: to_annual(res["nopat"][0], ppy)[0],
+        "FCF": to_annual(res["fcf"][0], ppy)[0]
+    })
+
+    npv_val = float(res["npv"][0])
+    irr_val = float(res["irr"][0])
+    irr_status = int(res["irr_status"][0])
+    irr_txt = format_irr(irr_val)
+    irr_help = {IRR_MULTIPLE: Tips["irr_multi"], IRR_NO_SIGN_CHANGE: Tips["irr_none"],
+                IRR_NOT_CONVERGED: Tips["irr_nc"], IRR_ABOVE_RANGE: Tips["irr_above"]}.get(irr_status)
+    payback_val = res["payback"][0]
     cum_fcf = np.cumsum(cf_list)
-    
+
     # KPI Principali
     m1, m2, m3 = st.columns(3)
     m1.metric(L["kpi"]["npv"], f"{valuta} {npv_val:,.0f}", delta="OK" if npv_val > 0 else "KO")
-    m2.metric(L["kpi"]["irr"], f"{irr_val:.1%}" if irr_val else "N/A")
-    m3.metric(L["kpi"]["payback"], f"{next((i for i, v in enumerate(cum_fcf) if v >= 0), 'N.D.')} Anni")
+    m2.metric(L["kpi"]["irr"], irr_txt + (" ⚠️" if irr_help else ""), help=irr_help)
+    m3.metric(L["kpi"]["payback"], f"{'N.D.' if np.isnan(payback_val) else f'{payback_val:.{0 if ppy == 1 else 1}f}'} Anni")
 
     # --- GRAFICO 1: WATERFALL PAYBACK ---
     st.subheader(L["headers"]["cf_chart"])
-    fig_cf = go.Figure()
-    fig_cf.add_trace(go.Bar(
-        x=years_labels, y=cf_list, 
-        name="FCF Annuo", 
-        marker=dict(color=[COLORS['danger'] if x < 0 else COLORS['secondary'] for x in cf_list]), 
-        text=[f"{val/1000:.0f}k" for val in cf_list],
-        textposition='outside'
-    ))
-    fig_cf.add_trace(go.Scatter(
-        x=years_labels, y=cum_fcf, 
-        name="Flusso Cumulato", 
-        line=dict(color=COLORS['accent'], width=4),
-        mode='lines+markers',
-        marker=dict(size=10, line=dict(color="white", width=2))
-    ))
-    fig_cf.update_layout(
-        template="plotly_white", 
-        hovermode="x unified",
-        xaxis_title="Orizzonte Temporale",
-        yaxis_title=f"Cash Flow ({valuta})",
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-    )
-    st.plotly_chart(fig_cf, use_container_width=True)
+    plot(chart("cash_flow_chart", years_labels, cf_list, valuta))
 
     # --- GRAFICO 2: VALUE SPREAD ---
     st.subheader(L["headers"]["spread_chart"])
-    fig_spread = go.Figure()
-    fig_spread.add_trace(go.Bar(
-        x=years_labels[1:], y=roic_list, 
-        name="ROIC (Rendimento)", 
-        marker=dict(color=COLORS['accent'])
-    ))
-    fig_spread.add_trace(go.Scatter(
-        x=years_labels[1:], y=[wacc*100]*durata, 
-        name="WACC (Costo Hurdle)", 
-        line=dict(color=COLORS['danger'], width=3, dash='dash'),
-        mode='lines'
-    ))
-    fig_spread.update_layout(yaxis_ticksuffix="%", template="plotly_white", xaxis_title="Anni")
-    st.plotly_chart(fig_spread, use_container_width=True)
+    plot(chart("spread_chart", years_labels[1:], roic_list, wacc * 100))
 
     # Tabella Dettaglio
     st.subheader(L["headers"]["details"])
-    st.dataframe(pd.DataFrame(rows).style.format("{:,.0f}"), use_container_width=True)
+    table(rows.style.format("{:,.0f}"))
+    table_export("projection", job_key("projection", inv, durata, wacc, rev1, growth, cogs_p, opex1, opex_g, tax_r, dcf_opts),
+                 export_frame, projection_frame(res, ppy))
+
+    # --- SENSITIVITÀ: TORNADO + GRIGLIA A DUE VIE ---
+    st.subheader(L["headers"]["sens_title"])
+    inv_base = dict(capex=inv, years=durata, wacc=wacc, rev1=rev1, growth=growth,
+                    cogs_p=cogs_p, opex1=opex1, opex_g=opex_g, tax_r=tax_r)
+    drv_name = lambda d: Labels[DRIVER_LABELS[d]]
+    fmt_drv = lambda d, v: f"{v:.1%}" if d in RATE_DRIVERS else f"{v:,.0f}"
+
+    t_base, t_bars = calc_tornado(inv_base, dcf_opts)
+    t_bars = t_bars[::-1]   # escursione maggiore in alto
+    fig_tor = go.Figure()
+    fig_tor.add_trace(go.Bar(
+        y=[drv_name(b["driver"]) for b in t_bars], x=[b["metric_low"] - t_base for b in t_bars], base=t_base,
+        orientation='h', name="Low", marker=dict(color=COLORS['danger']),
+        customdata=[fmt_drv(b["driver"], b["low"]) for b in t_bars], hovertemplate="%{customdata}: %{x:,.0f}<extra></extra>"
+    ))
+    fig_tor.add_trace(go.Bar(
+        y=[drv_name(b["driver"]) for b in t_bars], x=[b["metric_high"] - t_base for b in t_bars], base=t_base,
+        orientation='h', name="High", marker=dict(color=COLORS['secondary']),
+        customdata=[fmt_drv(b["driver"], b["high"]) for b in t_bars], hovertemplate="%{customdata}: %{x:,.0f}<extra></extra>"
+    ))
+    fig_tor.add_vline(x=t_base, line=dict(color=COLORS['primary'], dash='dash'))
+    fig_tor.update_layout(barmode='overlay', template=TEMPLATE, title=L["headers"]["tornado"],
+                          xaxis_title=f"{L['kpi']['npv']} ({valuta})", height=350)
+    plot(fig_tor)
+
+    sx, sy, sr = st.columns(3)
+    grid_drivers = list(DRIVER_LABELS)
+    x_drv = sx.selectbox(Labels["sens_x"], grid_drivers, index=grid_drivers.index("wacc"), format_func=drv_name)
+    y_drv = sy.selectbox(Labels["sens_y"], grid_drivers, index=grid_drivers.index("growth"), format_func=drv_name)
+    n_grid = sr.slider(Labels["sens_res"], 10, 200, 50, step=10)
+    if x_drv != y_drv:
+        gx, gy, gz = calc_grid(inv_base, x_drv, y_drv, n_grid, dcf_opts)
+        fig_hm = go.Figure(go.Heatmap(
+            x=gx * 100 if x_drv in RATE_DRIVERS else gx, y=gy * 100 if y_drv in RATE_DRIVERS else gy, z=gz,
+            colorscale=[[0, COLORS['danger']], [0.5, "#ffffff"], [1, COLORS['success']]], zmid=0,
+            colorbar=dict(title=valuta)
+        ))
+        fig_hm.update_layout(template=TEMPLATE, title=L["headers"]["heatmap"],
+                             xaxis_title=drv_name(x_drv), yaxis_title=drv_name(y_drv), height=450)
+        plot(fig_hm)
+        table_export("sensitivity_grid", job_key("grid", inv_base, x_drv, y_drv, n_grid, dcf_opts), export_grid,
+                     gx, gy, gz, x_drv, y_drv)
+
+    # --- MONTE CARLO INVESTIMENTO ---
+    st.subheader(L["headers"]["mc_title"])
+    if st.toggle(Labels["mc_mode"], key="mc_inv"):
+        mc1, mc2, mc3, mc4 = st.columns(4)
+        sd_g = mc1.number_input(f"{Labels['growth']} {Labels['mc_sd']}", 0.0, 50.0, 5.0) / 100
+        sd_c = mc2.number_input(f"{Labels['cogs']} {Labels['mc_sd']}", 0.0, 30.0, 5.0) / 100
+        sd_o = mc3.number_input(f"{Labels['opex_g']} {Labels['mc_sd']}", 0.0, 10.0, 1.0) / 100
+        sd_w = mc4.number_input(f"{Labels['wacc']} {Labels['mc_sd']}", 0.0, 10.0, 2.0) / 100
+        n_paths = st.select_slider(Labels["mc_paths"], [10_000, 100_000, 1_000_000], 100_000)
+
+        mc_base = inv_base
+        mc_spec = {"growth": ("normal", growth, sd_g), "cogs_p": ("normal", cogs_p, sd_c),
+                   "opex_g": ("normal", opex_g, sd_o), "wacc": ("normal", wacc, sd_w)}
+        mc_res = job_result(montecarlo_job(mc_base, mc_spec, n_paths, options=dcf_opts))
+        if mc_res is not None:
+            mc_metrics(L, mc_res["npv"]["stats"], lambda v: f"{valuta} {v:,.0f}")
+            irr_stats = mc_res["irr"]["stats"]
+            st.caption(f"{L['kpi']['irr']} P5 / P50 / P95: {irr_stats['p5']:.1%} / {irr_stats['p50']:.1%} / {irr_stats['p95']:.1%}"
+                       + (f" — {Labels['mc_irr_nan'].format(share=irr_stats['nan_share'])}" if irr_stats["nan_share"] > 0 else ""))
+            plot(mc_histogram(mc_res["npv"]["hist"], L["kpi"]["npv"], COLORS['secondary']))
+            table_export("montecarlo_paths", job_key("montecarlo", mc_base, mc_spec, n_paths, True, dcf_opts),
+                         export_simulation, montecarlo_plan(mc_base, mc_spec, n_paths, options=dcf_opts))
+
+    # --- PORTAFOGLIO: SELEZIONE DI PROGETTI CON BUDGET DI CAPEX ---
+    st.subheader(L["headers"]["pf_title"])
+    if st.toggle(Labels["pf_mode"], key="pf_mode"):
+        pf_file = st.file_uploader(Labels["pf_table"], type=["csv", "parquet"], help=Tips["pf_table"], key="pf_file")
+        if pf_file:
+            pf_df = load_table(pf_file.name, pf_file.getvalue())
+        else:
+            pf_df = st.data_editor(pd.DataFrame(SAMPLE_PROJECTS), num_rows="dynamic", key="pf_editor", use_container_width=True)
+        p1, p2 = st.columns(2)
+        pf_budget = p1.number_input(Labels["pf_budget"], 0, value=1_000_000, step=50_000)
+        year_budgets = None
+        if "start_year" in pf_df.columns and p2.checkbox(Labels["pf_by_year"], key="pf_by_year"):
+            pf_years = sorted(pd.to_numeric(pf_df["start_year"], errors="coerce").fillna(0).astype(int).unique())
+            yb = st.data_editor(pd.DataFrame({"start_year": pf_years, "budget": [float(pf_budget or 500_000)] * len(pf_years)}),
+                                disabled=["start_year"], hide_index=True, key="pf_year_budgets")
+            year_budgets = {int(y): float(b) for y, b in zip(yb["start_year"], yb["budget"]) if pd.notna(b)}
+
+        try:
+            pf, pf_out = calc_portfolio(pf_df, pf_budget or None, year_budgets, dcf_opts, inv_base)
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            if pf["invalid"]:
+                st.warning(Labels["pf_invalid"].format(n=pf["invalid"]))
+            q1, q2, q3, q4 = st.columns(4)
+            q1.metric(L["kpi"]["pf_npv"], f"{valuta} {pf['npv']:,.0f}")
+            q2.metric(L["kpi"]["pf_selected"], f"{pf['n_selected']} / {len(pf_df)}")
+            q3.metric(L["kpi"]["pf_capex"], f"{valuta} {pf['capex']:,.0f}")
+            q4.metric(L["kpi"]["pf_gap"], Labels["pf_optimal"] if pf["optimal"] else f"{pf['gap'] / max(pf['upper_bound'], 1e-9):.2%}",
+                      help=pf["method"])
+
+            st.caption(L["headers"]["pf_list"])
+            pf_sel = pf_out[pf_out["selected"]].drop(columns="selected").sort_values("npv", ascending=False)
+            table(pf_sel.head(PF_ROWS).style.format({"npv": "{:,.0f}"}), hide_index=True)
+            st.download_button(Labels["pf_download"], lambda: pf_sel.to_csv(index=False).encode("utf-8"),
+                               "portfolio_selection.csv", "text/csv")
 
 # ================= TAB 3: SAAS =================
-with tabs[3]:
+with tabs[3], PROFILER.section("tab.saas"):
     st.header(L["titles"]["saas"])
     s1, s2 = st.columns(2)
     arr = s1.number_input(Labels["arr"], value=1000000)
-    churn = s2.slider(Labels["churn_rate"], 0.1, 10.0, 2.0) / 100
-    arpu = st.number_input(Labels["arpu"], value=500)
-    cac = st.number_input(Labels["cac"], value=4000)
+    churn = s2.slider(Labels["churn_rate"], 0.1, 10.0, drv_pct("churn", 0.02, 0.1, 10.0), key=wkey("churn")) / 100
+    arpu = st.number_input(Labels["arpu"], value=round(drv("arpu", 500)), key=wkey("arpu"))
+    cac = st.number_input(Labels["cac"], value=round(drv("cac", 4000)), key=wkey("cac"))
     
-    ltv = (arpu * 0.85) / churn if churn > 0 else 0
-    ratio = ltv / cac if cac > 0 else 0
+    saas = calc_saas(arpu, churn, cac)
+    ratio = saas["ltv_cac"]
     st.metric(L["kpi"]["ltv_cac"], f"{ratio:.1f}x", delta="Eccellente" if ratio > 3 else "Critico")
 
+    # --- SIMULATORE A COORTI ---
+    with st.expander(L["headers"]["cohort_title"]):
+        k1, k2, k3 = st.columns(3)
+        spend = k1.number_input(Labels["spend"], value=20000, step=1000)
+        spend_g = k2.slider(Labels["spend_g"], 0.0, 10.0, 1.0) / 100
+        exp_rate = k3.slider(Labels["exp_rate"], 0.0, 5.0, 0.5) / 100
+        k4, k5, k6 = st.columns(3)
+        gm_saas = k4.slider(Labels["gm_saas"], 10, 100, 85) / 100
+        churn_decay = k5.slider(Labels["churn_decay"], 0.0, 10.0, 0.0) / 100
+        c_years = k6.slider(Labels["cohort_years"], 1, 10, 5)
+
+        coh = calc_cohorts(c_years * 12, spend, cac, arpu, churn, exp_rate, gm_saas, spend_g, churn_decay, arr)
+        months = np.arange(1, c_years * 12 + 1)
+        nrr_last = coh["nrr"][-1]
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric(L["kpi"]["arr_end"], f"{valuta} {coh['arr'][-1]:,.0f}")
+        m2.metric(L["kpi"]["nrr"], f"{nrr_last:.1%}" if np.isfinite(nrr_last) else "N/A")
+        m3.metric(L["kpi"]["cac_payback"], f"{coh['cac_payback']:.0f} m" if np.isfinite(coh["cac_payback"]) else "N/A")
+        m4.metric(L["kpi"]["ltv_cac_cohort"], f"{coh['ltv_cac']:.1f}x" if np.isfinite(coh["ltv_cac"]) else "N/A")
+
+        plot(chart("line_chart", months, coh["arr"], "secondary", title=L["headers"]["cohort_arr"],
+                   height=300, yaxis_title=f"ARR ({valuta})"))
+
+        # Triangolo coorte x mese: le celle prima dell'acquisizione restano vuote
+        ltv_tri = np.where(months[None, :] >= months[:, None], coh["ltv"], np.nan)
+        fig_ltv = go.Figure(go.Heatmap(z=ltv_tri, x=months, y=months, colorscale="Blues",
+                                       hovertemplate="Coorte %{y} / Mese %{x}: %{z:,.0f}<extra></extra>"))
+        fig_ltv.update_layout(title=L["headers"]["cohort_ltv"], template=TEMPLATE, height=400,
+                              xaxis_title="Mese", yaxis_title="Coorte")
+        plot(fig_ltv)
+
 # ================= TAB 4: LIQUIDITA =================
-with tabs[4]:
+with tabs[4], PROFILER.section("tab.liquidita"):
     st.header(L["titles"]["liq"])
     l1, l2 = st.columns(2)
-    cash = l1.number_input(Labels["cash"], value=150000)
-    debt = l2.number_input(Labels["debt_lt"], value=400000)
-    pfn = debt - cash
-    st.metric(L["kpi"]["pfn"], f"{valuta} {pfn:,.0f}", delta_color="inverse")
+    cash = l1.number_input(Labels["cash"], value=round(drv("cash", 150000)), key=wkey("cash"))
+    debt = l2.number_input(Labels["debt_lt"], value=round(drv("debt", 400000)), key=wkey("debt"))
+    pfn_slot = st.empty()
     
     st.divider()
     d1, d2, d3 = st.columns(3)
-    dso = d1.number_input(Labels["dso"], value=60)
-    dio = d2.number_input(Labels["dio"], value=45)
-    dpo = d3.number_input(Labels["dpo"], value=90)
-    ccc = dso + dio - dpo
+    dso = d1.number_input(Labels["dso"], value=round(drv("dso", 60)), key=wkey("dso"))
+    dio = d2.number_input(Labels["dio"], value=round(drv("dio", 45)), key=wkey("dio"))
+    dpo = d3.number_input(Labels["dpo"], value=round(drv("dpo", 90)), key=wkey("dpo"))
+    liq = calc_liquidity(cash, debt, dso, dio, dpo)
+    pfn, ccc = liq["pfn"], liq["ccc"]
+    pfn_slot.metric(L["kpi"]["pfn"], f"{valuta} {pfn:,.0f}", delta_color="inverse")
     
     # --- GRAFICO CCC ORIZZONTALE ---
     st.subheader(f"Composizione {L['kpi']['ccc']}")
-    fig_ccc = go.Figure()
-    fig_ccc.add_trace(go.Bar(y=["Ciclo"], x=[dso], name="DSO (Incasso)", orientation='h', marker=dict(color=COLORS['secondary'])))
-    fig_ccc.add_trace(go.Bar(y=["Ciclo"], x=[dio], name="DIO (Magazzino)", orientation='h', marker=dict(color=COLORS['neutral'])))
-    fig_ccc.add_trace(go.Bar(y=["Ciclo"], x=[-dpo], name="DPO (Debiti)", orientation='h', marker=dict(color=COLORS['accent'])))
-    fig_ccc.update_layout(barmode='relative', template="plotly_white", height=250, title=f"Ciclo Totale: {ccc} giorni")
-    st.plotly_chart(fig_ccc, use_container_width=True)
+    plot(chart("ccc_chart", dso, dio, dpo, f"Ciclo Totale: {ccc:.0f} giorni"))
+
+    # --- PREVISIONE DI CASSA (giornaliera + 13 settimane) ---
+    with st.expander(L["headers"]["cf_title"]):
+        f1, f2 = st.columns(2)
+        debt_service = f1.number_input(Labels["debt_service"], value=5000, step=500)
+        cf_horizon = f2.slider(Labels["cf_horizon"], 91, 365, 91, step=7)
+
+        cf_drivers = dict(revenue=rev1, cogs_p=cogs_p, opex=opex1, debt_service=debt_service,
+                          dso=dso, dio=dio, dpo=dpo, growth=growth)
+        cf = calc_cashflow(cash, datetime.now().date(), cf_horizon, cf_drivers, ledger_hash, ledger)
+        runway = cf["runway_days"]
+        f3, f4, f5 = st.columns(3)
+        f3.metric(L["kpi"]["min_cash"], f"{valuta} {cf['min_cash']:,.0f}")
+        f4.metric(L["kpi"]["min_date"], str(cf["min_date"]))
+        f5.metric(L["kpi"]["runway"], f"{runway:.0f} gg" if np.isfinite(runway) else f"> {cf_horizon} gg")
+
+        plot(chart("line_chart", cf["days"], cf["balance"], "secondary", name=Labels["balance"],
+                   zero_line=True, point=(cf["min_date"], cf["min_cash"], L["kpi"]["min_cash"]),
+                   height=320, yaxis_title=f"{Labels['balance']} ({valuta})"))
+
+        st.subheader(L["headers"]["cf_weekly"])
+        wk = cf["weekly"]
+        weekly_df = pd.DataFrame({
+            Labels["week"]: pd.to_datetime(wk["week_start"]).strftime("%d/%m"),
+            Labels["receipts"]: wk["receipts"], Labels["payments"]: wk["payments"], Labels["balance"]: wk["balance"],
+        }).head(13)
+        table(weekly_df.style.format("{:,.0f}", subset=[Labels["receipts"], Labels["payments"], Labels["balance"]]),
+              hide_index=True)
 
 # ================= TAB 5: BREAK-EVEN =================
-with tabs[5]:
+with tabs[5], PROFILER.section("tab.breakeven"):
     st.header(L["titles"]["bep"])
     st.write(L["headers"]["bep_intro"])
     b1, b2 = st.columns(2)
-    price = b1.number_input(Labels["price"], value=100)
-    vc = b1.number_input(Labels["var_cost"], value=60)
-    fc = b1.number_input(Labels["fix_cost"], value=150000)
-    vol = b2.number_input(Labels["vol"], value=5000)
+    price = b1.number_input(Labels["price"], value=round(drv("price", 100)), key=wkey("price"))
+    vc = b1.number_input(Labels["var_cost"], value=round(drv("var_cost", 60)), key=wkey("var_cost"))
+    fc = b1.number_input(Labels["fix_cost"], value=round(drv("fix_cost", 150000)), key=wkey("fix_cost"))
+    vol = b2.number_input(Labels["vol"], value=round(drv("volume", 5000)), key=wkey("volume"))
     
-    mc = price - vc
-    bep_val = (fc / mc) * price if mc > 0 else 0
-    safety = ((vol * price) - bep_val) / (vol * price) if vol > 0 else 0
+    bep = calc_breakeven(price, vc, fc, vol)
+    bep_val, safety = bep["bep"], bep["safety"]
     
     st.metric(L["kpi"]["bep"], f"{valuta} {bep_val:,.0f}")
     st.metric(L["kpi"]["safety"], f"{safety:.1%}")
 
+    # --- MODALITÀ MULTI-PRODOTTO (tabella SKU) ---
+    st.subheader(L["headers"]["mix_title"])
+    if st.toggle(Labels["mix_mode"], key="bep_mix"):
+        sku_file = st.file_uploader(Labels["sku_table"], type=["csv", "parquet"], help=Tips["sku_table"], key="sku_file")
+        if sku_file:
+            sku_df = load_table(sku_file.name, sku_file.getvalue())
+        else:
+            sku_df = st.data_editor(pd.DataFrame(SAMPLE_SKUS), num_rows="dynamic", key="sku_editor", use_container_width=True)
+        try:
+            mix, surface, sku_risk = calc_mix(sku_df, fc)
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            m1, m2, m3, m4 = st.columns(4)
+            m1.metric(L["kpi"]["wcm"], f"{mix['wcm_ratio']:.1%}")
+            m2.metric(L["kpi"]["bep"], f"{valuta} {mix['bep_revenue']:,.0f}" if np.isfinite(mix["bep_revenue"]) else "N/A")
+            m3.metric(L["kpi"]["safety"], f"{mix['safety']:.1%}" if np.isfinite(mix["safety"]) else "N/A")
+            m4.metric(L["kpi"]["profit"], f"{valuta} {mix['profit']:,.0f}")
+
+            fig_surf = go.Figure(go.Contour(
+                z=surface, x=(PRICE_STEPS - 1) * 100, y=(VOLUME_STEPS - 1) * 100, colorscale="RdYlGn", zmid=0,
+                contours=dict(showlabels=True), hovertemplate="Prezzo %{x:+.0f}% / Volume %{y:+.0f}%: %{z:,.0f}<extra></extra>"
+            ))
+            fig_surf.update_layout(title=L["headers"]["surface"], template=TEMPLATE, height=450,
+                                   xaxis_title=f"{Labels['price']} Δ%", yaxis_title=f"{Labels['vol']} Δ%")
+            plot(fig_surf)
+
+            st.caption(L["headers"]["mix_risk"])
+            table(sku_risk.style.format({"cm_unit": "{:,.2f}", "safety_sku": "{:.1%}"}, na_rep="N/A"), hide_index=True)
+
 # ================= TAB 6: STRESS TEST =================
-with tabs[6]:
+with tabs[6], PROFILER.section("tab.stress"):
     st.header(L["titles"]["stress"])
-    shock = st.slider(Labels["shock_rev"], -50, 0, -20)
+    shock = st.slider(Labels["shock_rev"], -50, 0, drv_pct("shock", -0.20, -50, 0), key=wkey("shock"))
     
-    base_eb = rev1 * (1 - cogs_p) - opex1
-    stress_eb = (rev1 * (1 + shock/100)) * (1 - cogs_p) - opex1
+    stress = calc_stress(rev1, cogs_p, opex1, shock / 100)
+    base_eb, stress_eb = stress["base_ebitda"], stress["stress_ebitda"]
     
     # --- GRAFICO STRESS COMPARISON ---
-    fig_stress = go.Figure()
-    fig_stress.add_trace(go.Bar(
-        x=["Scenario Base", "Scenario Shock"], 
-        y=[base_eb, stress_eb], 
-        marker=dict(color=[COLORS['primary'], COLORS['danger']]),
-        text=[f"{val/1000:.0f}k" for val in [base_eb, stress_eb]],
-        textposition='auto'
-    ))
-    fig_stress.update_layout(title="Impatto EBITDA sullo Scenario Black Swan", template="plotly_white")
-    st.plotly_chart(fig_stress, use_container_width=True)
+    plot(chart("stress_chart", base_eb, stress_eb, "Impatto EBITDA sullo Scenario Black Swan"))
+
+    # --- MONTE CARLO STRESS ---
+    st.subheader(L["headers"]["mc_title"])
+    if st.toggle(Labels["mc_mode"], key="mc_stress"):
+        ms1, ms2, ms3 = st.columns(3)
+        sd_s = ms1.number_input(f"{Labels['shock_rev']} {Labels['mc_sd']}", 0.0, 50.0, 10.0) / 100
+        sd_c = ms2.number_input(f"{Labels['cogs']} {Labels['mc_sd']}", 0.0, 30.0, 5.0, key="mc_stress_cogs") / 100
+        n_paths = ms3.select_slider(Labels["mc_paths"], [10_000, 100_000, 1_000_000], 100_000, key="mc_stress_paths")
+
+        mc_base = dict(capex=inv, years=durata, wacc=wacc, rev1=rev1, growth=growth,
+                       cogs_p=cogs_p, opex1=opex1, opex_g=opex_g, tax_r=tax_r)
+        mc_spec = {"shock": ("normal", shock / 100, sd_s), "cogs_p": ("normal", cogs_p, sd_c)}
+        mc_res = job_result(montecarlo_job(mc_base, mc_spec, n_paths, with_irr=False))
+        if mc_res is not None:
+            mc_metrics(L, mc_res["stress_ebitda"]["stats"], lambda v: f"{valuta} {v:,.0f}")
+            plot(mc_histogram(mc_res["stress_ebitda"]["hist"], L["f_ebitda"], COLORS['danger']))
+            table_export("stress_paths", job_key("montecarlo", mc_base, mc_spec, n_paths, False, None),
+                         export_simulation, montecarlo_plan(mc_base, mc_spec, n_paths, with_irr=False))
+
+    # --- BLACK SWAN MULTI-FATTORE (shock correlati su tutta la proiezione) ---
+    st.subheader(L["headers"]["bs_title"])
+    if st.toggle(Labels["bs_mode"], key="bs_stress"):
+        bm1, bm2, bm3, bm4 = st.columns(4)
+        cogs_infl = bm1.number_input(Labels["cogs_infl"], -10.0, 30.0, 3.0) / 100
+        rate_rise = bm2.number_input(Labels["rate_rise"], -5.0, 10.0, 2.0) / 100
+        dso_stretch = bm3.number_input(Labels["dso_stretch"], -30.0, 120.0, 15.0)
+        debt_rate = bm4.number_input(Labels["debt_rate"], 0.0, 20.0, 5.0) / 100
+        bv1, bv2, bv3, bv4 = st.columns(4)
+        sd_rev = bv1.number_input(f"{Labels['shock_rev']} {Labels['mc_sd']}", 0.0, 50.0, 10.0, key="bs_sd_rev") / 100
+        sd_cogs = bv2.number_input(f"{Labels['cogs_infl']} {Labels['mc_sd']}", 0.0, 20.0, 3.0) / 100
+        sd_rate = bv3.number_input(f"{Labels['rate_rise']} {Labels['mc_sd']}", 0.0, 10.0, 1.0) / 100
+        sd_dso = bv4.number_input(f"{Labels['dso_stretch']} {Labels['mc_sd']}", 0.0, 60.0, 10.0)
+        br1, br2 = st.columns(2)
+        rho = br1.slider(Labels["correlation"], 0.0, 0.9, 0.5, step=0.05)
+        bs_paths = br2.select_slider(Labels["mc_paths"], [10_000, 100_000], 100_000, key="bs_paths")
+
+        bs_base = dict(rev1=rev1, growth=growth, cogs_p=cogs_p, opex1=opex1, opex_g=opex_g, tax_r=tax_r,
+                       years=durata, cash=cash, debt=debt, dso=dso, dio=dio, dpo=dpo, debt_rate=debt_rate)
+        bs_means = dict(revenue=shock / 100, cogs=cogs_infl, rate=rate_rise, dso=dso_stretch)
+        bs_vols = dict(revenue=sd_rev, cogs=sd_cogs, rate=sd_rate, dso=sd_dso)
+        bs = job_result(black_swan_job(bs_base, bs_means, bs_vols, rho, bs_paths))
+        if bs is not None:
+            risk = bs["risk"]
+
+            r1, r2, r3, r4 = st.columns(4)
+            r1.metric(L["kpi"]["ear"], f"{valuta} {risk['ear']:,.0f}")
+            r2.metric(L["kpi"]["es"], f"{valuta} {risk['expected_shortfall']:,.0f}")
+            r3.metric(L["kpi"]["p_cash_out"], f"{risk['prob_cash_out']:.1%}")
+            r4.metric(L["kpi"]["ttco"], f"{risk['ttco_p50']:.0f} m" if np.isfinite(risk["ttco_p50"]) else "N/A")
+
+            fig_bs = mc_histogram(bs["hist"], L["f_ebitda"], COLORS['danger'])
+            fig_bs.add_vline(x=base_eb, line=dict(color=COLORS['primary'], width=2))
+            plot(fig_bs)
+            plot(chart("line_chart", np.arange(1, len(bs["solvency"]) + 1), bs["solvency"], "secondary",
+                       fill="tozeroy", title=L["headers"]["solvency"], height=300, xaxis_title="Mese",
+                       yaxis_tickformat=".0%", yaxis_range=[0, 1.05]))
 
 # ================= TAB 0: SINTESI & EXPORT =================
-with tabs[0]:
+with tabs[0], PROFILER.section("tab.sintesi"):
     st.header(L["titles"]["sum"])
     k1, k2, k3, k4 = st.columns(4)
     k1.metric(L["kpi"]["npv"], f"{valuta} {npv_val:,.0f}")
@@ -649,15 +852,8 @@ with tabs[0]:
     k3.metric(L["kpi"]["ltv_cac"], f"{ratio:.1f}x")
     k4.metric(L["kpi"]["safety"], f"{safety:.1%}")
     
-    recoms = []
-    if npv_val > 0: recoms.append(L["recom"]["npv_ok"])
-    else: recoms.append(L["recom"]["npv_ko"])
-    if ccc < 60: recoms.append(L["recom"]["liq_ok"])
-    else: recoms.append(L["recom"]["liq_ko"])
-    if ratio > 3: recoms.append(L["recom"]["saas_ok"])
-    else: recoms.append(L["recom"]["saas_ko"])
-    if stress_eb > 0: recoms.append(L["recom"]["stress_ok"])
-    else: recoms.append(L["recom"]["stress_ko"])
+    flags = recommendation_flags(npv_val, ccc, ratio, stress_eb)
+    recoms = build_recoms(L, flags)
     
     st.subheader(L["headers"]["recom_strat"])
     for r in recoms:
@@ -667,27 +863,148 @@ with tabs[0]:
             st.error(r)
         
     # Preparazione Dati Export
-    export_data = {
-        L["kpi"]["npv"]: f"{valuta} {npv_val:,.0f}",
-        L["kpi"]["irr"]: f"{irr_val:.1%}" if irr_val else "N/A",
-        L["kpi"]["pfn"]: f"{valuta} {pfn:,.0f}",
-        L["kpi"]["ltv_cac"]: f"{ratio:.2f}x",
-        L["kpi"]["safety"]: f"{safety:.1%}",
-        "Data Estrazione": datetime.now().strftime("%Y-%m-%d")
-    }
+    export_data = build_export_data(L, valuta, npv_val, irr_val, pfn, ratio, safety)
     
     st.divider()
     st.subheader(Labels["gen_report"])
     c_pdf, c_ppt, c_csv = st.columns(3)
     
     with c_pdf:
-        st.download_button("📕 PDF", data=generate_pdf(export_data, recoms, f"{azienda} - Strategic Report"), file_name=f"{azienda}_Report.pdf")
+        st.download_button("📕 PDF", data=lazy_export("pdf", export_data, recoms, f"{azienda} - Strategic Report"),
+                           file_name=f"{azienda}_Report.pdf", mime="application/pdf", on_click="ignore")
     with c_ppt:
-        st.download_button("📙 PPTX", data=generate_pptx(export_data, recoms, f"{azienda} Executive"), file_name=f"{azienda}_Executive.pptx")
+        st.download_button("📙 PPTX", data=lazy_export("pptx", export_data, recoms, f"{azienda} Executive"),
+                           file_name=f"{azienda}_Executive.pptx", on_click="ignore",
+                           mime="application/vnd.openxmlformats-officedocument.presentationml.presentation")
     with c_csv:
-        st.download_button("📗 CSV", data=generate_csv(export_data), file_name=f"{azienda}_Dati.csv")
+        st.download_button("📗 CSV", data=lazy_export("csv", export_data, recoms, None),
+                           file_name=f"{azienda}_Dati.csv", mime="text/csv", on_click="ignore")
+
+    # --- CONSOLIDATO DI GRUPPO ---
+    # Il modello resta nella sessione: a ogni rerun si ricalcolano solo le entità modificate
+    st.divider()
+    st.subheader(L["headers"]["cons_title"])
+    if st.toggle(Labels["cons_mode"], key="cons_mode"):
+        ent_df = table_input(Labels["cons_entities"], SAMPLE_ENTITIES, "cons_entities", Tips["cons_entities"])
+        f1, f2 = st.columns(2)
+        with f1:
+            fx_df = table_input(Labels["cons_fx"], SAMPLE_FX, "cons_fx", Tips["cons_fx"])
+        with f2:
+            ic_df = table_input(Labels["cons_ic"], SAMPLE_IC, "cons_ic", Tips["cons_ic"])
+        model = st.session_state.setdefault("consolidation", Consolidation())
+        try:
+            with PROFILER.section("calc.consolidation"):
+                recomputed = model.update(ent_df, inv_base)
+                cons = model.consolidate(fx_df, ic_df, GROUP_CURRENCY[valuta])
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            grp = cons["segments"].iloc[-1]
+            g1, g2, g3, g4 = st.columns(4)
+            g1.metric(L["kpi"]["npv"], f"{valuta} {grp['npv']:,.0f}")
+            g2.metric(L["kpi"]["pfn"], f"{valuta} {grp['pfn']:,.0f}")
+            g3.metric(L["kpi"]["ccc"], f"{grp['ccc']:.0f}" if np.isfinite(grp["ccc"]) else "N/A")
+            g4.metric(L["kpi"]["cons_ebitda"], f"{valuta} {grp['ebitda']:,.0f}")
+            elim = cons["eliminations"]
+            st.caption(Labels["cons_status"].format(k=len(recomputed), n=len(ent_df), rev=elim["revenue"],
+                                                    debt=elim["debt"], unmatched=elim["unmatched"], cur=valuta))
+            table(cons["segments"].style.format({"npv": "{:,.0f}", "pfn": "{:,.0f}", "ccc": "{:.0f}",
+                                                 "ebitda": "{:,.0f}", "revenue": "{:,.0f}"}, na_rep="N/A"),
+                  hide_index=True)
+            st.caption(L["headers"]["cons_list"])
+            cons_ent = cons["entities"].sort_values("npv", ascending=False)
+            table(cons_ent.head(CONS_ROWS).style.format({c: "{:,.0f}" for c in ("npv", "ebitda", "revenue", "pfn")}),
+                  hide_index=True)
+            st.download_button(Labels["cons_download"], lambda: cons_ent.to_csv(index=False).encode("utf-8"),
+                               "consolidation_entities.csv", "text/csv")
+
+# --- ARCHIVIO E CONFRONTO SCENARI ---
+scenario_inputs = dict(capex=inv, years=durata, wacc=wacc, rev1=rev1, growth=growth, cogs_p=cogs_p, opex1=opex1,
+                       opex_g=opex_g, tax_r=tax_r, arpu=arpu, churn=churn, cac=cac, cash=cash, debt=debt,
+                       dso=dso, dio=dio, dpo=dpo, price=price, var_cost=vc, fix_cost=fc, volume=vol, shock=shock / 100,
+                       periods_per_year=ppy, dep_years=dcf_opts["dep_years"], tax_carryforward=tax_cf,
+                       terminal_growth=dcf_opts["terminal_growth"])
+store = scenario_store()
+with st.sidebar, PROFILER.section("sidebar.scenari"):
+    with st.expander(L["headers"]["scenarios"]):
+        sc_name = st.text_input(Labels["scenario_name"], azienda)
+        if st.button(Labels["save"], use_container_width=True) and sc_name.strip():
+            _, recomputed = store.save(sc_name.strip(), scenario_inputs)
+            st.success(Labels["saved_msg"].format(n=len(recomputed), tot=len(GRAPH)))
+        saved = store.names()
+        sc_load = st.selectbox(Labels["load"], [""] + saved)
+        st.button(Labels["load"], on_click=load_scenario, args=(sc_load,), disabled=not sc_load, use_container_width=True)
+
+with tabs[0], PROFILER.section("tab.scenari"):
+    if saved:
+        st.divider()
+        st.subheader(L["headers"]["compare_title"])
+        picked = st.multiselect(Labels["compare"], saved, default=saved[:min(len(saved), 5)], max_selections=20)
+        cmp = pd.DataFrame.from_dict(store.compare(picked), orient="index")
+        if not cmp.empty:
+            for f in ("npv", "liq", "saas", "stress"):
+                cmp[f"flag_{f}"] = cmp[f"flag_{f}"].map({True: "✅", False: "❌"})
+            cmp = cmp.rename(columns={"npv": L["kpi"]["npv"], "irr": L["kpi"]["irr"], "payback": L["kpi"]["payback"],
+                                      "pfn": L["kpi"]["pfn"], "ccc": L["kpi"]["ccc"], "ltv_cac": L["kpi"]["ltv_cac"],
+                                      "bep": L["kpi"]["bep"], "safety": L["kpi"]["safety"],
+                                      "stress_ebitda": L["kpi"]["stress_ebitda"], "flag_npv": "🚦 NPV",
+                                      "flag_liq": "🚦 CCC", "flag_saas": "🚦 SaaS", "flag_stress": "🚦 Stress"})
+            table(cmp.style.format({L["kpi"]["npv"]: "{:,.0f}", L["kpi"]["irr"]: "{:.1%}",
+                                    L["kpi"]["payback"]: "{:.1f}", L["kpi"]["pfn"]: "{:,.0f}",
+                                    L["kpi"]["ccc"]: "{:.0f}", L["kpi"]["ltv_cac"]: "{:.1f}x",
+                                    L["kpi"]["bep"]: "{:,.0f}", L["kpi"]["safety"]: "{:.1%}",
+                                    L["kpi"]["stress_ebitda"]: "{:,.0f}"}, na_rep="N/A"))
+
+# --- GOAL SEEK: DRIVER CHE PORTA UN KPI ALL'OBIETTIVO ---
+with tabs[0], PROFILER.section("tab.goalseek"):
+    st.divider()
+    st.subheader(L["headers"]["gs_title"])
+    gs1, gs2, gs3 = st.columns(3)
+    gs_kpi = gs1.selectbox(Labels["gs_kpi"], list(KPI_DRIVERS), format_func=lambda k: L["kpi"][k], key="gs_kpi")
+    gs_driver = gs2.selectbox(Labels["gs_driver"], KPI_DRIVERS[gs_kpi],
+                              format_func=lambda d: Labels[GOAL_DRIVER_LABELS[d]], key=f"gs_driver_{gs_kpi}")
+    gs_pct = gs_kpi in GOAL_PERCENT_KPIS
+    gs_default = wacc if gs_kpi == "irr" else DEFAULT_TARGETS[gs_kpi]
+    gs_target = gs3.number_input(Labels["gs_target"] + (" %" if gs_pct else ""),
+                                 value=float(gs_default * 100 if gs_pct else gs_default), key=f"gs_target_{gs_kpi}")
+    gs_inputs = {k: v for k, v in scenario_inputs.items() if k in DEFAULT_INPUTS}
+    gs = calc_goalseek(gs_kpi, gs_driver, gs_target / 100 if gs_pct else gs_target, gs_inputs,
+                       dcf_opts if gs_kpi in ("npv", "irr") else None)
+
+    fmt_drv = lambda v: (f"{v:.2%}" if gs_driver in PERCENT_DRIVERS else f"{v:,.0f}" if gs_driver == "years"
+                         else f"{v:,.1f}" if gs_driver in ("dso", "dio", "dpo") else f"{valuta} {v:,.2f}")
+    fmt_kpi = lambda v: f"{v:.1%}" if gs_pct else f"{v:,.2f}" if gs_kpi == "ltv_cac" else f"{v:,.0f}"
+    r1, r2 = st.columns(2)
+    r1.metric(Labels["gs_current"], fmt_drv(gs["current"]), help=f"{L['kpi'][gs_kpi]}: {fmt_kpi(gs['kpi_current'])}")
+    if np.isfinite(gs["value"]):
+        r2.metric(Labels["gs_solution"], fmt_drv(gs["value"]), delta=fmt_drv(gs["value"] - gs["current"]),
+                  delta_color="off")
+        st.caption(Labels["gs_condition"].format(
+            kpi=L["kpi"][gs_kpi], driver=Labels[GOAL_DRIVER_LABELS[gs_driver]],
+            op="≥" if gs["condition"] == ">=" else "≤", value=fmt_drv(gs["value"]), n=gs["evaluations"]))
+    else:
+        r2.metric(Labels["gs_solution"], "N/A")
+        st.caption(Labels["gs_none"])
 
 st.divider()
 
 st.caption(f"Black Swan CFO OS v11.0 | {azienda} | {L['footer_base']}")
 
+# --- PANNELLO DI PROFILAZIONE ---
+# Nascosto: compare solo con CFO_PROFILE=1 e "?admin=1" nell'URL. Le statistiche sono
+# di processo (tutte le sessioni); gli export sono pronti per Prometheus o per un log.
+if PROFILER.enabled and st.query_params.get("admin") == "1":
+    with st.sidebar.expander(L["headers"]["profiling"]):
+        prof = PROFILER.stats()
+        if prof:
+            prof_ms = ["total", "mean", "p50", "p90", "p99", "max"]
+            prof_df = pd.DataFrame.from_dict(prof, orient="index")
+            prof_df[prof_ms] *= 1000
+            st.dataframe(prof_df.style.format({c: "{:,.1f}" for c in prof_ms}), use_container_width=True)
+        pr1, pr2 = st.columns(2)
+        pr1.download_button("Prometheus", PROFILER.prometheus_text, "cfo_metrics.prom", "text/plain")
+        pr2.download_button("JSON lines", PROFILER.json_lines, "cfo_metrics.jsonl", "application/x-ndjson")
+        if st.button(Labels["reset_stats"]):
+            PROFILER.reset()
+PROFILER.end_rerun()
+
@@ -0,0 +1,195 @@
+# --- OTTIMIZZATORE DI PORTAFOGLIO ---
+# Scelta del sottoinsieme di progetti che massimizza l'NPV con un budget di capex totale
+# e/o per anno di avvio. Gli NPV di tutti i candidati vengono da una sola valutazione
+# vettoriale (cfo_engine.evaluate_projects, a blocchi).
+# Ogni vincolo pesa un progetto per il suo capex (o zero se il vincolo è di un altro anno):
+# l'ordine per NPV/capex è lo stesso per tutti i vincoli, e il rilassamento continuo
+# (Dantzig) di ciascun vincolo si calcola con somme cumulative e una ricerca binaria.
+# Fino a EXACT_MAX_N progetti branch-and-bound esatto; oltre, greedy nell'ordine del
+# rilassamento con il limite superiore del rilassamento per misurarne il gap.
+
+import numpy as np
+
+from cfo_engine import DEFAULT_INPUTS, INVEST_DRIVERS, block_rows, evaluate_projects
+
+EXACT_MAX_N = 200             # progetti "contesi" oltre i quali si usa il greedy
+NODE_LIMIT = 200_000          # nodi massimi del branch-and-bound (poi miglior soluzione trovata)
+
+# Colonne della tabella progetti: i driver della tab Investimenti più l'anno di avvio
+# (0 = oggi), che sconta l'NPV ad oggi e indica quale budget annuo consuma il capex
+PROJECT_COLUMNS = INVEST_DRIVERS + ("start_year",)
+
+
+def _numeric(df, name, default):
+    # Colonna numerica: celle vuote o non numeriche (es. righe aggiunte nell'editor) = `default`
+    import pandas as pd
+    if name not in df.columns:
+        return np.full(len(df), float(default))
+    return pd.to_numeric(df[name], errors="coerce").fillna(default).to_numpy(dtype=float)
+
+
+def project_npvs(df, options=None, defaults=None):
+    """
+    NPV ad oggi di ogni riga di `df` (colonne PROJECT_COLUMNS; colonne e celle mancanti usano
+    `defaults` o i default dell'app) e relativi capex e anno di avvio. `options`: opzioni DCF
+    di evaluate_projects. Le righe non valutabili (orizzonte sotto 1 anno, anno di avvio
+    negativo, valori non finiti) hanno NPV NaN e non vengono mai selezionate.
+    """
+    options = options or {}
+    defaults = {**DEFAULT_INPUTS, **(defaults or {})}
+    x = {k: _numeric(df, k, defaults[k]) for k in INVEST_DRIVERS}
+    start = _numeric(df, "start_year", 0)
+    valid = np.all(np.isfinite(np.column_stack(list(x.values()) + [start])), axis=1)
+    valid &= (x["years"] >= 1) & (start >= 0)
+    start = np.where(valid, start, 0).astype(int)
+    years = np.where(valid, x["years"], 1).astype(int)
+    rows = np.flatnonzero(valid)
+    npv = np.full(len(df), np.nan)
+    step = block_rows(int(years.max(initial=1)) * int(options.get("periods_per_year", 1)))
+    for i in range(0, len(rows), step):
+        b = rows[i:i + step]
+        res = evaluate_projects(x["capex"][b], years[b], x["wacc"][b], x["rev1"][b], x["growth"][b],
+                                x["cogs_p"][b], x["opex1"][b], x["opex_g"][b], x["tax_r"][b],
+                                with_irr=False, **options)
+        npv[b] = res["npv"]
+    return npv / (1 + x["wacc"]) ** start, x["capex"], start
+
+
+class _Relaxation:
+    # Rilassamento continuo di tutti i vincoli sugli elementi ordinati per NPV/capex.
+    # Per il vincolo k: capex e valori cumulati degli elementi che lo consumano.
+    def __init__(self, value, weight, member):
+        self.total = np.concatenate([[0.0], np.cumsum(value)])
+        self.cum_w = np.hstack([np.zeros((len(member), 1)), np.cumsum(weight * member, axis=1)])
+        self.cum_v = np.hstack([np.zeros((len(member), 1)), np.cumsum(value * member, axis=1)])
+        self.value, self.weight, self.n = value, weight, len(value)
+
+    def bound(self, d, residual):
+        """Limite superiore del valore ottenibile dagli elementi d..n-1 con capienze `residual`."""
+        best = np.inf
+        rest = self.total[-1] - self.total[d]
+        for k, r in enumerate(residual):
+            w, v = self.cum_w[k], self.cum_v[k]
+            # Elementi fuori dal vincolo k: interi; elementi del vincolo: riempimento frazionario
+            j = int(np.searchsorted(w, w[d] + r, side="right")) - 1
+            b = rest - (v[-1] - v[d]) + (v[j] - v[d])
+            if j < self.n:
+                b += (w[d] + r - w[j]) / self.weight[j] * self.value[j]
+            best = min(best, b)
+            if best <= 0:
+                break
+        return best
+
+
+def _greedy(value, weight, rows, caps):
+    # Elementi in ordine di NPV/capex, presi se stanno in tutti i vincoli che consumano
+    residual = list(caps)
+    take = np.zeros(len(value), dtype=bool)
+    for i, (w, ks) in enumerate(zip(weight.tolist(), rows)):
+        if all(residual[k] >= w for k in ks):
+            for k in ks:
+                residual[k] -= w
+            take[i] = True
+    return take
+
+
+def _branch_and_bound(value, weight, member, caps, incumbent, node_limit):
+    relax = _Relaxation(value, weight, member)
+    n = len(value)
+    w_rows = weight * member                       # capex consumato in ciascun vincolo
+    best = {"value": float(value[incumbent].sum()), "take": incumbent.copy()}
+    chosen = np.zeros(n, dtype=bool)
+    nodes = 0
+
+    def branch(d, residual, v):
+        nonlocal nodes
+        nodes += 1
+        if nodes > node_limit:
+            return
+        if d == n:
+            if v > best["value"]:
+                best["value"], best["take"] = v, chosen.copy()
+            return
+        if v + relax.bound(d, residual) <= best["value"] * (1 + 1e-12):
+            return
+        w = w_rows[:, d]
+        if np.all(w <= residual):
+            chosen[d] = True
+            branch(d + 1, residual - w, v + value[d])
+            chosen[d] = False
+        branch(d + 1, residual, v)
+
+    branch(0, np.asarray(caps, dtype=float), 0.0)
+    return best["take"], nodes <= node_limit, nodes
+
+
+def select_projects(npv, capex, budget=None, year_budgets=None, start_year=None,
+                    exact_max=EXACT_MAX_N, node_limit=NODE_LIMIT):
+    """
+    Sottoinsieme di progetti che massimizza la somma degli NPV rispettando `budget`
+    (capex totale) e `year_budgets` ({anno di avvio: capex massimo}); senza vincoli
+    vengono scelti tutti i progetti a NPV positivo.
+    Restituisce un dict con selected (maschera N), npv, capex, n_selected, method
+    ("branch_and_bound" o "greedy"), optimal, upper_bound (limite del rilassamento
+    continuo), gap (upper_bound - npv) e nodes esplorati.
+    """
+    npv = np.asarray(npv, dtype=float)
+    capex = np.asarray(capex, dtype=float)
+    n = len(npv)
+    start = np.zeros(n, dtype=int) if start_year is None else np.asarray(start_year, dtype=int)
+
+    member, caps = [], []
+    if budget is not None:
+        member.append(np.ones(n, dtype=bool))
+        caps.append(float(budget))
+    for year, cap in (year_budgets or {}).items():
+        member.append(start == int(year))
+        caps.append(float(cap))
+    member = np.array(member, dtype=bool).reshape(len(caps), n)
+    caps = np.array(caps, dtype=float)
+
+    # Scelte obbligate: mai i progetti a NPV non positivo o più grandi di un loro budget;
+    # sempre quelli a NPV positivo senza capex o fuori da ogni vincolo
+    good = np.nan_to_num(npv, nan=-np.inf) > 0
+    fits = ~np.any(member & (capex > caps[:, None]), axis=0)
+    free = good & ((capex <= 0) | ~member.any(axis=0))
+    contested = np.flatnonzero(good & fits & ~free)
+
+    order = contested[np.argsort(-npv[contested] / capex[contested], kind="stable")]
+    value, weight, sub = npv[order], capex[order], member[:, order]
+    rows = [np.flatnonzero(sub[:, i]).tolist() for i in range(len(order))]
+
+    take = _greedy(value, weight, rows, caps)
+    upper = float(_Relaxation(value, weight, sub).bound(0, caps)) if len(order) else 0.0
+    method, optimal, nodes = "greedy", bool(take.all()), 0
+    if 0 < len(order) <= exact_max and not optimal:
+        take, optimal, nodes = _branch_and_bound(value, weight, sub, caps, take, node_limit)
+        method = "branch_and_bound"
+
+    selected = free.copy()
+    selected[order[take]] = True
+    total = float(npv[selected].sum())
+    upper += float(npv[free].sum())
+    return {
+        "selected": selected,
+        "npv": total,
+        "capex": float(capex[selected].sum()),
+        "n_selected": int(selected.sum()),
+        "method": method,
+        "optimal": optimal,
+        "upper_bound": float(max(upper, total)),
+        "gap": float(max(upper - total, 0.0)),
+        "nodes": nodes,
+    }
+
+
+def optimize_portfolio(df, budget=None, year_budgets=None, options=None, defaults=None,
+                       exact_max=EXACT_MAX_N, node_limit=NODE_LIMIT):
+    """
+    Valuta i progetti di `df` e sceglie il portafoglio: (risultato di select_projects con in più
+    invalid = righe non valutabili, NPV per progetto).
+    """
+    npv, capex, start = project_npvs(df, options, defaults)
+    res = select_projects(npv, capex, budget, year_budgets, start, exact_max, node_limit)
+    res["invalid"] = int(np.isnan(npv).sum())
+    return res, npv
@@ -0,0 +1,143 @@
+# --- PROFILAZIONE DEI PERCORSI CALDI ---
+# Strumentazione opzionale (CFO_PROFILE=1): cronometra sezioni con nome (tab, calcoli,
+# grafici, tabelle, export, IRR) a ogni rerun e ne tiene conteggi, somme e una finestra
+# degli ultimi campioni per i percentili. Disattivata costa un controllo di flag per
+# sezione. Condivisa tra le sessioni del processo (thread-safe), esportabile in formato
+# testo Prometheus o JSON lines; con CFO_PROFILE_LOG ogni rerun viene anche accodato
+# a un file JSON lines. Le sezioni annidate contano il tempo inclusivo.
+
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+WINDOW = 1000                 # campioni recenti per sezione usati per i percentili
+QUANTILES = (0.5, 0.9, 0.99)
+METRIC = "cfo_section_seconds"
+
+
+def _quantile(sorted_samples, q):
+    # Percentile "nearest rank" su campioni già ordinati
+    return sorted_samples[max(0, math.ceil(q * len(sorted_samples)) - 1)]
+
+
+class Profiler:
+    """Registro dei tempi per sezione: conteggio, somma, massimo e ultimi WINDOW campioni."""
+
+    def __init__(self, enabled=False, log_path=None, window=WINDOW):
+        self.enabled = enabled
+        self.log_path = log_path
+        self.window = window
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._sections = {}
+
+    def record(self, name, seconds):
+        with self._lock:
+            s = self._sections.get(name)
+            if s is None:
+                s = self._sections[name] = {"count": 0, "sum": 0.0, "max": 0.0, "recent": deque(maxlen=self.window)}
+            s["count"] += 1
+            s["sum"] += seconds
+            s["max"] = max(s["max"], seconds)
+            s["recent"].append(seconds)
+        rerun = getattr(self._local, "rerun", None)
+        if rerun is not None:
+            rerun[name] = rerun.get(name, 0.0) + seconds
+
+    @contextmanager
+    def _timer(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - t0)
+
+    def section(self, name):
+        """Context manager che cronometra il blocco come `name` (nullo se disattivato)."""
+        return self._timer(name) if self.enabled else _NULL
+
+    def timed(self, name):
+        """Decoratore: cronometra ogni chiamata della funzione come `name`."""
+        def decorate(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with self._timer(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    # --- RERUN ---
+    # Un rerun di Streamlit gira in un solo thread: le sezioni del rerun corrente si
+    # accumulano in un dict locale al thread e vengono chiuse da end_rerun().
+    def start_rerun(self):
+        if self.enabled:
+            self._local.rerun = {}
+            self._local.t0 = time.perf_counter()
+
+    def end_rerun(self, **fields):
+        """Registra la durata del rerun e, se c'è un log, accoda una riga JSON con le sezioni."""
+        rerun = getattr(self._local, "rerun", None)
+        if not self.enabled or rerun is None:
+            return
+        self._local.rerun = None
+        total = time.perf_counter() - self._local.t0
+        self.record("rerun", total)
+        if self.log_path:
+            line = json.dumps({"ts": time.time(), "rerun": total, "sections": rerun, **fields})
+            with self._lock, open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    # --- LETTURA ED EXPORT ---
+    def stats(self):
+        """Dict sezione -> count, total, mean, max e percentili p50/p90/p99 (secondi) sulla finestra recente."""
+        with self._lock:
+            snap = {k: (s["count"], s["sum"], s["max"], sorted(s["recent"])) for k, s in self._sections.items()}
+        out = {}
+        for name, (count, total, peak, recent) in sorted(snap.items()):
+            row = {"count": count, "total": total, "mean": total / count, "max": peak}
+            row.update({f"p{round(q * 100)}": _quantile(recent, q) for q in QUANTILES})
+            out[name] = row
+        return out
+
+    def prometheus_text(self):
+        """Sezioni come metrica summary nel formato di esposizione testuale di Prometheus."""
+        lines = [f"# HELP {METRIC} Durata delle sezioni dell'app (finestra recente per i quantili).",
+                 f"# TYPE {METRIC} summary"]
+        for name, s in self.stats().items():
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            for q in QUANTILES:
+                lines.append(f'{METRIC}{{section="{label}",quantile="{q}"}} {s[f"p{round(q * 100)}"]:.6f}')
+            lines.append(f'{METRIC}_sum{{section="{label}"}} {s["total"]:.6f}')
+            lines.append(f'{METRIC}_count{{section="{label}"}} {s["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def json_lines(self):
+        """Una riga JSON per sezione con timestamp e statistiche."""
+        ts = time.time()
+        return "".join(json.dumps({"ts": ts, "section": name, **s}) + "\n" for name, s in self.stats().items())
+
+
+class _NullSection:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullSection()
+
+# Istanza di processo condivisa da app e motore di calcolo (CFO_PROFILE_LOG implica CFO_PROFILE)
+_LOG = os.environ.get("CFO_PROFILE_LOG") or None
+PROFILER = Profiler(enabled=os.environ.get("CFO_PROFILE", "") not in ("", "0") or _LOG is not None, log_path=_LOG)
@@ -0,0 +1,85 @@
+# --- FUNZIONI DI EXPORT ---
+# Generatori dei report (PDF, PPTX, CSV) importabili senza Streamlit.
+# fpdf e python-pptx vengono importati solo alla prima generazione del relativo formato.
+
+import io
+import csv
+from datetime import datetime
+
+# --- CONTENUTO DEI REPORT ---
+def format_irr(irr_val):
+    return "N/A" if irr_val != irr_val else f"{irr_val:.1%}"
+
+def build_export_data(L, valuta, npv_val, irr_val, pfn, ratio, safety):
+    return {
+        L["kpi"]["npv"]: f"{valuta} {npv_val:,.0f}",
+        L["kpi"]["irr"]: format_irr(irr_val),
+        L["kpi"]["pfn"]: f"{valuta} {pfn:,.0f}",
+        L["kpi"]["ltv_cac"]: f"{ratio:.2f}x",
+        L["kpi"]["safety"]: f"{safety:.1%}",
+        "Data Estrazione": datetime.now().strftime("%Y-%m-%d")
+    }
+
+def build_recoms(L, flags):
+    # `flags`: semafori di cfo_engine.recommendation_flags (True = "_ok")
+    return [L["recom"][f"{k}_ok" if ok else f"{k}_ko"] for k, ok in flags.items()]
+
+# --- GENERATORI ---
+def sanitize_text(text):
+    if not isinstance(text, str): text = str(text)
+    return text.replace('€', 'EUR').replace('£', 'GBP').replace('$', 'USD').encode('latin-1', 'replace').decode('latin-1')
+
+def generate_pdf(data, recoms, title):
+    from fpdf import FPDF
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Helvetica", "B", 16)
+    pdf.cell(0, 10, sanitize_text(title), ln=True, align='C')
+    pdf.ln(10)
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 10, "KPI Summary:", ln=True)
+    pdf.set_font("Helvetica", "", 11)
+    for k, v in data.items():
+        pdf.cell(0, 8, f"{sanitize_text(k)}: {sanitize_text(v)}", ln=True)
+    pdf.ln(10)
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 10, "Strategic Recommendations:", ln=True)
+    pdf.set_font("Helvetica", "", 10)
+    width = pdf.w - 2 * pdf.l_margin
+    for r in recoms:
+        pdf.set_x(pdf.l_margin)
+        pdf.multi_cell(width, 8, sanitize_text(f"- {r}"))
+    pdf.ln(10)
+    pdf.set_font("Helvetica", "I", 8)
+    pdf.cell(0, 10, f"Generated by Black Swan CFO OS - {datetime.now().strftime('%Y-%m-%d')}", ln=True, align='C')
+    return pdf.output(dest='S').encode('latin-1')
+
+def generate_pptx(data, recoms, title, template=None):
+    # `template`: bytes di un .pptx già caricato (es. precaricato una volta per worker)
+    from pptx import Presentation
+    prs = Presentation(io.BytesIO(template) if template is not None else None)
+    slide = prs.slides.add_slide(prs.slide_layouts[0])
+    slide.shapes.title.text = title
+    slide.placeholders[1].text = f"Analisi Finanziaria Strategica\n{datetime.now().strftime('%Y-%m-%d')}"
+    slide = prs.slides.add_slide(prs.slide_layouts[1])
+    slide.shapes.title.text = "Key Performance Indicators"
+    tf = slide.placeholders[1].text_frame
+    for k, v in data.items():
+        p = tf.add_paragraph()
+        p.text = f"{k}: {v}"
+    slide = prs.slides.add_slide(prs.slide_layouts[1])
+    slide.shapes.title.text = "Strategic Recommendations"
+    tf = slide.placeholders[1].text_frame
+    for r in recoms:
+        p = tf.add_paragraph()
+        p.text = r
+    buf = io.BytesIO()
+    prs.save(buf)
+    return buf.getvalue()
+
+def generate_csv(data):
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(['Metric', 'Value'])
+    writer.writerows(data.items())
+    return buf.getvalue().encode('utf-8')
@@ -0,0 +1,84 @@
+# --- SIMULATORE SAAS A COORTI ---
+# Proietta coorti mensili di clienti dalla spesa di acquisizione, con curva di churn
+# per età, espansione dei ricavi e margine lordo. La matrice coorte x mese è costruita
+# con indici di età triangolari (mese - coorte), senza cicli per coorte.
+
+import numpy as np
+
+from cfo_engine import SAAS_GROSS_MARGIN
+
+
+def survival_curve(churn, months, churn_decay=0.0):
+    """
+    Quota di clienti ancora attivi per età 0..months-1.
+    `churn`: churn mensile (decimale) oppure vettore per età; `churn_decay`: calo relativo
+    del churn per ogni mese di vita (i clienti fedeli abbandonano meno).
+    """
+    age = np.arange(months)
+    rate = np.broadcast_to(np.asarray(churn, dtype=float), (months,)) * (1 - churn_decay) ** age
+    rate = np.clip(rate, 0.0, 1.0)
+    # S(0) = 1, S(a) = prodotto di (1 - churn) sulle età precedenti
+    return np.concatenate([[1.0], np.cumprod(1 - rate[:-1])])
+
+
+def simulate_cohorts(months, spend, cac, arpu, churn, expansion=0.0, gross_margin=SAAS_GROSS_MARGIN,
+                     spend_growth=0.0, churn_decay=0.0, arr0=0.0):
+    """
+    Simula `months` coorti mensili su `months` mesi.
+    `spend`: spesa di acquisizione mensile (scalare o vettore per mese), cresce di `spend_growth`
+    al mese se scalare; nuovi clienti = spesa / CAC. `arpu` mensile, `expansion` crescita mensile
+    dell'ARPU di un cliente attivo. `arr0`: ARR della base clienti esistente al mese 0.
+    CAC o ARPU non positivi (campi azzerati nella tab) danno zero clienti acquisiti o zero
+    ricavi e payback non definito (NaN), come nella tab SaaS base.
+    Restituisce un dict con matrici coorte x mese (mrr, ltv) e serie mensili (mrr_total, arr, nrr...).
+    """
+    if months < 1:
+        raise ValueError("L'orizzonte deve essere di almeno 1 mese")
+    m = np.arange(months)
+    spend = np.asarray(spend, dtype=float)
+    spend = spend * (1 + spend_growth) ** m if spend.ndim == 0 else np.broadcast_to(spend, (months,))
+    new = spend / cac if cac > 0 else np.zeros(months)
+
+    surv = survival_curve(churn, months, churn_decay)
+    # Ricavo mensile atteso per cliente acquisito, per età
+    rev_age = max(arpu, 0.0) * surv * (1 + expansion) ** m
+
+    # Età di ogni cella coorte x mese: triangolo superiore valido (mese >= coorte)
+    age = m[None, :] - m[:, None]
+    valid = age >= 0
+    mrr = np.where(valid, new[:, None] * rev_age[np.maximum(age, 0)], 0.0)
+
+    # Base esistente (arr0) trattata come coorte al mese 0, senza costo di acquisizione
+    base = arr0 / 12 * surv * (1 + expansion) ** m if arr0 else np.zeros(months)
+    mrr_total = mrr.sum(axis=0) + base
+    customers = (new[:, None] * np.where(valid, surv[np.maximum(age, 0)], 0.0)).sum(axis=0)
+    if arr0 and arpu > 0:
+        customers = customers + arr0 / 12 / arpu * surv
+
+    # NRR a 12 mesi: ricavi oggi delle coorti esistenti 12 mesi fa / loro ricavi di allora
+    cum = np.cumsum(mrr, axis=0) + base[None, :]
+    nrr = np.full(months, np.nan)
+    if months > 12:
+        t = m[12:]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            nrr[12:] = cum[t - 12, t] / cum[t - 12, t - 12]
+
+    # Payback del CAC: primo mese in cui il margine lordo cumulato per cliente copre il CAC
+    gp_cum = np.cumsum(rev_age * gross_margin)
+    hit = gp_cum >= cac
+    payback = float(hit.argmax() + 1) if cac > 0 and hit.any() else np.nan
+
+    ltv = np.cumsum(mrr * gross_margin, axis=1)        # margine lordo cumulato per coorte
+    return {
+        "mrr": mrr,
+        "ltv": ltv,
+        "mrr_total": mrr_total,
+        "arr": mrr_total * 12,
+        "customers": customers,
+        "new_customers": new,
+        "nrr": nrr,
+        "cac_payback": payback,
+        "ltv_customer": float(gp_cum[-1]),
+        "ltv_cac": float(gp_cum[-1] / cac) if cac > 0 else np.nan,
+        "survival": surv,
+    }
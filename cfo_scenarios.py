@@ -0,0 +1,219 @@
+# --- ARCHIVIO SCENARI ---
+# Scenari con nome salvati in SQLite, con i risultati già calcolati. I calcoli sono un
+# grafo di nodi (driver -> flussi -> NPV/IRR -> raccomandazioni): ogni nodo ha un hash
+# dei propri input e degli hash dei nodi a monte, e i risultati sono memorizzati per
+# hash. Modificando un driver si ricalcolano solo i nodi a valle di quel driver; il
+# confronto tra scenari salvati legge i risultati senza rifare i conti.
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from cfo_engine import (DEFAULT_INPUTS, project_cash_flows, value_cash_flows, saas_kpis, liquidity_kpis,
+                        breakeven_kpis, stress_kpis, recommendation_flags)
+from cfo_paths import data_path
+
+DB_PATH = os.environ.get("CFO_SCENARIO_DB", data_path("scenarios.sqlite"))
+
+# Opzioni DCF di evaluate_projects salvate con lo scenario (default = modello annuale)
+DCF_DEFAULTS = {"periods_per_year": 1, "dep_years": None, "tax_carryforward": False, "terminal_growth": None}
+SCENARIO_INPUTS = {**DEFAULT_INPUTS, **DCF_DEFAULTS}
+
+
+def _f(x):
+    return float(np.asarray(x).ravel()[0])
+
+
+def _cash_flows(x):
+    r = project_cash_flows(x["capex"], x["years"], x["rev1"], x["growth"], x["cogs_p"], x["opex1"],
+                           x["opex_g"], x["tax_r"], x["periods_per_year"], x["dep_years"], x["tax_carryforward"])
+    return {"cf": r["cf"][0].tolist(), "n_periods": int(r["n_periods"][0])}
+
+
+def _valuation(x):
+    flows = x["cash_flows"]
+    r = value_cash_flows(flows["cf"], flows["n_periods"], x["wacc"], x["periods_per_year"], x["terminal_growth"])
+    return {"npv": _f(r["npv"]), "irr": _f(r["irr"]), "irr_status": int(r["irr_status"][0]),
+            "payback": _f(r["payback"]), "terminal_value": _f(r["terminal_value"])}
+
+
+def _saas(x):
+    return {k: _f(v) for k, v in saas_kpis(x["arpu"], x["churn"], x["cac"]).items()}
+
+
+def _liquidity(x):
+    return {k: _f(v) for k, v in liquidity_kpis(x["cash"], x["debt"], x["dso"], x["dio"], x["dpo"]).items()}
+
+
+def _breakeven(x):
+    return {k: _f(v) for k, v in breakeven_kpis(x["price"], x["var_cost"], x["fix_cost"], x["volume"]).items()}
+
+
+def _stress(x):
+    return {k: _f(v) for k, v in stress_kpis(x["rev1"], x["cogs_p"], x["opex1"], x["shock"]).items()}
+
+
+def _recommendations(x):
+    flags = recommendation_flags(x["valuation"]["npv"], x["liquidity"]["ccc"], x["saas"]["ltv_cac"],
+                                 x["stress"]["stress_ebitda"])
+    return {f"flag_{k}": bool(v) for k, v in flags.items()}
+
+
+# Grafo dei calcoli in ordine topologico: nodo -> (dipendenze, funzione).
+# Le dipendenze sono input (chiavi di SCENARIO_INPUTS) o nodi precedenti.
+GRAPH = {
+    "cash_flows": (("capex", "years", "rev1", "growth", "cogs_p", "opex1", "opex_g", "tax_r",
+                    "periods_per_year", "dep_years", "tax_carryforward"), _cash_flows),
+    "valuation": (("cash_flows", "wacc", "periods_per_year", "terminal_growth"), _valuation),
+    "saas": (("arpu", "churn", "cac"), _saas),
+    "liquidity": (("cash", "debt", "dso", "dio", "dpo"), _liquidity),
+    "breakeven": (("price", "var_cost", "fix_cost", "volume"), _breakeven),
+    "stress": (("rev1", "cogs_p", "opex1", "shock"), _stress),
+    "recommendations": (("valuation", "liquidity", "saas", "stress"), _recommendations),
+}
+
+# KPI mostrati nel confronto: nodo -> chiavi
+COMPARE_KPIS = {
+    "valuation": ("npv", "irr", "payback"),
+    "liquidity": ("pfn", "ccc"),
+    "saas": ("ltv_cac",),
+    "breakeven": ("bep", "safety"),
+    "stress": ("stress_ebitda",),
+    "recommendations": ("flag_npv", "flag_liq", "flag_saas", "flag_stress"),
+}
+
+
+def normalize_inputs(inputs):
+    """Input completi (default per le chiavi mancanti) in tipi JSON semplici."""
+    unknown = set(inputs) - set(SCENARIO_INPUTS)
+    if unknown:
+        raise ValueError(f"Input non riconosciuti: {sorted(unknown)}")
+    x = dict(SCENARIO_INPUTS)
+    x.update(inputs)
+    out = {}
+    for k, v in x.items():
+        if v is None or isinstance(v, bool):
+            out[k] = v
+        elif k in ("years", "periods_per_year", "dep_years"):
+            out[k] = int(v)
+        else:
+            out[k] = float(v)
+    return out
+
+
+def _hash(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def evaluate_graph(inputs, lookup=None):
+    """
+    Valuta il grafo per `inputs`. `lookup(nodo, hash)` restituisce un risultato già
+    calcolato o None: solo i nodi senza risultato vengono ricalcolati.
+    Restituisce (hash per nodo, risultati per nodo, lista dei nodi ricalcolati).
+    """
+    x = normalize_inputs(inputs)
+    hashes, results, recomputed = {}, {}, []
+    for node, (deps, fn) in GRAPH.items():
+        # L'hash di un nodo dipende dai valori degli input e dagli hash dei nodi a monte
+        h = _hash([node] + [hashes[d] if d in GRAPH else x[d] for d in deps])
+        out = lookup(node, h) if lookup else None
+        if out is None:
+            out = fn({d: results[d] if d in GRAPH else x[d] for d in deps})
+            recomputed.append(node)
+        hashes[node], results[node] = h, out
+    return hashes, results, recomputed
+
+
+def kpi_row(results):
+    """KPI di confronto (COMPARE_KPIS) da un dict di risultati per nodo."""
+    return {k: results[node][k] for node, keys in COMPARE_KPIS.items() for k in keys}
+
+
+class ScenarioStore:
+    """
+    Archivio SQLite di scenari con nome e dei risultati dei nodi, indicizzati per hash.
+    Una connessione condivisa tra le sessioni (thread) del processo: ogni operazione la usa
+    sotto un lock, così le transazioni di save() e delete() non si intrecciano.
+    """
+
+    def __init__(self, path=None):
+        path = path or DB_PATH
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.RLock()
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS scenarios (
+                name TEXT PRIMARY KEY, inputs TEXT NOT NULL, nodes TEXT NOT NULL, updated TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS results (
+                hash TEXT PRIMARY KEY, node TEXT NOT NULL, value TEXT NOT NULL);
+        """)
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+    def names(self):
+        with self._lock:
+            return [r[0] for r in self.db.execute("SELECT name FROM scenarios ORDER BY name")]
+
+    def load(self, name):
+        """Input salvati dello scenario `name`, o None se non esiste."""
+        with self._lock:
+            row = self.db.execute("SELECT inputs FROM scenarios WHERE name = ?", (name,)).fetchone()
+            return json.loads(row[0]) if row else None
+
+    def _lookup(self, node, h):
+        row = self.db.execute("SELECT value FROM results WHERE hash = ?", (h,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def evaluate(self, inputs):
+        """Valuta `inputs` riusando i risultati in archivio: (risultati per nodo, nodi ricalcolati)."""
+        with self._lock:
+            hashes, results, recomputed = evaluate_graph(inputs, self._lookup)
+            self._store_results(hashes, results, recomputed)
+            return results, recomputed
+
+    def _store_results(self, hashes, results, nodes):
+        self.db.executemany("INSERT OR IGNORE INTO results (hash, node, value) VALUES (?, ?, ?)",
+                            [(hashes[n], n, json.dumps(results[n])) for n in nodes])
+
+    def save(self, name, inputs):
+        """Salva (o aggiorna) lo scenario `name`: restituisce (risultati per nodo, nodi ricalcolati)."""
+        x = normalize_inputs(inputs)
+        with self._lock, self.db:
+            hashes, results, recomputed = evaluate_graph(x, self._lookup)
+            self._store_results(hashes, results, recomputed)
+            self.db.execute("INSERT OR REPLACE INTO scenarios (name, inputs, nodes, updated) VALUES (?, ?, ?, ?)",
+                            (name, json.dumps(x), json.dumps(hashes), datetime.now().isoformat(timespec="seconds")))
+        return results, recomputed
+
+    def delete(self, name):
+        """Elimina lo scenario e i risultati non più usati da altri scenari."""
+        with self._lock, self.db:
+            self.db.execute("DELETE FROM scenarios WHERE name = ?", (name,))
+            used = {h for (nodes,) in self.db.execute("SELECT nodes FROM scenarios") for h in json.loads(nodes).values()}
+            stale = [(h,) for (h,) in self.db.execute("SELECT hash FROM results") if h not in used]
+            self.db.executemany("DELETE FROM results WHERE hash = ?", stale)
+
+    def compare(self, names):
+        """KPI salvati per ogni scenario di `names` (dict nome -> riga di kpi_row), senza ricalcoli."""
+        if not names:
+            return {}
+        marks = ",".join("?" * len(names))
+        with self._lock:
+            rows = self.db.execute(f"SELECT name, nodes FROM scenarios WHERE name IN ({marks})", list(names)).fetchall()
+            nodes = {name: json.loads(n) for name, n in rows}
+            wanted = sorted({nodes[name][node] for name in nodes for node in COMPARE_KPIS})
+            values = {}
+            for i in range(0, len(wanted), 500):          # limite di parametri di SQLite
+                part = wanted[i:i + 500]
+                q = f"SELECT hash, value FROM results WHERE hash IN ({','.join('?' * len(part))})"
+                values.update((h, json.loads(v)) for h, v in self.db.execute(q, part))
+            return {name: kpi_row({node: values[nodes[name][node]] for node in COMPARE_KPIS})
+                    for name in names if name in nodes}
@@ -0,0 +1,130 @@
+# --- ANALISI DI SENSITIVITÀ ---
+# Tornado su tutti i driver e griglie a due vie (es. WACC x crescita -> NPV).
+# Ogni analisi è una sola valutazione vettoriale: le combinazioni diventano righe
+# di evaluate_projects invece di chiamate separate cella per cella.
+
+import numpy as np
+
+from cfo_engine import block_rows, evaluate_projects
+
+# Variazione applicata da tornado(): ("rel", x) = +/- x% del valore base, ("abs", x) = +/- x punti
+TORNADO_STEPS = {
+    "capex": ("rel", 0.20),
+    "wacc": ("abs", 0.02),
+    "growth": ("abs", 0.05),
+    "cogs_p": ("abs", 0.05),
+    "opex1": ("rel", 0.20),
+    "opex_g": ("abs", 0.02),
+    "tax_r": ("abs", 0.05),
+}
+
+# Driver espressi in percentuale (decimali): intervalli di griglia in punti assoluti
+RATE_DRIVERS = ("wacc", "growth", "cogs_p", "opex_g", "tax_r")
+
+METRICS = ("npv", "irr")
+
+# Con valore terminale il WACC deve restare sopra la crescita perpetua (altrimenti NPV = NaN):
+# le variazioni di WACC sotto questa soglia vengono portate a crescita + WACC_TV_MARGIN
+WACC_TV_MARGIN = 0.005
+
+
+def wacc_floor(options=None):
+    """WACC minimo valutabile con le opzioni DCF `options` (None senza valore terminale)."""
+    g = (options or {}).get("terminal_growth")
+    return None if g is None else float(g) + WACC_TV_MARGIN
+
+
+def _clamp_wacc(values, options):
+    floor = wacc_floor(options)
+    return values if floor is None else np.maximum(values, floor)
+
+
+def _evaluate(rows, metric, options):
+    # Valutazione a blocchi di righe per tenere limitata la memoria su orizzonti lunghi
+    options = options or {}
+    n = max(np.size(v) for v in rows.values())
+    n_periods = int(np.max(rows["years"])) * int(options.get("periods_per_year", 1))
+    step = block_rows(n_periods)
+    full = {k: np.broadcast_to(np.asarray(v, dtype=float), (n,)) for k, v in rows.items()}
+    out = np.empty(n)
+    for i in range(0, n, step):
+        part = {k: v[i:i + step] for k, v in full.items()}
+        out[i:i + step] = evaluate_projects(**part, with_irr=(metric == "irr"), **options)[metric]
+    return out
+
+
+def tornado(base, steps=TORNADO_STEPS, metric="npv", options=None):
+    """
+    Sensitività a un driver alla volta (`options`: opzioni DCF di evaluate_projects).
+    Restituisce (valore base della metrica, lista di dict ordinata per escursione decrescente)
+    con chiavi driver, low, high (valori del driver) e metric_low, metric_high.
+    Con valore terminale le variazioni di WACC restano sopra wacc_floor(): low è il valore usato.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Metrica non supportata: {metric}")
+    names = list(steps)
+    k = len(names)
+    # Riga 0 = caso base, poi coppie (basso, alto) per ogni driver
+    rows = {d: np.full(2 * k + 1, float(v)) for d, v in base.items()}
+    lows, highs = [], []
+    for i, name in enumerate(names):
+        kind, size = steps[name]
+        b = float(base[name])
+        lo, hi = (b * (1 - size), b * (1 + size)) if kind == "rel" else (b - size, b + size)
+        if name == "wacc":
+            lo, hi = (float(v) for v in _clamp_wacc(np.array([lo, hi]), options))
+        rows[name][1 + 2 * i] = lo
+        rows[name][2 + 2 * i] = hi
+        lows.append(lo)
+        highs.append(hi)
+    vals = _evaluate(rows, metric, options)
+
+    bars = [{
+        "driver": name, "low": lows[i], "high": highs[i],
+        "metric_low": float(vals[1 + 2 * i]), "metric_high": float(vals[2 + 2 * i]),
+    } for i, name in enumerate(names)]
+    # Escursione non definita (es. IRR senza soluzione) in fondo alla lista
+    bars.sort(key=lambda b: np.nan_to_num(abs(b["metric_high"] - b["metric_low"]), nan=-1.0), reverse=True)
+    return float(vals[0]), bars
+
+
+def default_range(driver, base_value, n, span=None, options=None):
+    """
+    Valori di griglia centrati sul valore base: +/- 10 punti per i tassi, +/- 50% per gli importi.
+    `options`: opzioni DCF della griglia (con valore terminale il WACC parte da wacc_floor()).
+    """
+    b = float(base_value)
+    if driver in RATE_DRIVERS:
+        span = 0.10 if span is None else span
+        lo, hi = b - span, b + span
+        if driver == "wacc":
+            lo = max(lo, 0.001, wacc_floor(options) or 0.0)
+            hi = max(hi, lo)
+        if driver in ("cogs_p", "tax_r"):
+            lo, hi = max(lo, 0.0), min(hi, 1.0)
+    else:
+        span = 0.5 if span is None else span
+        lo, hi = b * (1 - span), b * (1 + span)
+    if driver == "years":
+        return np.unique(np.clip(np.round(np.linspace(lo, hi, n)), 1, None))
+    return np.linspace(lo, hi, n)
+
+
+def grid(base, x_driver, x_values, y_driver, y_values, metric="npv", options=None):
+    """
+    Metrica su griglia: matrice len(y_values) x len(x_values) calcolata in un'unica valutazione.
+    Con valore terminale i valori di WACC sotto wacc_floor() sono valutati alla soglia.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Metrica non supportata: {metric}")
+    if x_driver == y_driver:
+        raise ValueError("I due driver della griglia devono essere diversi")
+    xs = np.asarray(x_values, dtype=float)
+    ys = np.asarray(y_values, dtype=float)
+    xx, yy = np.meshgrid(xs, ys)
+    rows = dict(base)
+    rows[x_driver] = xx.ravel()
+    rows[y_driver] = yy.ravel()
+    if "wacc" in (x_driver, y_driver):
+        rows["wacc"] = _clamp_wacc(rows["wacc"], options)
+    return _evaluate(rows, metric, options).reshape(len(ys), len(xs))
@@ -0,0 +1,215 @@
+# --- SERVIZIO DI CALCOLO CONDIVISO ---
+# Coda di job asyncio (in un thread dedicato del processo Streamlit) che esegue i calcoli
+# pesanti in un pool di processi condiviso da tutte le sessioni: simulazioni ed export
+# non girano più nel thread del rerun e non si contendono il GIL con le altre sessioni.
+# Un job è una lista di task (funzione importabile, argomenti) più una funzione `combine`
+# che ne riduce i risultati; l'avanzamento è il numero di task completati.
+# Job con la stessa chiave vengono deduplicati: finché un job è in coda o in esecuzione
+# (e per gli ultimi KEEP_DONE completati) chi lo richiede riceve lo stesso oggetto Job.
+# Ogni job tiene nel pool al più `workers` task alla volta: job concorrenti si alternano
+# sui core invece di accodarsi dietro ai blocchi di quello arrivato prima.
+
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+KEEP_DONE = 32                # job completati tenuti per il riuso (risultati già ridotti)
+PRELOAD = ["numpy"]           # moduli importati una volta nel forkserver, non in ogni worker
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "error"
+
+
+def job_key(*parts):
+    """Chiave di deduplica di un job: hash del contenuto degli argomenti."""
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Job:
+    """Handle di un job: stato, avanzamento (task completati / totali) e risultato."""
+
+    def __init__(self, key, total):
+        self.key = key
+        self.total = total
+        self.completed = 0
+        self.status = QUEUED
+        self.error = None
+        self.submitted = time.time()
+        self.started = self.finished = None
+        self._value = None
+        self._event = threading.Event()
+
+    @property
+    def progress(self):
+        if self.total == 0:
+            return 1.0 if self.done() else 0.0
+        return self.completed / self.total
+
+    def done(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        """Attende la fine del job per al più `timeout` secondi: True se è finito."""
+        return self._event.wait(timeout)
+
+    def result(self, timeout=None):
+        """Risultato del job (attende la fine); rilancia l'eccezione del task che è fallito."""
+        if not self._event.wait(timeout):
+            raise TimeoutError(f"Job {self.key[:12]} non completato entro {timeout} s")
+        if self.error is not None:
+            raise self.error
+        return self._value
+
+    def _finish(self, value=None, error=None):
+        self._value, self.error = value, error
+        self.status = FAILED if error is not None else DONE
+        self.finished = time.time()
+        self._event.set()
+
+
+class ComputeService:
+    """
+    Servizio di calcolo del processo: event loop asyncio in un thread demone, coda dei
+    job e pool di `workers` processi (default: tutti i core). `max_jobs` job girano in
+    contemporanea, gli altri attendono in coda nell'ordine di arrivo.
+    """
+
+    _open = weakref.WeakSet()     # servizi non ancora chiusi nel processo (vedi close_all)
+
+    def __init__(self, workers=None, max_jobs=None, keep=KEEP_DONE):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_jobs = max_jobs or self.workers
+        self.keep = keep
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+        self._loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._serve, args=(ready,), name="cfo-compute", daemon=True)
+        self._thread.start()
+        ready.wait()
+        ComputeService._open.add(self)
+
+    # --- API (thread delle sessioni) ---
+    def submit(self, key, tasks, combine=None):
+        """
+        Accoda un job: `tasks` è una lista di (funzione, argomenti) eseguiti nel pool (le
+        funzioni devono essere importabili dai worker); `combine(risultati)` li riduce nel
+        thread del servizio (default: lista dei risultati nell'ordine dei task).
+        Se un job con la stessa `key` è in corso o completato di recente restituisce quello.
+        """
+        tasks = list(tasks)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status != FAILED:
+                self._jobs.move_to_end(key)
+                return job
+            job = self._jobs[key] = Job(key, len(tasks))
+            self._trim()
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (job, tasks, combine))
+        return job
+
+    def run(self, key, tasks, combine=None, timeout=None):
+        """submit() e attesa del risultato."""
+        return self.submit(key, tasks, combine).result(timeout)
+
+    def stats(self):
+        """Numero di job per stato tra quelli noti al servizio."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {s: sum(j.status == s for j in jobs) for s in (QUEUED, RUNNING, DONE, FAILED)}
+
+    def close(self):
+        """Ferma il loop e il pool (i job in coda restano incompiuti). Più chiamate = una."""
+        if self not in ComputeService._open:
+            return
+        ComputeService._open.discard(self)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    @classmethod
+    def close_all(cls):
+        """Chiude tutti i servizi aperti del processo (es. prima di svuotare st.cache_resource)."""
+        for service in list(cls._open):
+            service.close()
+
+    def _trim(self):
+        # Si scartano i job completati più vecchi oltre `keep`; quelli in corso restano sempre
+        finished = [k for k, j in self._jobs.items() if j.done()]
+        for k in finished[:max(0, len(finished) - self.keep)]:
+            del self._jobs[k]
+
+    # --- LOOP DEL SERVIZIO ---
+    def _serve(self, ready):
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue()
+        dispatchers = [self._loop.create_task(self._dispatch()) for _ in range(self.max_jobs)]
+        ready.set()
+        self._loop.run_forever()
+        # Dopo close(): chiusura ordinata dei dispatcher prima di chiudere il loop
+        for task in dispatchers:
+            task.cancel()
+        self._loop.run_until_complete(asyncio.gather(*dispatchers, return_exceptions=True))
+        self._loop.close()
+
+    def _executor(self):
+        # Pool creato al primo job. Mai "fork": il processo ha già altri thread (Streamlit, il
+        # loop di questo servizio) e un figlio copiato mentre uno di essi tiene un lock resta
+        # bloccato. "forkserver" parte da un server a thread singolo con numpy già importato;
+        # i task sono funzioni dei moduli cfo_*, che i worker importano da sé. Il modulo
+        # __main__ viene rieseguito nei worker se non ha uno spec (vedi cfo_playbook_os).
+        if self._pool is None:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                ctx = multiprocessing.get_context("forkserver")
+                ctx.set_forkserver_preload(PRELOAD)
+            else:
+                ctx = multiprocessing.get_context("spawn")
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx)
+        return self._pool
+
+    async def _dispatch(self):
+        while True:
+            job, tasks, combine = await self._queue.get()
+            await self._run(job, tasks, combine)
+
+    async def _run(self, job, tasks, combine):
+        loop = asyncio.get_running_loop()
+        job.status, job.started = RUNNING, time.time()
+        results = [None] * len(tasks)
+        pending, index = set(), {}
+        todo = iter(enumerate(tasks))
+        try:
+            while True:
+                # Finestra scorrevole: al più `workers` task di questo job nel pool
+                for i, (fn, args) in todo:
+                    fut = loop.run_in_executor(self._executor(), fn, *args)
+                    index[fut] = i
+                    pending.add(fut)
+                    if len(pending) >= self.workers:
+                        break
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for fut in done:
+                    results[index.pop(fut)] = fut.result()
+                    job.completed += 1
+            value = results if combine is None else await loop.run_in_executor(None, combine, results)
+        except Exception as e:
+            for fut in pending:
+                fut.cancel()
+            if isinstance(e, BrokenProcessPool):
+                # Un worker è morto: il prossimo job riparte da un pool nuovo
+                self._pool = None
+            job._finish(error=e)
+        else:
+            job._finish(value)
@@ -0,0 +1,161 @@
+# --- STRESS TEST MULTI-FATTORE CORRELATO ---
+# Scenari "black swan" congiunti su quattro fattori: calo dei ricavi, inflazione dei COGS,
+# rialzo dei tassi sul debito e allungamento del DSO. Gli shock sono normali correlati
+# (fattorizzazione di Cholesky della covarianza), persistenti su tutto l'orizzonte e
+# propagati mese per mese a EBITDA, interessi, capitale circolante e cassa.
+# Ogni blocco di scenari è una sola valutazione vettoriale (scenari x mesi), con un seme
+# proprio: i blocchi possono girare come task separati (cfo_service) con lo stesso risultato.
+
+import numpy as np
+
+from cfo_engine import block_rows
+
+# Fattori di shock, nell'ordine delle colonne della covarianza
+STRESS_FACTORS = ("revenue", "cogs", "rate", "dso")
+
+# Media e volatilità di default: ricavi in variazione relativa, COGS e tassi in punti
+# (decimali) assoluti, DSO in giorni
+DEFAULT_MEANS = {"revenue": -0.20, "cogs": 0.0, "rate": 0.0, "dso": 0.0}
+DEFAULT_VOLS = {"revenue": 0.10, "cogs": 0.03, "rate": 0.01, "dso": 10.0}
+DEFAULT_CORRELATION = 0.5
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_DEBT_RATE = 0.05
+
+PERIODS_PER_YEAR = 12
+DEFAULT_CHUNK = 100_000
+
+
+def crisis_correlation(rho=DEFAULT_CORRELATION):
+    """
+    Correlazione "di crisi" tra i fattori: il calo dei ricavi si accompagna (correlazione -rho)
+    a inflazione dei costi, rialzo dei tassi e incassi più lenti, correlati tra loro (+rho).
+    """
+    if not -1 / 3 < rho < 1:
+        raise ValueError("La correlazione deve essere compresa tra -1/3 e 1 (esclusi)")
+    sign = np.array([-1.0, 1.0, 1.0, 1.0])
+    corr = np.full((4, 4), rho) * np.outer(sign, sign)
+    np.fill_diagonal(corr, 1.0)
+    return corr
+
+
+def sample_shocks(means, vols, corr, n, rng):
+    """Matrice n x 4 di shock correlati (colonne in ordine STRESS_FACTORS)."""
+    mu = np.array([means[f] for f in STRESS_FACTORS], dtype=float)
+    sd = np.array([vols[f] for f in STRESS_FACTORS], dtype=float)
+    # Covarianza D C D: il fattore di Cholesky è D x chol(C), valido anche con volatilità nulle
+    chol = sd[:, None] * np.linalg.cholesky(np.asarray(corr, dtype=float))
+    return mu + rng.standard_normal((n, 4)) @ chol.T
+
+
+def propagate(base, shocks):
+    """
+    Proiezione mensile di ogni scenario sull'orizzonte `base["years"]`.
+    `base`: rev1, growth, cogs_p, opex1, opex_g, tax_r, years, cash, debt, dso, dio, dpo, debt_rate.
+    Il debito resta costante (solo interessi); il circolante (crediti + magazzino - fornitori)
+    parte dal livello attuale, quindi un DSO più lungo assorbe cassa subito.
+    Restituisce ebitda del primo anno, cassa minima e mese del primo saldo negativo (NaN se mai).
+    """
+    ppy = PERIODS_PER_YEAR
+    years = int(base["years"])
+    rs, ci, dr, ds = (shocks[:, i:i + 1] for i in range(4))
+    year = np.arange(years * ppy) // ppy
+
+    revenue = (base["rev1"] / ppy * (1 + base["growth"]) ** year) * np.maximum(1 + rs, 0.0)
+    cogs = revenue * np.clip(base["cogs_p"] + ci, 0.0, 1.0)
+    opex = base["opex1"] / ppy * (1 + base["opex_g"]) ** year
+    ebitda = revenue - cogs - opex
+    interest = base["debt"] * np.maximum(base["debt_rate"] + dr, 0.0) / ppy
+    tax = np.maximum(ebitda - interest, 0.0) * base["tax_r"]
+
+    # Circolante su base annua: crediti da ricavi x DSO, magazzino e fornitori da COGS x DIO / DPO
+    nwc = (revenue * ppy * np.maximum(base["dso"] + ds, 0.0) + cogs * ppy * (base["dio"] - base["dpo"])) / 365
+    nwc0 = (base["rev1"] * base["dso"] + base["rev1"] * base["cogs_p"] * (base["dio"] - base["dpo"])) / 365
+    d_nwc = np.diff(nwc, axis=1, prepend=nwc0)
+
+    cash = base["cash"] + np.cumsum(ebitda - interest - tax - d_nwc, axis=1)
+    out = cash < 0
+    month = np.where(out.any(axis=1), out.argmax(axis=1) + 1.0, np.nan)
+    return {
+        "ebitda": ebitda[:, :ppy].sum(axis=1),
+        "min_cash": cash.min(axis=1),
+        "cash_out_month": month,
+    }
+
+
+def run_stress_chunk(base, means, vols, corr, n, seed):
+    """Un blocco di `n` scenari congiunti con il proprio seme."""
+    return propagate(base, sample_shocks(means, vols, corr, n, np.random.default_rng(seed)))
+
+
+def plan_stress(base, n_paths, means=None, vols=None, corr=None, chunk_size=DEFAULT_CHUNK, seed=None):
+    """
+    Argomenti di run_stress_chunk() per ogni blocco di simulate_stress(), come
+    cfo_montecarlo.plan(): chi esegue i blocchi altrove ottiene gli stessi scenari.
+    """
+    means = {**DEFAULT_MEANS, **(means or {})}
+    vols = {**DEFAULT_VOLS, **(vols or {})}
+    corr = crisis_correlation() if corr is None else corr
+    base = {"debt_rate": DEFAULT_DEBT_RATE, **base}
+    # Memoria limitata come in cfo_montecarlo: scenari x mesi per blocco
+    chunk_size = min(chunk_size, block_rows(int(base["years"]) * PERIODS_PER_YEAR))
+    sizes = [min(chunk_size, n_paths - i) for i in range(0, n_paths, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    return [(base, means, vols, corr, n, s) for n, s in zip(sizes, seeds)]
+
+
+def collect_stress(parts):
+    """Unisce i risultati di run_stress_chunk() (nell'ordine di plan_stress())."""
+    return {k: np.concatenate([p[k] for p in parts]) for k in ("ebitda", "min_cash", "cash_out_month")}
+
+
+def simulate_stress(base, n_paths, means=None, vols=None, corr=None, seed=None):
+    """
+    Esegue `n_paths` scenari congiunti a blocchi nel processo corrente.
+    Restituisce i vettori ebitda (anno 1), min_cash e cash_out_month.
+    """
+    return collect_stress([run_stress_chunk(*c) for c in plan_stress(base, n_paths, means, vols, corr, seed=seed)])
+
+
+def risk_metrics(base_ebitda, res, confidence=DEFAULT_CONFIDENCE):
+    """
+    Misure di rischio sugli scenari di simulate_stress():
+      ear              EBITDA-at-risk: EBITDA base meno il quantile (1 - confidence) dell'EBITDA stressato
+      expected_shortfall  EBITDA base meno la media degli scenari oltre quel quantile
+      prob_cash_out    quota di scenari che finiscono la cassa entro l'orizzonte
+      ttco_p5 / ttco_p50  mesi alla cassa negativa (percentili sugli scenari che la finiscono)
+    """
+    eb = np.asarray(res["ebitda"])
+    q = np.quantile(eb, 1 - confidence)
+    tail = eb[eb <= q]
+    months = np.asarray(res["cash_out_month"])
+    hit = months[~np.isnan(months)]
+    return {
+        "ear": float(base_ebitda - q),
+        "expected_shortfall": float(base_ebitda - tail.mean()),
+        "prob_cash_out": float(hit.size / months.size),
+        "ttco_p5": float(np.percentile(hit, 5)) if hit.size else np.nan,
+        "ttco_p50": float(np.percentile(hit, 50)) if hit.size else np.nan,
+    }
+
+
+def solvency_curve(cash_out_month, horizon_months):
+    """Quota di scenari con cassa ancora positiva alla fine di ogni mese 1..horizon_months."""
+    m = np.asarray(cash_out_month)
+    hit = m[~np.isnan(m)].astype(int)
+    outs = np.cumsum(np.bincount(hit, minlength=horizon_months + 1)[1:horizon_months + 1])
+    return 1 - outs / m.size
+
+
+def black_swan(base, means, vols, rho, n_paths, seed=None, bins=60):
+    """
+    Simulazione completa ridotta a ciò che serve alla UI: misure di rischio, istogramma
+    dell'EBITDA stressato e curva di solvibilità (i vettori degli scenari non escono da qui).
+    """
+    return black_swan_summary(base, simulate_stress(base, n_paths, means, vols, crisis_correlation(rho), seed=seed), bins)
+
+
+def black_swan_summary(base, res, bins=60):
+    """Riduzione di black_swan() sui vettori di simulate_stress() o collect_stress()."""
+    base_ebitda = base["rev1"] * (1 - base["cogs_p"]) - base["opex1"]
+    return {"risk": risk_metrics(base_ebitda, res), "hist": np.histogram(res["ebitda"], bins=bins),
+            "solvency": solvency_curve(res["cash_out_month"], int(base["years"]) * PERIODS_PER_YEAR)}
@@ -0,0 +1,19 @@
+# --- TAVOLO COLORI EXECUTIVE ---
+# Colori e CSS dell'app, calcolati una sola volta all'import.
+COLORS = {
+    "primary": "#1a1a1a",      # Nero Black Swan
+    "accent": "#deff9a",       # Lime/Oro Infografica
+    "secondary": "#3B82F6",    # Blu Professionale
+    "danger": "#EF4444",       # Rosso Rischio
+    "success": "#10B981",      # Verde Profitto
+    "neutral": "#64748b"       # Grigio
+}
+
+APP_CSS = f"""
+<style>
+    .logo-container {{background-color: {COLORS['primary']}; padding: 20px; border-radius: 10px; border: 2px solid {COLORS['accent']}; text-align: center; margin-bottom: 20px;}}
+    .logo-title {{color: {COLORS['accent']}; font-family: 'Arial', sans-serif; font-weight: bold; font-size: 28px; margin: 0; letter-spacing: 2px;}}
+    .logo-subtitle {{color: #FFFFFF; font-family: sans-serif; font-size: 12px; letter-spacing: 4px; margin-top: 5px;}}
+    .stMetric {{background-color: white; border: 1px solid #e0e0e0; border-radius: 8px; padding: 15px;}}
+</style>
+"""
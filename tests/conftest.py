@@ -0,0 +1,5 @@
+# I moduli cfo_* stanno nella radice del repository, accanto allo script dell'app
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+
+from cfo_batch import evaluate_frame, run
+from cfo_engine import DEFAULT_INPUTS
+
+
+def test_blank_cells_use_defaults_and_invalid_rows_are_kept():
+    df = pd.DataFrame({"id": ["a", "b", "c", "d"],
+                       "wacc": [0.08, None, "abc", 0.1],
+                       "years": [5, 6, 4, 0]})
+    out = evaluate_frame(df)
+    assert list(out["row_status"]) == ["ok", "ok", "invalid: wacc", "invalid: years"]
+    assert out.loc[1, "wacc"] == DEFAULT_INPUTS["wacc"]
+    assert np.isfinite(out.loc[:1, "npv"]).all()
+    assert out.loc[2:, "npv"].isna().all()
+
+
+def test_run_does_not_stop_on_invalid_rows(tmp_path):
+    src, dst = tmp_path / "in.csv", tmp_path / "out.csv"
+    pd.DataFrame({"wacc": [0.1, "x", 0.12] * 10, "years": [5, 5, ""] * 10}).to_csv(src, index=False)
+    assert run(str(src), str(dst), chunk_size=7) == (30, 10)
+    assert len(pd.read_csv(dst)) == 30
@@ -0,0 +1,22 @@
+# --- BUDGET DI IMPORT DEL NUCLEO ---
+# Stesso controllo di `python -m cfo_bench imports`; il budget si può allargare su
+# macchine lente con CFO_IMPORT_BUDGET (secondi).
+import os
+
+from cfo_bench import DEFAULT_IMPORT_BUDGET, check_imports, measure_imports
+
+BUDGET = float(os.environ.get("CFO_IMPORT_BUDGET", DEFAULT_IMPORT_BUDGET))
+
+
+def test_core_does_not_import_heavy_libraries():
+    assert measure_imports(repeat=1)["heavy"] == []
+
+
+def test_core_import_within_budget():
+    res = measure_imports()
+    assert res["seconds"] <= BUDGET, f"import nucleo {res['seconds'] * 1000:.0f} ms > {BUDGET * 1000:.0f} ms"
+
+
+def test_cli_exit_code_reflects_budget():
+    assert check_imports(budget=BUDGET) == 0
+    assert check_imports(budget=0.0, repeat=1) == 1
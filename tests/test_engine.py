@@ -0,0 +1,63 @@
+# --- PARITÀ CON IL CICLO ORIGINALE DELLA TAB INVESTIMENTI ---
+import numpy as np
+import pytest
+
+from cfo_engine import DEFAULT_INPUTS, INVEST_DRIVERS, evaluate_projects
+
+
+def baseline_cash_flows(capex, years, rev1, growth, cogs_p, opex1, opex_g, tax_r):
+    # Ciclo anno per anno della versione iniziale dell'app (ammortamento sull'orizzonte)
+    cf = [-capex]
+    da = capex / years
+    for i in range(1, years + 1):
+        r = rev1 * (1 + growth) ** (i - 1)
+        ebitda = r - r * cogs_p - opex1 * (1 + opex_g) ** (i - 1)
+        ebit = ebitda - da
+        cf.append(ebit - max(0, ebit * tax_r) + da)
+    return cf
+
+
+def baseline_npv(rate, cf):
+    return sum(c / (1 + rate) ** t for t, c in enumerate(cf))
+
+
+def baseline_irr(cf, lo=-0.99, hi=10.0):
+    # Bisezione sull'unico cambio di segno dei flussi
+    f_lo = baseline_npv(lo, cf)
+    for _ in range(200):
+        mid = (lo + hi) / 2
+        f_mid = baseline_npv(mid, cf)
+        if np.sign(f_mid) == np.sign(f_lo):
+            lo, f_lo = mid, f_mid
+        else:
+            hi = mid
+    return (lo + hi) / 2
+
+
+def random_drivers(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        "capex": rng.uniform(1e5, 1e6, n), "years": rng.integers(1, 15, n), "wacc": rng.uniform(0.02, 0.2, n),
+        "rev1": rng.uniform(1e5, 1e6, n), "growth": rng.uniform(-0.1, 0.5, n), "cogs_p": rng.uniform(0, 0.9, n),
+        "opex1": rng.uniform(0, 2e5, n), "opex_g": rng.uniform(0, 0.2, n), "tax_r": rng.uniform(0, 0.5, n),
+    }
+
+
+def test_default_inputs_match_baseline():
+    d = {k: DEFAULT_INPUTS[k] for k in INVEST_DRIVERS}
+    res = evaluate_projects(**d)
+    cf = baseline_cash_flows(*(d[k] for k in INVEST_DRIVERS if k != "wacc"))
+    assert res["npv"][0] == pytest.approx(baseline_npv(d["wacc"], cf), rel=1e-12)
+    assert res["irr"][0] == pytest.approx(baseline_irr(cf), abs=1e-9)
+
+
+def test_vectorized_npv_irr_match_baseline_loop():
+    d = random_drivers(200)
+    res = evaluate_projects(**d)
+    for i in range(200):
+        args = [d[k][i] for k in INVEST_DRIVERS if k != "wacc"]
+        args[1] = int(args[1])
+        cf = baseline_cash_flows(*args)
+        assert res["npv"][i] == pytest.approx(baseline_npv(d["wacc"][i], cf), rel=1e-9, abs=1e-6)
+        if np.isfinite(res["irr"][i]):
+            assert baseline_npv(res["irr"][i], cf) == pytest.approx(0, abs=1e-6 * abs(cf[0]))
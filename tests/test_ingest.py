@@ -0,0 +1,30 @@
+import os
+
+import pandas as pd
+
+import cfo_ingest
+import cfo_scenarios
+from cfo_paths import DATA_DIR
+
+
+def test_ingest_reuses_the_callers_hash(tmp_path, monkeypatch):
+    src = tmp_path / "gl.csv"
+    pd.DataFrame({"date": ["2025-01-31", "2025-02-28"], "account": ["revenue", "cogs"],
+                  "amount": [1000.0, 400.0]}).to_csv(src, index=False)
+    key = cfo_ingest.file_hash(str(src))
+
+    def no_hash(source):
+        raise AssertionError("il file è stato riletto per l'hash")
+
+    # L'app calcola l'hash una volta e lo passa: ingest non deve rileggere il file
+    monkeypatch.setattr(cfo_ingest, "file_hash", no_hash)
+    cache = cfo_ingest.ingest(str(src), cache_dir=str(tmp_path / "cache"), key=key)
+    assert cache["key"] == key and cache["rows"] == 2
+    assert os.path.isdir(tmp_path / "cache" / key)
+
+
+def test_ledger_cache_and_scenarios_share_the_data_dir():
+    if "CFO_CACHE_DIR" not in os.environ:
+        assert os.path.dirname(cfo_ingest.CACHE_DIR) == DATA_DIR
+    if "CFO_SCENARIO_DB" not in os.environ:
+        assert os.path.dirname(cfo_scenarios.DB_PATH) == DATA_DIR
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from cfo_irr import (IRR_ABOVE_RANGE, IRR_MULTIPLE, IRR_NO_SIGN_CHANGE, IRR_OK, IRR_STATUS_NAMES, RATE_MAX,
+                     solve_irr)
+
+
+def npv(rate, cf):
+    return sum(c / (1 + rate) ** t for t, c in enumerate(cf))
+
+
+def test_statuses():
+    res = solve_irr([[-100, 30, 40, 50], [1, 1, 1, 1], [-1, 3, -2.02, 0]])
+    assert list(res["status"]) == [IRR_OK, IRR_NO_SIGN_CHANGE, IRR_MULTIPLE]
+    assert np.isnan(res["irr"][1])
+
+
+@pytest.mark.parametrize("cf, rate", [([-1, 20], 19.0), ([-1, 15, 15, 15], None), ([-1, 0, 400], 19.0)])
+def test_irr_above_rate_max(cf, rate):
+    # IRR oltre il 1000%: prima del fix risultavano NaN con stato "not_converged"
+    res = solve_irr([cf])
+    assert res["status"][0] == IRR_OK
+    assert res["irr"][0] > RATE_MAX
+    if rate is not None:
+        assert res["irr"][0] == pytest.approx(rate)
+    assert npv(res["irr"][0], cf) == pytest.approx(0, abs=1e-9)
+
+
+def test_irr_beyond_cap_is_reported_as_above_range():
+    res = solve_irr([[-1, 2e7, 0, 0]])
+    assert res["status"][0] == IRR_ABOVE_RANGE
+    assert IRR_STATUS_NAMES[IRR_ABOVE_RANGE] == "above_range"
+    assert np.isnan(res["irr"][0])
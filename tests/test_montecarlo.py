@@ -0,0 +1,30 @@
+import numpy as np
+
+from cfo_engine import DEFAULT_INPUTS, INVEST_DRIVERS
+from cfo_montecarlo import simulate, summarize, summary
+from cfo_sensitivity import wacc_floor
+
+BASE = {k: DEFAULT_INPUTS[k] for k in INVEST_DRIVERS}
+SPEC = {"wacc": ("normal", 0.06, 0.03), "growth": ("normal", 0.05, 0.05)}
+
+
+def test_sampled_wacc_stays_above_terminal_growth():
+    # Con valore terminale e WACC campionato sotto la crescita l'NPV era NaN e spariva dalle statistiche
+    options = {"terminal_growth": 0.04}
+    res = simulate(BASE, SPEC, 20_000, seed=1, options=options)
+    assert not np.isnan(res["npv"]).any()
+    assert summary(res)["npv"]["stats"]["nan_share"] == 0
+    assert wacc_floor(options) > options["terminal_growth"]
+
+
+def test_without_terminal_value_paths_are_unchanged():
+    a = simulate(BASE, SPEC, 5_000, seed=3)
+    b = simulate(BASE, SPEC, 5_000, seed=3, options={})
+    np.testing.assert_array_equal(a["npv"], b["npv"])
+
+
+def test_summarize_reports_nan_share():
+    stats = summarize([1.0, -1.0, np.nan, np.nan])
+    assert stats["nan_share"] == 0.5
+    assert stats["prob_loss"] == 0.5
+    assert np.isnan(summarize([np.nan])["p50"])
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+from cfo_engine import DEFAULT_INPUTS, evaluate_projects
+from cfo_portfolio import optimize_portfolio, project_npvs
+
+
+def test_blank_cells_use_defaults():
+    df = pd.DataFrame({"capex": [None, 200_000], "years": [None, 3], "start_year": [None, 1]})
+    npv, capex, start = project_npvs(df)
+    assert capex[0] == DEFAULT_INPUTS["capex"]
+    ref = evaluate_projects(**{k: DEFAULT_INPUTS[k] for k in ("capex", "years", "wacc", "rev1", "growth",
+                                                             "cogs_p", "opex1", "opex_g", "tax_r")})
+    assert npv[0] == ref["npv"][0]
+    assert list(start) == [0, 1]
+
+
+def test_each_project_depreciates_over_its_own_horizon():
+    df = pd.DataFrame({"years": [3, 8]})
+    npv, _, _ = project_npvs(df, options={"dep_years": None})
+    for i, years in enumerate((3, 8)):
+        assert npv[i] == evaluate_projects(**{**{k: DEFAULT_INPUTS[k] for k in ("capex", "wacc", "rev1", "growth",
+                                                                               "cogs_p", "opex1", "opex_g", "tax_r")},
+                                             "years": years})["npv"][0]
+
+
+def test_invalid_rows_are_flagged_and_never_selected():
+    df = pd.DataFrame({"capex": [100_000, 100_000, 100_000], "years": [5, 0, 5], "start_year": [0, 0, -1]})
+    res, npv = optimize_portfolio(df, budget=1e9)
+    assert res["invalid"] == 2
+    assert np.isnan(npv[1:]).all()
+    assert np.isfinite(npv[0])
@@ -0,0 +1,32 @@
+import multiprocessing
+
+import pytest
+
+from cfo_service import ComputeService, job_key
+from cfo_stress import collect_stress, plan_stress, run_stress_chunk
+
+BASE = dict(rev1=1e6, growth=0.05, cogs_p=0.6, opex1=2.5e5, opex_g=0.02, tax_r=0.24, years=5,
+            cash=1e5, debt=2e5, dso=60, dio=30, dpo=45)
+
+
+@pytest.fixture
+def service():
+    svc = ComputeService(2)
+    yield svc
+    svc.close()
+
+
+def test_workers_are_not_forked(service):
+    # Il processo ha già altri thread: "fork" rischia deadlock nei figli
+    method = service._executor()._mp_context.get_start_method()
+    assert method != "fork"
+    assert method in multiprocessing.get_all_start_methods()
+
+
+def test_chunked_job_reports_progress_per_task(service):
+    chunks = plan_stress(BASE, 50_000, seed=42)
+    job = service.submit(job_key("stress", 50_000), [(run_stress_chunk, c) for c in chunks], collect_stress)
+    res = job.result(timeout=120)
+    assert job.total == len(chunks) > 1
+    assert job.completed == job.total
+    assert len(res["ebitda"]) == 50_000
@@ -0,0 +1,24 @@
+import numpy as np
+
+from cfo_stress import black_swan, collect_stress, crisis_correlation, plan_stress, run_stress_chunk, simulate_stress
+
+BASE = dict(rev1=1e6, growth=0.05, cogs_p=0.6, opex1=2.5e5, opex_g=0.02, tax_r=0.24, years=5,
+            cash=1e5, debt=2e5, dso=60, dio=30, dpo=45)
+
+
+def test_chunks_reproduce_single_process_run():
+    # Il job dell'app esegue i blocchi come task separati: stesso risultato di simulate_stress
+    corr = crisis_correlation(0.5)
+    chunks = plan_stress(BASE, 50_000, corr=corr, seed=42)
+    assert len(chunks) > 1
+    parts = collect_stress([run_stress_chunk(*c) for c in chunks])
+    ref = simulate_stress(BASE, 50_000, corr=corr, seed=42)
+    for k in ("ebitda", "min_cash", "cash_out_month"):
+        np.testing.assert_array_equal(parts[k], ref[k])
+
+
+def test_black_swan_is_deterministic():
+    a = black_swan(BASE, None, None, 0.5, 20_000, seed=7)
+    b = black_swan(BASE, None, None, 0.5, 20_000, seed=7)
+    assert a["risk"] == b["risk"]
+    assert 0 <= a["risk"]["prob_cash_out"] <= 1